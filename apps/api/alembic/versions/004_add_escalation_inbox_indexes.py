@@ -0,0 +1,35 @@
+"""add escalation inbox indexes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently so a large escalations table stays writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_escalations_city_status_created', 'escalations',
+            ['city_id', 'status', 'created_at', 'id'],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_escalations_city_created', 'escalations',
+            ['city_id', 'created_at', 'id'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_escalations_city_created', table_name='escalations', postgresql_concurrently=True)
+        op.drop_index('ix_escalations_city_status_created', table_name='escalations', postgresql_concurrently=True)
@@ -0,0 +1,25 @@
+"""add escalation claim lease columns
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('escalations', sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('escalations', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('escalations', 'lease_expires_at')
+    op.drop_column('escalations', 'claimed_at')
@@ -0,0 +1,47 @@
+"""add escalation coalescing columns
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows start closed: old duplicates must not violate the open-per-user index
+    op.add_column('escalations', sa.Column('is_open', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.alter_column('escalations', 'is_open', server_default=sa.text('true'))
+    op.add_column('escalations', sa.Column('product_skus', postgresql.JSONB(), nullable=True))
+    op.add_column('escalations', sa.Column('reasons', postgresql.JSONB(), nullable=True))
+    op.add_column('escalations', sa.Column('event_count', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('escalations', sa.Column('last_event_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    
+    op.execute("""
+        UPDATE escalations SET
+            product_skus = CASE WHEN product_sku IS NULL THEN '[]'::jsonb ELSE jsonb_build_array(product_sku) END,
+            reasons = jsonb_build_array(reason),
+            last_event_at = created_at
+    """)
+    
+    op.create_index(
+        'uq_escalations_open_per_user', 'escalations', ['city_id', 'user_telegram_id'],
+        unique=True, postgresql_where=sa.text('is_open')
+    )
+
+
+def downgrade():
+    op.drop_index('uq_escalations_open_per_user', table_name='escalations')
+    op.drop_column('escalations', 'last_event_at')
+    op.drop_column('escalations', 'event_count')
+    op.drop_column('escalations', 'reasons')
+    op.drop_column('escalations', 'product_skus')
+    op.drop_column('escalations', 'is_open')
@@ -0,0 +1,46 @@
+"""add extraction_jobs table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'extraction_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('city_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('pages_done', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pages_total', sa.Integer(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_extraction_jobs_id', 'extraction_jobs', ['id'])
+    op.create_index('ix_extraction_jobs_document_id', 'extraction_jobs', ['document_id'])
+    op.create_index('ix_extraction_jobs_status_created', 'extraction_jobs', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_extraction_jobs_status_created', table_name='extraction_jobs')
+    op.drop_index('ix_extraction_jobs_document_id', table_name='extraction_jobs')
+    op.drop_index('ix_extraction_jobs_id', table_name='extraction_jobs')
+    op.drop_table('extraction_jobs')
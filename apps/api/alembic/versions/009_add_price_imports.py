@@ -0,0 +1,64 @@
+"""add price_imports table and normalized SKU index
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+# Must match app.core.sku.SKU_KEY_SQL
+SKU_KEY_SQL = (
+    "translate(upper(regexp_replace(sku, '[^[:alnum:]]', '', 'g')), "
+    "'АВЕКМНОРСТХУ', 'ABEKMHOPCTXY')"
+)
+
+
+def upgrade():
+    op.create_table(
+        'price_imports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.Column('city_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='running'),
+        sa.Column('columns', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('rows_total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rows_matched', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rows_changed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rows_unmatched', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('unmatched_sample', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('diff_path', sa.String(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_price_imports_id', 'price_imports', ['id'])
+    op.create_index('ix_price_imports_document_id', 'price_imports', ['document_id'])
+    op.create_index('ix_price_imports_city_id', 'price_imports', ['city_id'])
+
+    # Built concurrently so the catalog stays writable during the migration
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_city_sku_key "
+            f"ON products (city_id, ({SKU_KEY_SQL}))"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_city_sku_key")
+    op.drop_index('ix_price_imports_city_id', table_name='price_imports')
+    op.drop_index('ix_price_imports_document_id', table_name='price_imports')
+    op.drop_index('ix_price_imports_id', table_name='price_imports')
+    op.drop_table('price_imports')
@@ -0,0 +1,36 @@
+"""add conversation channel, last_message_at and user lookup index
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('channel', sa.String(), nullable=False, server_default='telegram'))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+
+    # Built concurrently so the bots can keep writing during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_conversations_user_lookup',
+            'conversations',
+            ['city_id', 'channel', 'user_telegram_id', 'started_at'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_conversations_user_lookup', table_name='conversations', postgresql_concurrently=True)
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('conversations', 'channel')
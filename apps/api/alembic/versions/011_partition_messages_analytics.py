@@ -0,0 +1,125 @@
+"""partition messages and analytics_events by month
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 20:00:00.000000
+
+Rebuilds both tables as RANGE (created_at) partitioned tables with one
+partition per month from the oldest row to two months ahead, plus a default
+partition, and copies the rows over. The copy runs inside the migration
+transaction, so writers to these tables wait for it; run it in a quiet window.
+Later months are created by `python -m app.core.partitions`.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    'messages': (
+        "id integer NOT NULL DEFAULT nextval('messages_id_seq'::regclass), "
+        "conversation_id integer NOT NULL REFERENCES conversations(id) ON DELETE CASCADE, "
+        "role messagerole NOT NULL, "
+        "content text NOT NULL, "
+        "created_at timestamp without time zone NOT NULL"
+    ),
+    'analytics_events': (
+        "id integer NOT NULL DEFAULT nextval('analytics_events_id_seq'::regclass), "
+        "city_id integer NOT NULL REFERENCES cities(id) ON DELETE CASCADE, "
+        "event_type varchar NOT NULL, "
+        "data json, "
+        "created_at timestamp with time zone NOT NULL DEFAULT now()"
+    ),
+}
+
+INDEXES = {
+    'messages': ['id', 'conversation_id', 'created_at'],
+    'analytics_events': ['id', 'event_type', 'created_at'],
+}
+
+# created_at as a UTC timestamp without time zone
+UTC_CREATED_AT = {
+    'messages': "created_at",
+    'analytics_events': "created_at AT TIME ZONE 'UTC'",
+}
+
+COLUMN_NAMES = {
+    'messages': "id, conversation_id, role, content, created_at",
+    'analytics_events': "id, city_id, event_type, data, created_at",
+}
+
+
+def _create_month_partitions(table, source):
+    # Month bounds in UTC, matching app.core.partitions
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month date := date_trunc('month', COALESCE(
+                (SELECT min({UTC_CREATED_AT[table]}) FROM {source}), now() AT TIME ZONE 'UTC'
+            ))::date;
+            last date := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months')::date;
+        BEGIN
+            WHILE month <= last LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(month, 'YYYYMM'),
+                    month::text || ' 00:00:00+00',
+                    (month + interval '1 month')::date::text || ' 00:00:00+00'
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+
+def _partition(table):
+    old = f"{table}_unpartitioned"
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+    for column in INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}")
+
+    op.execute(
+        f"CREATE TABLE {table} ({COLUMNS[table]}, PRIMARY KEY (id, created_at)) "
+        f"PARTITION BY RANGE (created_at)"
+    )
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    for column in INDEXES[table]:
+        op.execute(f"CREATE INDEX ix_{table}_{column} ON {table} ({column})")
+
+    _create_month_partitions(table, old)
+    op.execute(f"INSERT INTO {table} ({COLUMN_NAMES[table]}) SELECT {COLUMN_NAMES[table]} FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+    op.execute(f"ANALYZE {table}")
+
+
+def _unpartition(table):
+    partitioned = f"{table}_partitioned"
+    op.execute(f"ALTER TABLE {table} RENAME TO {partitioned}")
+    op.execute(f"ALTER TABLE {partitioned} RENAME CONSTRAINT {table}_pkey TO {partitioned}_pkey")
+    for column in INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}")
+
+    op.execute(f"CREATE TABLE {table} ({COLUMNS[table]}, PRIMARY KEY (id))")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(f"INSERT INTO {table} ({COLUMN_NAMES[table]}) SELECT {COLUMN_NAMES[table]} FROM {partitioned}")
+    op.execute(f"DROP TABLE {partitioned} CASCADE")
+    for column in INDEXES[table]:
+        if (table, column) != ('messages', 'created_at'):
+            op.execute(f"CREATE INDEX ix_{table}_{column} ON {table} ({column})")
+
+
+def upgrade():
+    _partition('messages')
+    _partition('analytics_events')
+
+
+def downgrade():
+    # Archived months (app.core.archive) are not restored
+    _unpartition('analytics_events')
+    _unpartition('messages')
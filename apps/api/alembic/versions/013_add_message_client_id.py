@@ -0,0 +1,26 @@
+"""add messages.client_id for idempotent bot batches
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('messages', sa.Column('client_id', sa.String(length=64), nullable=True))
+    # Unique keys of a partitioned table must include the partition key; NULLs (older bots) never conflict
+    op.create_index('uq_messages_client_id', 'messages', ['client_id', 'created_at'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_messages_client_id', table_name='messages')
+    op.drop_column('messages', 'client_id')
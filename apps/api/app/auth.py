@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,18 +9,29 @@ import hashlib
 
 from app.config import settings
 from app.database import get_db
-from app.models import User, Session, UserRole
+from app.models import User, UserRole
+from app.session_store import session_store, SessionStoreUnavailable
+from app.core.principal_cache import principal_cache
+from app.core.security import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+def session_store_unavailable_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Session service is temporarily unavailable. Try again shortly.",
+        headers={"Retry-After": "5"}
+    )
+
 
+async def hash_password(password: str) -> str:
+    """Hash on the bounded bcrypt pool so the event loop keeps serving requests"""
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -52,6 +62,13 @@ async def get_current_user(
     token = credentials.credentials
     token_hash = hash_token(token)
     
+    cached_user = principal_cache.get(token_hash)
+    if cached_user is not None:
+        return cached_user
+    
+    if principal_cache.is_revoked(token_hash):
+        raise credentials_exception
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: int = payload.get("sub")
@@ -61,15 +78,12 @@ async def get_current_user(
         raise credentials_exception
     
     # Check if session exists and is valid
-    result = await db.execute(
-        select(Session).where(
-            Session.token_hash == token_hash,
-            Session.expires_at > datetime.utcnow()
-        )
-    )
-    session = result.scalar_one_or_none()
+    try:
+        session_user_id = await session_store.get_user_id(token_hash)
+    except SessionStoreUnavailable:
+        raise session_store_unavailable_exception()
     
-    if session is None:
+    if session_user_id is None or str(session_user_id) != str(user_id):
         raise credentials_exception
     
     # Get user
@@ -79,6 +93,7 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
     
+    principal_cache.put(token_hash, user, token_expires_at=payload.get("exp"))
     return user
 
 
@@ -10,6 +10,8 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
     ENVIRONMENT: str = "development"
     CORS_ORIGINS: str = "http://localhost:3000"
+    SESSION_BACKEND: str = "redis"  # "redis" or "sql"
+    SESSION_PURGE_INTERVAL_SECONDS: int = 3600
     
     @property
     def cors_origins_list(self) -> List[str]:
@@ -0,0 +1,271 @@
+"""
+Cold archive of old monthly partitions (see app.core.partitions).
+
+archive_partition() exports one month of messages or analytics_events to
+zstd-compressed NDJSON on local disk, then drops the partition:
+
+    {ARCHIVE_PATH}/{table}/{partition}.ndjson.zst   one JSON object per row
+    {ARCHIVE_PATH}/{table}/{partition}.json         manifest: row count, range, sha256,
+                                                    and per-day counts for analytics
+
+The partition is locked against writes for the export, the file is read
+back and its row count checked against both the export and count(*) before
+anything is dropped, and the drop commits before the manifest is published
+(renamed from .json.part). A manifest therefore exists only for rows that
+are no longer in Postgres, so analytics can add archived counts to live
+ones without double counting; finalize_pending() publishes manifests whose
+run was interrupted between the drop and the rename.
+
+Analytics reads the manifests' per-day counts (archived_counts), not the
+row files; read_archive() streams the rows themselves for ad-hoc analysis.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.partitions import Partition
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_ROWS = 10_000
+ZSTD_LEVEL = 10
+
+# Rows as exported; messages carry their conversation's city so archives can be filtered by city
+EXPORT_QUERIES = {
+    "messages": (
+        "SELECT row_to_json(r)::text FROM ("
+        "SELECT m.id, m.conversation_id, c.city_id, m.role, m.content, m.created_at "
+        "FROM {partition} m LEFT JOIN conversations c ON c.id = m.conversation_id ORDER BY m.id"
+        ") r"
+    ),
+    "analytics_events": "SELECT row_to_json(e)::text FROM {partition} e ORDER BY e.id",
+}
+
+# (city_id, day, event_type or '', count) for the manifest
+DAILY_COUNT_QUERIES = {
+    "messages": (
+        "SELECT c.city_id, m.created_at::date, '', count(*) "
+        "FROM {partition} m LEFT JOIN conversations c ON c.id = m.conversation_id GROUP BY 1, 2"
+    ),
+    "analytics_events": (
+        "SELECT city_id, (created_at AT TIME ZONE 'UTC')::date, event_type, count(*) "
+        "FROM {partition} GROUP BY 1, 2, 3"
+    ),
+}
+
+
+class ArchiveError(Exception):
+    """Export could not be verified; the partition was left in place"""
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ArchiveError("Archiving needs the zstandard package")
+    return zstandard
+
+
+def archive_root() -> Path:
+    return Path(settings.ARCHIVE_PATH)
+
+
+def data_path(partition: Partition) -> Path:
+    return archive_root() / partition.table / f"{partition.name}.ndjson.zst"
+
+
+def manifest_path(partition: Partition) -> Path:
+    return archive_root() / partition.table / f"{partition.name}.json"
+
+
+def _fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_archive(path: Path) -> Iterator[dict]:
+    """Rows of one archive file, streamed"""
+    zstandard = _zstd()
+    with open(path, "rb") as raw:
+        with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                yield json.loads(line)
+
+
+def _count_lines(path: Path) -> int:
+    zstandard = _zstd()
+    count = 0
+    with open(path, "rb") as raw:
+        with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+            while True:
+                chunk = reader.read(1024 * 1024)
+                if not chunk:
+                    break
+                count += chunk.count(b"\n")
+    return count
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def archive_partition(engine: Engine, partition: Partition) -> dict:
+    """Export, verify and drop one partition; returns its manifest"""
+    zstandard = _zstd()
+    destination = data_path(partition)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    data_tmp = destination.with_name(destination.name + ".part")
+    manifest_tmp = manifest_path(partition).with_name(manifest_path(partition).name + ".part")
+
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+        # SHARE blocks writers to this month (there should be none) but not readers
+        cursor.execute(f"LOCK TABLE {partition.name} IN SHARE MODE")
+        cursor.execute(f"SELECT count(*) FROM {partition.name}")
+        expected = cursor.fetchone()[0]
+        cursor.execute(DAILY_COUNT_QUERIES[partition.table].format(partition=partition.name))
+        daily = [[city_id, day.isoformat(), kind, count] for city_id, day, kind, count in cursor.fetchall()]
+
+        # Server-side cursor: rows stream from Postgres in batches instead of loading the month
+        export = raw_conn.cursor(name=f"archive_{partition.name}")
+        export.itersize = EXPORT_BATCH_ROWS
+        export.execute(EXPORT_QUERIES[partition.table].format(partition=partition.name))
+        written = 0
+        with open(data_tmp, "wb") as raw:
+            with zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False) as writer:
+                for (row,) in export:
+                    writer.write(row.encode("utf-8"))
+                    writer.write(b"\n")
+                    written += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+        export.close()
+
+        read_back = _count_lines(data_tmp)
+        counted = sum(row[3] for row in daily)
+        if not expected == written == read_back == counted:
+            raise ArchiveError(
+                f"{partition.name}: count(*) {expected}, exported {written}, "
+                f"read back {read_back}, daily total {counted}"
+            )
+
+        manifest = {
+            "table": partition.table,
+            "partition": partition.name,
+            "start": partition.start.isoformat(),
+            "end": partition.end.isoformat(),
+            "rows": expected,
+            "file": destination.name,
+            "sha256": _sha256(data_tmp),
+            "daily_counts": daily,  # [city_id, day, event_type or "", count]
+            "archived_at": datetime.utcnow().isoformat(),
+        }
+        os.replace(data_tmp, destination)
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(destination.parent)
+
+        cursor.execute(f"ALTER TABLE {partition.table} DETACH PARTITION {partition.name}")
+        cursor.execute(f"DROP TABLE {partition.name}")
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        data_tmp.unlink(missing_ok=True)
+        manifest_tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        raw_conn.close()
+
+    os.replace(manifest_tmp, manifest_path(partition))
+    _fsync_dir(destination.parent)
+    logger.info(f"🧊 Archived {partition.name}: {expected} rows -> {destination}")
+    return manifest
+
+
+def finalize_pending(engine: Engine):
+    """Publish .json.part manifests whose partition is gone; discard ones whose partition still exists"""
+    root = archive_root()
+    if not root.exists():
+        return
+    with engine.connect() as conn:
+        for manifest_tmp in root.glob("*/*.json.part"):
+            name = manifest_tmp.name[:-len(".json.part")]
+            exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+            if exists:
+                manifest_tmp.unlink()
+            else:
+                os.replace(manifest_tmp, manifest_tmp.with_name(f"{name}.json"))
+                logger.info(f"🧊 Published archive manifest for {name}")
+
+
+class _ManifestCache:
+    """Parsed manifests per table, reloaded when the directory changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+
+    def manifests(self, table: str) -> list:
+        directory = archive_root() / table
+        try:
+            stamp = directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            cached = self._entries.get(table)
+            if cached and cached[0] == stamp:
+                return cached[1]
+        manifests = []
+        for path in sorted(directory.glob("*.json")):
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+        with self._lock:
+            self._entries[table] = (stamp, manifests)
+        return manifests
+
+
+_manifest_cache = _ManifestCache()
+
+
+def archived_counts(table: str, city_id: int, since: date, until: Optional[date] = None) -> Dict[str, int]:
+    """
+    Archived row counts for a city from `since` (inclusive) to `until`
+    (exclusive), by event type for analytics_events ("" for messages).
+    Day-granular: archives keep per-day counts, not timestamps.
+    """
+    since_key = since.isoformat()
+    until_key = until.isoformat() if until else None
+    counts: Dict[str, int] = {}
+    for manifest in _manifest_cache.manifests(table):
+        if manifest["end"] <= since_key or (until_key and manifest["start"] >= until_key):
+            continue
+        for row_city, day, kind, count in manifest["daily_counts"]:
+            if row_city == city_id and day >= since_key and (until_key is None or day < until_key):
+                counts[kind] = counts.get(kind, 0) + count
+    return counts
+
+
+__all__ = [
+    "ArchiveError", "archive_partition", "finalize_pending", "read_archive",
+    "archived_counts", "data_path", "manifest_path",
+]
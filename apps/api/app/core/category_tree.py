@@ -0,0 +1,195 @@
+"""
+Category hierarchy as a closure table.
+
+category_closure holds one row per (ancestor, descendant) pair of a city's
+category tree, each category included as its own ancestor at depth 0. "All
+products under Мягкая мебель" is then a single indexed join:
+
+    products JOIN category_closure ON descendant_id = products.category_id
+    WHERE ancestor_id = :category
+
+The routes keep the closure in step with categories: add_category() on
+create, move_category() on a parent change, and the ON DELETE CASCADE
+foreign keys on delete. Every tree change bumps cities.category_version in
+the same transaction; get_tree() caches one serialized snapshot per city and
+rebuilds it only when that version moves, and the version doubles as the
+tree endpoint's ETag.
+"""
+import json
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Query, Session
+
+from app.core.metrics import counter
+from app.models.category import Category
+from app.models.category_closure import CategoryClosure
+from app.models.city import City
+from app.models.product import Product
+
+cache_requests = counter(
+    "zeta_category_tree_cache_requests_total",
+    "Category tree snapshot lookups by result (hit, miss)",
+    ["result"],
+)
+
+# Backfill for one city (or every city when :city_id is null); depth bound guards against parent_id cycles
+REBUILD_SQL = """
+    WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+        SELECT id, id, 0 FROM categories
+        WHERE CAST(:city_id AS integer) IS NULL OR city_id = :city_id
+        UNION ALL
+        SELECT tree.ancestor_id, c.id, tree.depth + 1
+        FROM tree JOIN categories c ON c.parent_id = tree.descendant_id
+        WHERE tree.depth < 64
+    )
+    INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, descendant_id, min(depth) FROM tree
+    GROUP BY ancestor_id, descendant_id
+"""
+
+
+class CategoryMoveError(ValueError):
+    """The requested parent would put a category inside its own subtree"""
+
+
+def add_category(db: Session, category: Category):
+    """Link a newly flushed category under its parent's ancestors and itself"""
+    db.execute(text(
+        "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+        "SELECT ancestor_id, :category_id, depth + 1 FROM category_closure WHERE descendant_id = :parent_id "
+        "UNION ALL SELECT :category_id, :category_id, 0"
+    ), {"category_id": category.id, "parent_id": category.parent_id})
+
+
+def is_in_subtree(db: Session, root_id: int, category_id: int) -> bool:
+    return db.query(CategoryClosure).filter(
+        CategoryClosure.ancestor_id == root_id,
+        CategoryClosure.descendant_id == category_id
+    ).first() is not None
+
+
+def move_category(db: Session, category: Category, new_parent_id: Optional[int]):
+    """
+    Re-parent a category together with its subtree: links from outside
+    ancestors into the subtree are replaced by links from the new parent's
+    ancestors, the subtree's internal links are kept.
+    """
+    if new_parent_id is not None and is_in_subtree(db, category.id, new_parent_id):
+        raise CategoryMoveError("A category cannot be moved under itself or one of its descendants")
+
+    params = {"category_id": category.id, "parent_id": new_parent_id}
+    db.execute(text(
+        "DELETE FROM category_closure "
+        "WHERE descendant_id IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = :category_id) "
+        "AND ancestor_id NOT IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = :category_id)"
+    ), params)
+    if new_parent_id is not None:
+        db.execute(text(
+            "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+            "SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1 "
+            "FROM category_closure above CROSS JOIN category_closure below "
+            "WHERE above.descendant_id = :parent_id AND below.ancestor_id = :category_id"
+        ), params)
+    category.parent_id = new_parent_id
+
+
+def rebuild_closure(db: Session, city_id: Optional[int] = None):
+    """Recompute the closure from parent_id (backfill, repair)"""
+    params = {"city_id": city_id}
+    db.execute(text(
+        "DELETE FROM category_closure WHERE descendant_id IN "
+        "(SELECT id FROM categories WHERE CAST(:city_id AS integer) IS NULL OR city_id = :city_id)"
+    ), params)
+    db.execute(text(REBUILD_SQL), params)
+
+
+def bump_version(db: Session, city_id: int):
+    """
+    Invalidate the city's tree snapshot. Call first in the transaction that
+    changes the tree: the row lock it takes serializes concurrent edits of
+    one city's closure.
+    """
+    db.query(City).filter(City.id == city_id).update(
+        {City.category_version: City.category_version + 1},
+        synchronize_session=False
+    )
+
+
+def filter_subtree(query: Query, category_id: int) -> Query:
+    """Restrict a Product query to a category and all of its descendants"""
+    return query.join(
+        CategoryClosure, CategoryClosure.descendant_id == Product.category_id
+    ).filter(CategoryClosure.ancestor_id == category_id)
+
+
+class _Snapshot(NamedTuple):
+    version: int
+    body: bytes  # Serialized CategoryTreeResponse
+
+
+class TreeCache:
+    """City -> latest serialized tree snapshot and the category_version it was built at"""
+
+    def __init__(self):
+        self._entries: Dict[int, _Snapshot] = {}
+        self._lock = threading.Lock()
+
+    def get(self, city_id: int, version: int) -> Optional[bytes]:
+        with self._lock:
+            snapshot = self._entries.get(city_id)
+        if snapshot is None or snapshot.version != version:
+            return None
+        return snapshot.body
+
+    def put(self, city_id: int, version: int, body: bytes):
+        with self._lock:
+            current = self._entries.get(city_id)
+            if current is None or current.version <= version:
+                self._entries[city_id] = _Snapshot(version, body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tree_cache = TreeCache()
+
+
+def build_tree(db: Session, city_id: int) -> list:
+    """Nested [{id, name, children}] for a city, siblings ordered by name"""
+    categories = db.query(Category.id, Category.name, Category.parent_id).filter(
+        Category.city_id == city_id
+    ).order_by(Category.name, Category.id).all()
+
+    nodes = {row.id: {"id": row.id, "name": row.name, "children": []} for row in categories}
+    roots = []
+    for row in categories:
+        parent = nodes.get(row.parent_id)
+        (parent["children"] if parent is not None else roots).append(nodes[row.id])
+    return roots
+
+
+def get_tree(db: Session, city_id: int) -> Optional[Tuple[int, bytes]]:
+    """(version, serialized tree) for a city, or None if the city does not exist"""
+    version = db.query(City.category_version).filter(City.id == city_id).scalar()
+    if version is None:
+        return None
+
+    body = tree_cache.get(city_id, version)
+    if body is not None:
+        cache_requests.inc(result="hit")
+        return version, body
+
+    cache_requests.inc(result="miss")
+    payload = {"city_id": city_id, "version": version, "categories": build_tree(db, city_id)}
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tree_cache.put(city_id, version, body)
+    return version, body
+
+
+__all__ = [
+    "CategoryMoveError", "add_category", "move_category", "is_in_subtree", "rebuild_closure",
+    "bump_version", "filter_subtree", "TreeCache", "tree_cache", "build_tree", "get_tree",
+]
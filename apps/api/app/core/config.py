@@ -5,11 +5,48 @@ import json
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    LEGACY_DATABASE_URL: str = ""  # Old zeta-bot catalog (ProductLegacy); empty = DATABASE_URL
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REDIS_URL: str = "redis://localhost:6379/0"
     CORS_ORIGINS: str = '["http://localhost:3000"]'
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    LOGIN_RATE_LIMIT_ATTEMPTS: int = 10
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    DEBUG: bool = False
+    SLOW_QUERY_THRESHOLD_MS: int = 200
+    QUERY_REPEAT_THRESHOLD: int = 5
+    ESCALATION_LEASE_SECONDS: int = 900
+    ESCALATION_COALESCE_WINDOW_SECONDS: int = 1800
+    DOCUMENT_STORAGE_PATH: str = "/data/documents"
+    DOCUMENT_MAX_FILE_SIZE: int = 50 * 1024 * 1024
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_JOB_TIMEOUT_SECONDS: int = 300
+    EXTRACTION_MEMORY_LIMIT_MB: int = 512
+    EXTRACTION_MAX_ATTEMPTS: int = 2
+    EXTRACTION_POLL_SECONDS: float = 2.0
+    DOCUMENT_EMBEDDER: str = "hashing"
+    DOCUMENT_VECTOR_NPROBE: int = 8
+    CONVERSATION_IDLE_MINUTES: int = 30
+    CONVERSATION_CACHE_MAX_ENTRIES: int = 50000
+    MESSAGE_BATCH_MAX: int = 500
+    PARTITION_MONTHS_AHEAD: int = 2
+    ARCHIVE_PATH: str = "/data/archive"
+    ARCHIVE_AFTER_DAYS: int = 365
+    IMAGE_CACHE_PATH: str = "/data/images"
+    IMAGE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    IMAGE_SOURCE_ROOT: str = "/data/media"
+    IMAGE_PUBLIC_BASE_URL: str = ""
+    IMAGE_WORKERS: int = 2
+    IMAGE_MAX_PENDING: int = 32
+    IMAGE_FETCH_TIMEOUT_SECONDS: int = 10
+    IMAGE_RENDER_TIMEOUT_SECONDS: int = 30
+    IMAGE_MAX_SOURCE_BYTES: int = 20 * 1024 * 1024
     
     @property
     def cors_origins_list(self) -> List[str]:
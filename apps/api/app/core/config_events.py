@@ -0,0 +1,93 @@
+"""
+Bot configuration change stream.
+
+Every bot config write publishes {"version", "config"} to the Redis channel
+bot_config:{city_id}. The SSE endpoint relays these messages to subscribed bots,
+so config changes reach them within a second instead of on the next poll.
+Redis is optional: if it is unavailable, bots fall back to periodic polling.
+"""
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.metrics import track_redis
+
+logger = logging.getLogger(__name__)
+
+_sync_client: Optional[redis.Redis] = None
+_async_client: Optional[aioredis.Redis] = None
+
+
+def config_channel(city_id: int) -> str:
+    return f"bot_config:{city_id}"
+
+
+def get_sync_redis() -> redis.Redis:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _sync_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.REDIS_URL)
+    return _async_client
+
+
+def publish_config_update(city_id: int, version: int, config: dict):
+    """Publish a config change from sync code; failures only delay delivery until the next poll"""
+    message = json.dumps({"version": version, "config": config}, default=str)
+    try:
+        with track_redis("publish"):
+            get_sync_redis().publish(config_channel(city_id), message)
+    except Exception as e:
+        logger.warning(f"Config update publish failed for city {city_id}: {e}")
+
+
+async def publish_config_update_async(city_id: int, version: int, config: dict):
+    message = json.dumps({"version": version, "config": config}, default=str)
+    try:
+        with track_redis("publish"):
+            await get_async_redis().publish(config_channel(city_id), message)
+    except Exception as e:
+        logger.warning(f"Config update publish failed for city {city_id}: {e}")
+
+
+@asynccontextmanager
+async def config_subscription(city_id: int) -> AsyncIterator[aioredis.client.PubSub]:
+    """Subscribe to a city's config channel for the duration of the block"""
+    pubsub = get_async_redis().pubsub()
+    await pubsub.subscribe(config_channel(city_id))
+    try:
+        yield pubsub
+    finally:
+        await pubsub.unsubscribe(config_channel(city_id))
+        await pubsub.close()
+
+
+async def next_config_update(pubsub: aioredis.client.PubSub, timeout: float) -> Optional[dict]:
+    """Wait up to `timeout` seconds for the next update; None if nothing arrived"""
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+    if message is None:
+        return None
+    try:
+        return json.loads(message["data"])
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring malformed config update: {message['data']!r}")
+        return None
+
+
+__all__ = [
+    "config_channel",
+    "publish_config_update",
+    "publish_config_update_async",
+    "config_subscription",
+    "next_config_update",
+]
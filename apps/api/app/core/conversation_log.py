@@ -0,0 +1,217 @@
+"""
+Conversation logging for bot traffic.
+
+The bots buffer chat messages and post them in batches
+(POST /conversations/messages/batch); this module files each message under
+a Conversation. A user's conversation is their latest one for the city and
+channel, until they go quiet for CONVERSATION_IDLE_MINUTES: the next message
+closes it (ended_at = its last message) and starts a new one.
+
+Resolving a user to a conversation needs the latest conversation and its
+last message time. ConversationCache keeps that per (city, channel, user) in
+process, so a steady chat costs one bulk INSERT per batch and no lookups.
+A cached entry is only trusted while it says the conversation is still
+active; an entry that looks idle is re-read from the database, because
+another API worker may have appended to that conversation since.
+A late or retried batch older than the latest conversation is filed under the
+conversation it falls in (or a new one), never under the newer conversation.
+
+Bots send a client_id with each message. A batch retried after a timeout
+(the API had committed it, the bot never heard back) skips the messages
+already stored, via the unique (client_id, created_at) index.
+"""
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import counter
+from app.models.conversation import Conversation
+from app.models.message import Message, MessageRole
+
+cache_requests = counter(
+    "zeta_conversation_cache_requests_total",
+    "Conversation lookups for logged bot messages by result (hit, miss)",
+    ["result"],
+)
+
+CacheKey = Tuple[int, str, str]  # (city_id, channel, user id)
+
+
+class LoggedMessage(NamedTuple):
+    user_id: str
+    role: MessageRole
+    content: str
+    created_at: datetime  # Naive UTC, like the rest of the conversations tables
+    client_id: Optional[str] = None
+
+
+class _Entry(NamedTuple):
+    conversation_id: int
+    started_at: datetime
+    last_message_at: datetime
+
+
+class ConversationCache:
+    """Bounded LRU of (city, channel, user) -> latest conversation and its last message time"""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: CacheKey, conversation_id: int, started_at: datetime, last_message_at: datetime):
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current.last_message_at > last_message_at:
+                return  # A concurrent batch already recorded later activity
+            self._entries[key] = _Entry(conversation_id, started_at, last_message_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+conversation_cache = ConversationCache(max_entries=settings.CONVERSATION_CACHE_MAX_ENTRIES)
+
+
+def _idle_timeout() -> timedelta:
+    return timedelta(minutes=settings.CONVERSATION_IDLE_MINUTES)
+
+
+def _latest_conversation(db: Session, key: CacheKey, started_by: Optional[datetime] = None) -> Optional[Conversation]:
+    city_id, channel, user_id = key
+    query = db.query(Conversation).filter(
+        Conversation.city_id == city_id,
+        Conversation.channel == channel,
+        Conversation.user_telegram_id == user_id
+    )
+    if started_by is not None:
+        query = query.filter(Conversation.started_at <= started_by)
+    return query.order_by(Conversation.started_at.desc()).first()
+
+
+def _resolve(db: Session, key: CacheKey, first_at: datetime) -> Tuple[Optional[int], Optional[datetime], Optional[datetime]]:
+    """(conversation id, its start, its last message time) that a message at `first_at` continues, or Nones"""
+    entry = conversation_cache.get(key)
+    if entry is not None and entry.started_at <= first_at and first_at - entry.last_message_at < _idle_timeout():
+        cache_requests.inc(result="hit")
+        return entry.conversation_id, entry.started_at, entry.last_message_at
+
+    cache_requests.inc(result="miss")
+    conversation = _latest_conversation(db, key)
+    if conversation is not None and first_at < conversation.started_at:
+        # Late or retried batch from before the latest conversation: it belongs to an earlier one
+        conversation = _latest_conversation(db, key, started_by=first_at)
+        if conversation is None:
+            return None, None, None
+        last_at = conversation.last_message_at or conversation.started_at
+        if first_at - last_at < _idle_timeout():
+            return conversation.id, conversation.started_at, last_at
+        return None, None, None
+    if conversation is None or conversation.ended_at is not None:
+        return None, None, None
+    last_at = conversation.last_message_at or conversation.started_at
+    if first_at - last_at < _idle_timeout():
+        return conversation.id, conversation.started_at, last_at
+    conversation.ended_at = last_at
+    return None, None, None
+
+
+def _start(db: Session, key: CacheKey, started_at: datetime) -> int:
+    city_id, channel, user_id = key
+    conversation = Conversation(
+        city_id=city_id,
+        channel=channel,
+        user_telegram_id=user_id,
+        started_at=started_at,
+        last_message_at=started_at
+    )
+    db.add(conversation)
+    db.flush()
+    return conversation.id
+
+
+# executemany: one statement for every conversation in the batch; never moves last_message_at backwards
+_conversations = Conversation.__table__
+_TOUCH = _conversations.update().where(
+    _conversations.c.id == bindparam("conversation_key"),
+    or_(_conversations.c.last_message_at.is_(None), _conversations.c.last_message_at < bindparam("last_at"))
+).values(last_message_at=bindparam("last_at"))
+
+
+def log_messages(db: Session, city_id: int, channel: str, messages: Iterable[LoggedMessage]) -> Dict[str, int]:
+    """
+    File a batch of bot messages under their users' conversations and commit.
+    Returns counts of messages stored (not counting ones already stored under
+    the same client_id) and conversations started.
+    """
+    by_user: Dict[str, List[LoggedMessage]] = defaultdict(list)
+    for message in messages:
+        by_user[message.user_id].append(message)
+
+    rows = []
+    latest: Dict[CacheKey, _Entry] = {}
+    touched: Dict[int, datetime] = {}
+    started = 0
+    for user_id, user_messages in by_user.items():
+        key = (city_id, channel, user_id)
+        user_messages.sort(key=lambda message: message.created_at)
+        conversation_id, started_at, last_at = _resolve(db, key, user_messages[0].created_at)
+        for message in user_messages:
+            if conversation_id is not None and message.created_at - last_at >= _idle_timeout():
+                db.query(Conversation).filter(Conversation.id == conversation_id).update(
+                    {Conversation.ended_at: last_at, Conversation.last_message_at: last_at},
+                    synchronize_session=False
+                )
+                conversation_id = None
+            if conversation_id is None:
+                conversation_id = _start(db, key, message.created_at)
+                started_at = message.created_at
+                started += 1
+            last_at = max(last_at or message.created_at, message.created_at)
+            touched[conversation_id] = last_at
+            rows.append({
+                "conversation_id": conversation_id,
+                "role": message.role,
+                "content": message.content,
+                "client_id": message.client_id,
+                "created_at": message.created_at,
+            })
+        latest[key] = _Entry(conversation_id, started_at, last_at)
+
+    stored = 0
+    if rows:
+        stored = len(db.execute(
+            pg_insert(Message).on_conflict_do_nothing(
+                index_elements=[Message.client_id, Message.created_at]
+            ).returning(Message.id),
+            rows
+        ).all())
+        db.execute(_TOUCH, [
+            {"conversation_key": conversation_id, "last_at": last_at}
+            for conversation_id, last_at in touched.items()
+        ])
+    db.commit()
+
+    for key, entry in latest.items():
+        conversation_cache.put(key, entry.conversation_id, entry.started_at, entry.last_message_at)
+    return {"stored": stored, "conversations_started": started}
+
+
+__all__ = ["ConversationCache", "conversation_cache", "LoggedMessage", "log_messages"]
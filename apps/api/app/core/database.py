@@ -1,13 +1,52 @@
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.core.config import settings
+from app.core.metrics import gauge, histogram
+from app.core.query_stats import instrument_engine
 
-engine = create_engine(settings.DATABASE_URL)
+pool_checkout_wait = histogram(
+    "zeta_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+)
+pool_connections = gauge(
+    "zeta_db_pool_connections",
+    "SQLAlchemy pool connections by state",
+    ["state"],
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+engine = create_engine(settings.DATABASE_URL, poolclass=InstrumentedQueuePool)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+pool_connections.set_function(lambda: engine.pool.checkedout(), state="checked_out")
+pool_connections.set_function(lambda: engine.pool.checkedin(), state="idle")
+pool_connections.set_function(lambda: engine.pool.overflow(), state="overflow")
+
 Base = declarative_base()
 
+# The old zeta-bot catalog (app.models.product_legacy) may live in its own database
+if settings.LEGACY_DATABASE_URL and settings.LEGACY_DATABASE_URL != settings.DATABASE_URL:
+    legacy_engine = create_engine(settings.LEGACY_DATABASE_URL, poolclass=InstrumentedQueuePool)
+    instrument_engine(legacy_engine)
+else:
+    legacy_engine = engine
+LegacySessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=legacy_engine)
+
 
 def get_db():
     db = SessionLocal()
@@ -15,3 +54,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_legacy_db():
+    db = LegacySessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,372 @@
+"""
+Per-city BM25 index over extracted document text.
+
+Every document gets one immutable segment file, {city}/index/{document_id}.seg,
+written by the extraction worker once the text is out and removed when the
+document is deleted. That keeps updates incremental without merges: a
+city's index is simply the set of its segment files. Global BM25 statistics
+(chunk count, average length, document frequency) are summed across
+segments at query time, which is a handful of binary searches per term.
+
+Segment layout (native byte order, every section 4-byte aligned):
+
+    header    HEADER
+    chunks    n_chunks x (page, n_tokens, text_off, text_len, label_off, label_len)  uint32
+    terms     n_terms  x (term_off, term_len, postings_off, df), sorted by term bytes  uint32
+    postings  df x (chunk, tf) per term                                              uint32
+    blob      UTF-8 terms, labels and chunk texts; *_off are byte offsets into it
+
+Segments are memory-mapped and read in place through memoryview casts, so
+opening one costs a few syscalls and only touched pages are read from disk.
+
+Like app.core.extraction this module has no settings or database imports:
+segments are built inside the extraction child process.
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"ZBM1"
+VERSION = 1
+HEADER = struct.Struct("=4sIIIIQIIII")  # magic, version, document_id, n_chunks, n_terms, total_tokens, 4 section offsets
+CHUNK_FIELDS = 6
+TERM_FIELDS = 4
+
+CHUNK_CHARS = 1200
+EXCERPT_CHARS = 240
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+CYRILLIC_RE = re.compile(r"[а-я]")
+# Light Russian suffix stripping; longest ending first, the stem keeps at least 3 letters
+ENDINGS = sorted([
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ых", "их",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ую", "юю",
+    "ов", "ев", "ам", "ям", "ах", "ях", "ом", "ем", "ью",
+    "а", "я", "ы", "и", "о", "е", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+MIN_STEM = 3
+
+
+def normalize_token(token: str) -> Optional[str]:
+    token = token.lower().replace("ё", "е")
+    if len(token) < 2 and not token.isdigit():
+        return None
+    if CYRILLIC_RE.search(token):
+        for ending in ENDINGS:
+            if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM:
+                return token[:-len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [term for term in (normalize_token(m.group()) for m in TOKEN_RE.finditer(text)) if term]
+
+
+def _align(buffer: bytearray):
+    buffer.extend(b"\0" * (-len(buffer) % 4))
+
+
+def chunk_pages(pages: Iterable[Tuple[int, str, str]]) -> Iterator[Tuple[int, str, str]]:
+    """Split each page into chunks of about CHUNK_CHARS on line boundaries, keeping the page reference"""
+    for page, label, text in pages:
+        batch, size = [], 0
+        for line in text.splitlines():
+            line = line.strip()
+            while len(line) > CHUNK_CHARS:
+                if batch:
+                    yield page, label, "\n".join(batch)
+                    batch, size = [], 0
+                cut = line.rfind(" ", 0, CHUNK_CHARS)
+                cut = cut if cut > 0 else CHUNK_CHARS
+                yield page, label, line[:cut]
+                line = line[cut:].strip()
+            if not line:
+                continue
+            if size + len(line) > CHUNK_CHARS and batch:
+                yield page, label, "\n".join(batch)
+                batch, size = [], 0
+            batch.append(line)
+            size += len(line) + 1
+        if batch:
+            yield page, label, "\n".join(batch)
+
+
+def build_segment(document_id: int, pages: Iterable[Tuple[int, str, str]], destination: str) -> int:
+    """Index (page, label, text) pages into a segment file, written atomically; returns the chunk count"""
+    blob = bytearray()
+    chunk_records = []
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    total_tokens = 0
+
+    for chunk_id, (page, label, text) in enumerate(chunk_pages(pages)):
+        terms = tokenize(text)
+        counts: Dict[str, int] = defaultdict(int)
+        for term in terms:
+            counts[term] += 1
+        for term, tf in counts.items():
+            postings[term].append((chunk_id, tf))
+        total_tokens += len(terms)
+
+        label_bytes = label.encode("utf-8")
+        text_bytes = text.encode("utf-8")
+        label_off = len(blob)
+        blob += label_bytes
+        text_off = len(blob)
+        blob += text_bytes
+        chunk_records.append((page, len(terms), text_off, len(text_bytes), label_off, len(label_bytes)))
+
+    term_records = []
+    posting_values = array("I")
+    for term_bytes, term in sorted((term.encode("utf-8"), term) for term in postings):
+        entries = postings[term]
+        term_records.append((len(blob), len(term_bytes), len(posting_values), len(entries)))
+        blob += term_bytes
+        for chunk_id, tf in entries:
+            posting_values.extend((chunk_id, tf))
+
+    # array("I") matches the memoryview.cast("I") used by Segment
+    body = bytearray()
+    chunks_off = HEADER.size + (-HEADER.size % 4)
+    body += array("I", (v for r in chunk_records for v in r)).tobytes()
+    terms_off = chunks_off + len(body)
+    body += array("I", (v for r in term_records for v in r)).tobytes()
+    postings_off = chunks_off + len(body)
+    body += array("I", posting_values).tobytes()
+    blob_off = chunks_off + len(body)
+
+    header = bytearray(HEADER.pack(
+        MAGIC, VERSION, document_id, len(chunk_records), len(term_records), total_tokens,
+        chunks_off, terms_off, postings_off, blob_off,
+    ))
+    _align(header)
+
+    Path(destination).parent.mkdir(parents=True, exist_ok=True)
+    partial = destination + ".part"
+    with open(partial, "wb") as out:
+        out.write(header)
+        out.write(body)
+        out.write(blob)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(partial, destination)
+    return len(chunk_records)
+
+
+def build_segment_from_text(document_id: int, text_file: str, destination: str) -> int:
+    """Index the NDJSON pages written by app.core.extraction"""
+    def pages():
+        with open(text_file, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                yield record["page"], record.get("label") or f"p. {record['page']}", record["text"]
+
+    return build_segment(document_id, pages(), destination)
+
+
+class Segment:
+    """Read-only view of one segment file, memory-mapped"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.document_id, self.n_chunks, self.n_terms, self.total_tokens,
+         chunks_off, terms_off, postings_off, blob_off) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a v{VERSION} index segment")
+        view = memoryview(self._mm)
+        self._chunks = view[chunks_off:terms_off].cast("I")
+        self._terms = view[terms_off:postings_off].cast("I")
+        self._postings = view[postings_off:blob_off].cast("I")
+        self._blob = view[blob_off:]
+
+    def _term(self, index: int) -> bytes:
+        base = index * TERM_FIELDS
+        offset = self._terms[base]
+        return self._blob[offset:offset + self._terms[base + 1]].tobytes()
+
+    def lookup(self, term: str) -> Tuple[int, int]:
+        """(postings offset, df); df is 0 when the term is absent"""
+        target = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._term(lo) == target:
+            base = lo * TERM_FIELDS
+            return self._terms[base + 2], self._terms[base + 3]
+        return 0, 0
+
+    def postings(self, offset: int, df: int) -> Iterator[Tuple[int, int]]:
+        values = self._postings[offset:offset + 2 * df]
+        return zip(values[0::2], values[1::2])
+
+    def chunk_length(self, chunk: int) -> int:
+        return self._chunks[chunk * CHUNK_FIELDS + 1]
+
+    def chunk(self, chunk: int) -> Tuple[int, str, str]:
+        """(page, label, text)"""
+        base = chunk * CHUNK_FIELDS
+        page, _, text_off, text_len, label_off, label_len = self._chunks[base:base + CHUNK_FIELDS]
+        label = self._blob[label_off:label_off + label_len].tobytes().decode("utf-8")
+        text = self._blob[text_off:text_off + text_len].tobytes().decode("utf-8")
+        return page, label, text
+
+
+class SegmentCache:
+    """
+    LRU of open segments keyed by path, revalidated by mtime and size.
+
+    A rebuilt segment is a new file renamed over the old one, so a changed
+    stat means reopen; readers still holding the old mapping keep working.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], Segment]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[Segment]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.evict(path)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                return entry[1]
+        segment = Segment(path)
+        with self._lock:
+            self._entries[path] = (stamp, segment)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return segment
+
+    def evict(self, path: str):
+        with self._lock:
+            self._entries.pop(path, None)
+
+
+segment_cache = SegmentCache()
+
+
+@dataclass
+class SearchHit:
+    document_id: int
+    page: int
+    label: str
+    score: float
+    excerpt: str
+    highlights: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def _excerpt(text: str, terms: set) -> Tuple[str, List[Tuple[int, int]]]:
+    """Window of about EXCERPT_CHARS with the most query-term matches, and match spans within it"""
+    spans = [m.span() for m in TOKEN_RE.finditer(text) if normalize_token(m.group()) in terms]
+    if len(text) <= EXCERPT_CHARS:
+        return text, spans
+
+    best_start, best_count = 0, 0
+    for i, (start, _) in enumerate(spans):
+        count = sum(1 for s, e in spans[i:] if e <= start + EXCERPT_CHARS)
+        if count > best_count:
+            best_start, best_count = start, count
+    # Lead in with a little context, snapped to a word boundary
+    start = max(0, best_start - EXCERPT_CHARS // 4)
+    if start:
+        space = text.find(" ", start, best_start)
+        start = space + 1 if space != -1 else start
+    end = min(len(text), start + EXCERPT_CHARS)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+
+    prefix = "…" if start else ""
+    suffix = "…" if end < len(text) else ""
+    shift = len(prefix) - start
+    excerpt = prefix + text[start:end].strip("\n") + suffix
+    highlights = [(s + shift, e + shift) for s, e in spans if s >= start and e <= end]
+    return excerpt, highlights
+
+
+def search(segments: List[Segment], query: str, limit: int = 5) -> List[SearchHit]:
+    """BM25 over all chunks of `segments`"""
+    terms = set(tokenize(query))
+    if not terms or not segments:
+        return []
+
+    n_chunks = sum(segment.n_chunks for segment in segments)
+    total_tokens = sum(segment.total_tokens for segment in segments)
+    if not n_chunks:
+        return []
+    avg_length = total_tokens / n_chunks
+
+    lookups = {term: [segment.lookup(term) for segment in segments] for term in terms}
+    scores: Dict[Tuple[int, int], float] = defaultdict(float)
+    for term, per_segment in lookups.items():
+        df = sum(entry[1] for entry in per_segment)
+        if not df:
+            continue
+        idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+        for index, (offset, segment_df) in enumerate(per_segment):
+            if not segment_df:
+                continue
+            segment = segments[index]
+            for chunk, tf in segment.postings(offset, segment_df):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.chunk_length(chunk) / avg_length)
+                scores[(index, chunk)] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    ranked = heapq.nlargest(limit * 4, scores.items(), key=lambda item: item[1])
+    return collect_hits(((segments[index], chunk, score) for (index, chunk), score in ranked), query, limit)
+
+
+def collect_hits(ranked: Iterable[Tuple[Segment, int, float]], query: str, limit: int) -> List[SearchHit]:
+    """
+    Turn best-first (segment, chunk, score) into hits with highlighted excerpts,
+    keeping the best chunk per page: neighbouring chunks of one page would
+    repeat the same reference.
+    """
+    terms = set(tokenize(query))
+    hits = []
+    seen_pages = set()
+    for segment, chunk, score in ranked:
+        page, label, text = segment.chunk(chunk)
+        if (segment.document_id, page) in seen_pages:
+            continue
+        seen_pages.add((segment.document_id, page))
+        excerpt, highlights = _excerpt(text, terms)
+        hits.append(SearchHit(segment.document_id, page, label, round(score, 4), excerpt, highlights))
+        if len(hits) == limit:
+            break
+    return hits
+
+
+__all__ = [
+    "tokenize",
+    "build_segment",
+    "build_segment_from_text",
+    "Segment",
+    "SegmentCache",
+    "segment_cache",
+    "SearchHit",
+    "search",
+    "collect_hits",
+]
@@ -0,0 +1,48 @@
+"""
+On-disk layout for uploaded documents, relative to DOCUMENT_STORAGE_PATH:
+
+    {city_id}/objects/ab/ab12...{ext}   original bytes, named by SHA-256
+    {city_id}/text/ab12....ndjson       extracted text, one {"page", "label", "text"} line per page
+    {city_id}/index/{document_id}.seg   BM25 segment of that text (app.core.doc_index)
+    {city_id}/vectors/                  chunk embeddings (app.core.vector_index)
+    {city_id}/reports/{import_id}.csv   price changes applied by a price-list import (app.core.price_lists)
+    {city_id}/tmp/                      partial uploads and extraction output
+"""
+from pathlib import Path
+
+from app.core.config import settings
+
+
+def storage_root() -> Path:
+    return Path(settings.DOCUMENT_STORAGE_PATH)
+
+
+def object_path(city_id: int, sha256: str, ext: str) -> Path:
+    return storage_root() / str(city_id) / "objects" / sha256[:2] / f"{sha256}{ext}"
+
+
+def text_path(city_id: int, sha256: str) -> Path:
+    return storage_root() / str(city_id) / "text" / f"{sha256}.ndjson"
+
+
+def index_dir(city_id: int) -> Path:
+    return storage_root() / str(city_id) / "index"
+
+
+def index_path(city_id: int, document_id: int) -> Path:
+    return index_dir(city_id) / f"{document_id}.seg"
+
+
+def vectors_dir(city_id: int) -> Path:
+    return storage_root() / str(city_id) / "vectors"
+
+
+def report_path(city_id: int, import_id: int) -> Path:
+    return storage_root() / str(city_id) / "reports" / f"{import_id}.csv"
+
+
+def tmp_dir(city_id: int) -> Path:
+    return storage_root() / str(city_id) / "tmp"
+
+
+__all__ = ["storage_root", "object_path", "text_path", "index_dir", "index_path", "vectors_dir", "report_path", "tmp_dir"]
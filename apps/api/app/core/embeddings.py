@@ -0,0 +1,100 @@
+"""
+Local text embedders for document chunks.
+
+An embedder is chosen by a spec string (settings.DOCUMENT_EMBEDDER):
+
+    hashing                                 feature hashing of word stems and
+                                            character trigrams; no model, no deps
+    sentence-transformers:<model name>      e.g. sentence-transformers:intfloat/multilingual-e5-small
+
+Every embedder returns L2-normalized float32 rows, so dot product is cosine
+similarity. The spec is stored with each vector store: vectors from
+different embedders are never mixed.
+"""
+import zlib
+from typing import List
+
+import numpy as np
+
+from app.core.doc_index import tokenize
+
+
+class Embedder:
+    """Base class; subclasses set `spec` and `dim` and implement embed()"""
+
+    spec: str = ""
+    dim: int = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Signed feature hashing of stems (weight 1) and their character trigrams
+    (weight 0.5). Trigrams make typos and inflections land near each other;
+    it is lexical, not semantic, but needs nothing beyond NumPy.
+    """
+
+    spec = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str):
+        for token in tokenize(text):
+            yield token, 1.0
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += weight if h & 0x80000000 else -weight
+        # Dampen repeated features the way sublinear tf does
+        matrix = np.sign(matrix) * np.sqrt(np.abs(matrix))
+        return _normalize(matrix)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Any sentence-transformers model, run locally on CPU"""
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError("sentence-transformers is not installed")
+        self.spec = f"sentence-transformers:{model_name}"
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self._model.encode(texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True)
+        return vectors.astype(np.float32)
+
+
+_embedders = {}
+
+
+def get_embedder(spec: str) -> Embedder:
+    """Embedder for `spec`, created once per process (models are slow to load)"""
+    if spec not in _embedders:
+        if spec == "hashing":
+            _embedders[spec] = HashingEmbedder()
+        elif spec.startswith("sentence-transformers:"):
+            _embedders[spec] = SentenceTransformerEmbedder(spec.split(":", 1)[1])
+        else:
+            raise ValueError(f"Unknown embedder '{spec}'")
+    return _embedders[spec]
+
+
+__all__ = ["Embedder", "HashingEmbedder", "SentenceTransformerEmbedder", "get_embedder"]
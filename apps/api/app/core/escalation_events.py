@@ -0,0 +1,64 @@
+"""
+Escalation change feed.
+
+Creating, claiming, releasing or updating an escalation publishes
+{"type", "escalation"} (summary columns only) to the Redis channel
+escalations:{city_id}; the inbox SSE endpoint relays it to connected dashboards.
+Delivery is best effort: a dashboard that reconnects reloads the inbox page.
+"""
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import redis.asyncio as aioredis
+
+from app.core.config_events import get_async_redis, get_sync_redis
+from app.core.metrics import track_redis
+
+logger = logging.getLogger(__name__)
+
+
+def escalation_channel(city_id: int) -> str:
+    return f"escalations:{city_id}"
+
+
+def publish_escalation_event(city_id: int, event_type: str, escalation: dict):
+    """Publish from sync route code; failures are logged and never fail the request"""
+    message = json.dumps({"type": event_type, "escalation": escalation}, default=str)
+    try:
+        with track_redis("publish"):
+            get_sync_redis().publish(escalation_channel(city_id), message)
+    except Exception as e:
+        logger.warning(f"Escalation event publish failed for city {city_id}: {e}")
+
+
+@asynccontextmanager
+async def escalation_subscription(city_id: int) -> AsyncIterator[aioredis.client.PubSub]:
+    pubsub = get_async_redis().pubsub()
+    await pubsub.subscribe(escalation_channel(city_id))
+    try:
+        yield pubsub
+    finally:
+        await pubsub.unsubscribe(escalation_channel(city_id))
+        await pubsub.close()
+
+
+async def next_escalation_event(pubsub: aioredis.client.PubSub, timeout: float) -> Optional[dict]:
+    """Wait up to `timeout` seconds for the next event; None if nothing arrived"""
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+    if message is None:
+        return None
+    try:
+        return json.loads(message["data"])
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring malformed escalation event: {message['data']!r}")
+        return None
+
+
+__all__ = [
+    "escalation_channel",
+    "publish_escalation_event",
+    "escalation_subscription",
+    "next_escalation_event",
+]
@@ -0,0 +1,290 @@
+"""
+Document text extraction, run in a child process per job.
+
+Parsers yield one page at a time and the child writes each page to the
+output file as soon as it is parsed, so a 300-page catalog never has to fit
+in memory as a single string. What counts as a page depends on the format:
+
+    PDF          one PDF page
+    XLSX / XLS   ROWS_PER_PAGE rows of one sheet
+    DOCX / TXT   about CHARS_PER_PAGE characters, split on paragraph boundaries
+    CSV          ROWS_PER_PAGE rows
+
+This module must stay importable without app settings or a database:
+it is the entry point of spawned worker processes. Parser libraries are
+imported lazily so a missing one only fails jobs of that format.
+"""
+import csv
+import json
+import os
+import resource
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from app.core.doc_index import build_segment_from_text
+
+ROWS_PER_PAGE = 100
+CHARS_PER_PAGE = 4000
+
+Page = Tuple[str, str]  # (label, text)
+
+
+class ExtractionError(Exception):
+    """The file could not be parsed; the message is shown to the admin"""
+
+
+def _pdf_pages(path: Path) -> Tuple[Optional[int], Iterator[Page]]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ExtractionError("PDF support is not installed (pypdf)")
+
+    reader = PdfReader(str(path))
+    if reader.is_encrypted:
+        raise ExtractionError("PDF is encrypted")
+
+    def pages():
+        for number, page in enumerate(reader.pages, start=1):
+            yield f"p. {number}", page.extract_text() or ""
+
+    return len(reader.pages), pages()
+
+
+def _row_text(values) -> str:
+    return " | ".join(str(value).strip() for value in values if value is not None and str(value).strip())
+
+
+def _row_pages(sheet_name: Optional[str], rows: Iterator) -> Iterator[Page]:
+    prefix = f"{sheet_name}, " if sheet_name else ""
+    batch, first_row = [], 1
+    for number, row in enumerate(rows, start=1):
+        line = _row_text(row)
+        if line:
+            batch.append(line)
+        if number - first_row + 1 >= ROWS_PER_PAGE:
+            yield f"{prefix}rows {first_row}-{number}", "\n".join(batch)
+            batch, first_row = [], number + 1
+    if batch:
+        yield f"{prefix}rows {first_row}-{number}", "\n".join(batch)
+
+
+def _xlsx_pages(path: Path) -> Tuple[Optional[int], Iterator[Page]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ExtractionError("Excel support is not installed (openpyxl)")
+
+    # read_only streams rows from the zip instead of building the whole workbook
+    workbook = load_workbook(str(path), read_only=True, data_only=True)
+    total = 0
+    for sheet in workbook.worksheets:
+        if sheet.max_row is None:
+            total = None
+            break
+        total += -(-sheet.max_row // ROWS_PER_PAGE)
+
+    def pages():
+        try:
+            for sheet in workbook.worksheets:
+                yield from _row_pages(sheet.title, sheet.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+
+    return total, pages()
+
+
+def _xls_pages(path: Path) -> Tuple[Optional[int], Iterator[Page]]:
+    try:
+        import xlrd
+    except ImportError:
+        raise ExtractionError("Legacy .xls support is not installed (xlrd)")
+
+    workbook = xlrd.open_workbook(str(path), on_demand=True)
+    total = sum(-(-workbook.sheet_by_index(i).nrows // ROWS_PER_PAGE) for i in range(workbook.nsheets))
+
+    def pages():
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            yield from _row_pages(sheet.name, (sheet.row_values(r) for r in range(sheet.nrows)))
+            workbook.unload_sheet(index)
+
+    return total, pages()
+
+
+def _paragraph_pages(paragraphs: Iterator[str]) -> Iterator[Page]:
+    batch, size, number = [], 0, 1
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        batch.append(paragraph)
+        size += len(paragraph)
+        if size >= CHARS_PER_PAGE:
+            yield f"part {number}", "\n".join(batch)
+            batch, size, number = [], 0, number + 1
+    if batch:
+        yield f"part {number}", "\n".join(batch)
+
+
+def _docx_pages(path: Path) -> Tuple[Optional[int], Iterator[Page]]:
+    try:
+        import docx
+    except ImportError:
+        raise ExtractionError("DOCX support is not installed (python-docx)")
+
+    document = docx.Document(str(path))
+
+    def paragraphs():
+        for paragraph in document.paragraphs:
+            yield paragraph.text
+        for table in document.tables:
+            for row in table.rows:
+                yield _row_text(cell.text for cell in row.cells)
+
+    return None, _paragraph_pages(paragraphs())
+
+
+def _open_text(path: Path):
+    # Exports from 1C and Excel on Windows are often cp1251
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            head.decode(encoding)
+            return open(path, encoding=encoding, errors="replace", newline="")
+        except UnicodeDecodeError:
+            continue
+    return open(path, encoding="latin-1", newline="")
+
+
+def _csv_reader(f):
+    sample = f.read(8192)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    return csv.reader(f, dialect)
+
+
+def _csv_pages(path: Path) -> Tuple[Optional[int], Iterator[Page]]:
+    def pages():
+        with _open_text(path) as f:
+            yield from _row_pages(None, _csv_reader(f))
+
+    return None, pages()
+
+
+def _txt_pages(path: Path) -> Tuple[Optional[int], Iterator[Page]]:
+    def pages():
+        with _open_text(path) as f:
+            yield from _paragraph_pages(f)
+
+    return None, pages()
+
+
+def iter_table_rows(path: Path) -> Iterator[Tuple[Optional[str], int, tuple]]:
+    """
+    Stream (sheet name, 1-based row number, cell values) from a spreadsheet
+    or CSV without loading it whole; used by price-list ingestion.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with _open_text(path) as f:
+            for number, row in enumerate(_csv_reader(f), start=1):
+                yield None, number, tuple(row)
+    elif suffix == ".xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ExtractionError("Excel support is not installed (openpyxl)")
+        workbook = load_workbook(str(path), read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                for number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                    yield sheet.title, number, row
+        finally:
+            workbook.close()
+    elif suffix == ".xls":
+        try:
+            import xlrd
+        except ImportError:
+            raise ExtractionError("Legacy .xls support is not installed (xlrd)")
+        workbook = xlrd.open_workbook(str(path), on_demand=True)
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            for number in range(sheet.nrows):
+                yield sheet.name, number + 1, tuple(sheet.row_values(number))
+            workbook.unload_sheet(index)
+    else:
+        raise ExtractionError(f"Not a spreadsheet: {path.suffix}")
+
+
+PARSERS = {
+    ".pdf": _pdf_pages,
+    ".xlsx": _xlsx_pages,
+    ".xls": _xls_pages,
+    ".docx": _docx_pages,
+    ".csv": _csv_pages,
+    ".txt": _txt_pages,
+}
+
+
+def iter_pages(path: Path) -> Tuple[Optional[int], Iterator[Page]]:
+    """(page count if known up front, iterator of (label, text))"""
+    parser = PARSERS.get(path.suffix.lower())
+    if parser is None:
+        raise ExtractionError(f"Unsupported file type: {path.suffix}")
+    return parser(path)
+
+
+def extract_document(
+    source: str,
+    destination: str,
+    memory_limit_bytes: int,
+    conn,
+    document_id: int = 0,
+    index_destination: Optional[str] = None,
+):
+    """
+    Child process entry point.
+
+    Writes NDJSON pages to destination + ".part" and renames it into place
+    when done, then builds the document's search segment at
+    index_destination, if given. Reports over `conn`: ("progress", done, total)
+    after every page, then ("done", done, total) or ("error", message).
+    Embedding is not done here: models need more than the parse memory cap
+    (see app.core.extraction_jobs).
+    """
+    if memory_limit_bytes:
+        # Address-space cap: a pathological file raises MemoryError here instead of swapping the host
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+
+    partial = destination + ".part"
+    try:
+        total, pages = iter_pages(Path(source))
+        conn.send(("progress", 0, total))
+        done = 0
+        with open(partial, "w", encoding="utf-8") as out:
+            for label, text in pages:
+                done += 1
+                out.write(json.dumps({"page": done, "label": label, "text": text}, ensure_ascii=False))
+                out.write("\n")
+                conn.send(("progress", done, max(total, done) if total is not None else None))
+        os.replace(partial, destination)
+        if index_destination:
+            build_segment_from_text(document_id, destination, index_destination)
+        conn.send(("done", done, done))
+    except MemoryError:
+        conn.send(("error", "Memory limit exceeded while parsing"))
+    except ExtractionError as e:
+        conn.send(("error", str(e)))
+    except Exception as e:
+        conn.send(("error", f"Could not parse file: {type(e).__name__}: {e}"))
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        conn.close()
+
+
+__all__ = ["ExtractionError", "iter_pages", "iter_table_rows", "extract_document", "PARSERS"]
@@ -0,0 +1,324 @@
+"""
+Background document extraction jobs.
+
+The extraction_jobs table is the queue: uploads insert a "queued" row and
+return at once, and any number of worker processes claim rows with
+FOR UPDATE SKIP LOCKED, so two workers never take the same job.
+
+Each claimed job is parsed and indexed in its own spawned child process
+(app.core.extraction.extract_document) so that a job can be killed on
+timeout, its memory can be capped with RLIMIT_AS, and a parser crash only
+fails that one job. The parent relays per-page progress into the job row,
+which doubles as a heartbeat: jobs whose worker died are requeued once the
+heartbeat is stale, up to EXTRACTION_MAX_ATTEMPTS.
+
+The parsed chunks are then embedded in one long-lived embedding process
+shared by the worker's job slots. It has no memory cap (a model alone can
+outgrow the parse limit, and it only reads our own segment files) and loads
+the model once, not per job; it is restarted if it dies or overruns.
+
+After a successful job the city's vector index is rebuilt if its deltas
+have outgrown the base (app.core.vector_index.needs_rebuild), and price_list
+spreadsheets are applied to product prices (app.core.price_lists).
+
+Run a worker with:
+    python -m app.core.extraction_jobs
+    python -m app.core.extraction_jobs --rebuild-vectors 1 2   # force a rebuild and exit
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.document_storage import index_path, storage_root, text_path, vectors_dir
+from app.core.extraction import extract_document
+from app.core.price_lists import PRICE_LIST_SUFFIXES, ingest_price_list
+from app.core.vector_index import embed_segment, needs_rebuild, open_store, rebuild
+from app.models.document import Document
+from app.models.extraction_job import ExtractionJob
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+PROGRESS_WRITE_INTERVAL = 1.0  # Seconds between progress/heartbeat updates of a running job
+STALE_HEARTBEAT_GRACE = 60  # A running job silent this long past its timeout has lost its worker
+
+_spawn = multiprocessing.get_context("spawn")
+_embed_lock = threading.Lock()
+_embed_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _embedding_pool() -> ProcessPoolExecutor:
+    global _embed_pool
+    with _embed_lock:
+        if _embed_pool is None:
+            _embed_pool = ProcessPoolExecutor(max_workers=1, mp_context=_spawn)
+        return _embed_pool
+
+
+def _discard_embedding_pool(pool: ProcessPoolExecutor):
+    """Kill a stuck or broken embedding process; the next job starts a fresh one"""
+    global _embed_pool
+    with _embed_lock:
+        if _embed_pool is pool:
+            _embed_pool = None
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def enqueue_extraction(db: Session, document: Document) -> ExtractionJob:
+    """Add a queued job for `document`; the caller commits"""
+    job = ExtractionJob(document_id=document.id, city_id=document.city_id, status="queued")
+    db.add(job)
+    return job
+
+
+def latest_job(db: Session, document_id: int) -> Optional[ExtractionJob]:
+    return db.query(ExtractionJob).filter(
+        ExtractionJob.document_id == document_id
+    ).order_by(ExtractionJob.id.desc()).first()
+
+
+def claim_next_job(db: Session) -> Optional[ExtractionJob]:
+    """Take the oldest runnable job, including running jobs whose worker stopped heartbeating"""
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.EXTRACTION_JOB_TIMEOUT_SECONDS + STALE_HEARTBEAT_GRACE)
+
+    job = db.query(ExtractionJob).filter(
+        or_(
+            ExtractionJob.status == "queued",
+            (ExtractionJob.status == "running") & (ExtractionJob.heartbeat_at < stale_before)
+        )
+    ).order_by(ExtractionJob.created_at).with_for_update(skip_locked=True).first()
+    if job is None:
+        db.rollback()
+        return None
+
+    if job.attempts >= settings.EXTRACTION_MAX_ATTEMPTS:
+        job.status = "failed"
+        job.error = job.error or "Worker stopped responding"
+        job.finished_at = now
+        db.commit()
+        return claim_next_job(db)
+
+    job.status = "running"
+    job.attempts += 1
+    job.pages_done = 0
+    job.error = None
+    job.started_at = now
+    job.heartbeat_at = now
+    db.commit()
+    return job
+
+
+def _finish(db: Session, job: ExtractionJob, status: str, error: Optional[str] = None):
+    job.status = status
+    job.error = error
+    job.finished_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def run_job(db: Session, job: ExtractionJob):
+    """Parse the job's document in a child process, relaying progress until it finishes or times out"""
+    document = db.query(Document).filter(Document.id == job.document_id).first()
+    if document is None:
+        _finish(db, job, "failed", "Document was deleted")
+        return
+
+    source = storage_root() / document.storage_path
+    destination = text_path(document.city_id, document.sha256)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    receiver, sender = _spawn.Pipe(duplex=False)
+    process = _spawn.Process(
+        target=extract_document,
+        args=(
+            str(source), str(destination), settings.EXTRACTION_MEMORY_LIMIT_MB * 1024 * 1024, sender,
+            document.id, str(index_path(document.city_id, document.id)),
+        ),
+        daemon=True,
+    )
+    started = time.monotonic()
+    deadline = started + settings.EXTRACTION_JOB_TIMEOUT_SECONDS
+    process.start()
+    sender.close()  # Only the child writes; EOF on receiver then means the child exited
+
+    result = None
+    last_write = 0.0
+    try:
+        while result is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                result = ("error", f"Timed out after {settings.EXTRACTION_JOB_TIMEOUT_SECONDS}s")
+                break
+            if not receiver.poll(min(remaining, PROGRESS_WRITE_INTERVAL)):
+                if not process.is_alive():
+                    result = ("error", f"Extraction process exited unexpectedly (code {process.exitcode})")
+                continue
+            try:
+                message = receiver.recv()
+            except EOFError:
+                process.join(timeout=5)
+                result = ("error", f"Extraction process exited unexpectedly (code {process.exitcode})")
+                break
+
+            kind = message[0]
+            if kind == "progress":
+                job.pages_done, job.pages_total = message[1], message[2]
+                if time.monotonic() - last_write >= PROGRESS_WRITE_INTERVAL:
+                    job.heartbeat_at = datetime.now(timezone.utc)
+                    db.commit()
+                    last_write = time.monotonic()
+            elif kind == "done":
+                job.pages_done, job.pages_total = message[1], message[2]
+                result = message
+            else:
+                result = message
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join(timeout=5)
+        receiver.close()
+
+    if result[0] == "done":
+        error = _embed_document(db, job, document)
+        if error:
+            result = ("error", error)
+
+    elapsed = time.monotonic() - started
+    if result[0] == "done":
+        _finish(db, job, "done")
+        logger.info(f"✓ Extracted document {document.id}: {job.pages_done} pages in {elapsed:.1f}s")
+        # Independent follow-ups: a failed vector rebuild must not skip applying a price list
+        if document.doc_type == "price_list" and Path(document.storage_path).suffix.lower() in PRICE_LIST_SUFFIXES:
+            try:
+                ingest_price_list(db, document)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"✗ Price list ingestion of document {document.id} failed: {e}", exc_info=True)
+        try:
+            maintain_vectors(db, document.city_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"✗ Vector index maintenance for city {document.city_id} failed: {e}", exc_info=True)
+    else:
+        _finish(db, job, "failed", result[1])
+        logger.warning(f"✗ Extraction of document {document.id} failed after {elapsed:.1f}s: {result[1]}")
+
+
+def _embed_document(db: Session, job: ExtractionJob, document: Document) -> Optional[str]:
+    """Embed the document's search segment in the embedding process; returns an error message or None"""
+    pool = _embedding_pool()
+    future = pool.submit(
+        embed_segment,
+        str(index_path(document.city_id, document.id)), str(vectors_dir(document.city_id)), settings.DOCUMENT_EMBEDDER,
+    )
+    deadline = time.monotonic() + settings.EXTRACTION_JOB_TIMEOUT_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _discard_embedding_pool(pool)
+            return f"Embedding timed out after {settings.EXTRACTION_JOB_TIMEOUT_SECONDS}s"
+        try:
+            future.result(timeout=min(remaining, PROGRESS_WRITE_INTERVAL))
+            return None
+        except FuturesTimeout:
+            job.heartbeat_at = datetime.now(timezone.utc)
+            db.commit()
+        except BrokenProcessPool:
+            _discard_embedding_pool(pool)
+            return "Embedding process exited unexpectedly"
+        except Exception as e:
+            return f"Could not embed: {type(e).__name__}: {e}"
+
+
+def maintain_vectors(db: Session, city_id: int, force: bool = False) -> Optional[dict]:
+    """Rebuild the city's vector index when deltas or deleted rows have grown past the thresholds"""
+    live_ids = {row.id for row in db.query(Document.id).filter(Document.city_id == city_id)}
+    db.rollback()  # Don't sit in a transaction through k-means
+    store_dir = vectors_dir(city_id)
+    if not force and not needs_rebuild(open_store(store_dir), live_ids):
+        return None
+    stats = rebuild(store_dir, live_ids)
+    logger.info(f"🧭 Rebuilt vector index for city {city_id}: {stats}")
+    return stats
+
+
+def _worker_loop(stop: threading.Event):
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            job = claim_next_job(db)
+            if job is None:
+                stop.wait(settings.EXTRACTION_POLL_SECONDS)
+                continue
+            logger.info(f"⚙️ Extraction job {job.id} started (document {job.document_id}, attempt {job.attempts})")
+            run_job(db, job)
+        except Exception as e:
+            logger.error(f"Extraction worker error: {e}", exc_info=True)
+            db.rollback()
+            stop.wait(settings.EXTRACTION_POLL_SECONDS)
+        finally:
+            db.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Document extraction worker")
+    parser.add_argument(
+        "--rebuild-vectors", type=int, nargs="+", metavar="CITY_ID",
+        help="Rebuild these cities' vector indexes and exit instead of running the worker",
+    )
+    args = parser.parse_args()
+
+    if args.rebuild_vectors:
+        db = SessionLocal()
+        try:
+            for city_id in args.rebuild_vectors:
+                maintain_vectors(db, city_id, force=True)
+        finally:
+            db.close()
+        return
+
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info("Stopping extraction worker after current jobs")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    threads = [
+        threading.Thread(target=_worker_loop, args=(stop,), name=f"extract-{i}")
+        for i in range(settings.EXTRACTION_WORKERS)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info(f"🚀 Extraction worker running {len(threads)} slots")
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=1)
+    if _embed_pool is not None:
+        _embed_pool.shutdown(cancel_futures=True)
+
+
+__all__ = ["enqueue_extraction", "latest_job", "claim_next_job", "run_job", "maintain_vectors", "ACTIVE_STATUSES"]
+
+
+if __name__ == "__main__":
+    main()
+
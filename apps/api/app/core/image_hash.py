@@ -0,0 +1,330 @@
+"""
+Perceptual-hash index of product images for photo lookup.
+
+Customers often send screenshots of our own catalog pictures. Those survive
+re-encoding, resizing and light cropping with near-identical perceptual
+hashes, so a hash lookup finds the product in milliseconds, before the bots
+spend time on OCR or money on a Vision call.
+
+Each catalog image contributes one row:
+    pHash  64-bit DCT hash (structure)
+    dHash  64-bit gradient hash (edges)
+    color  64-bin RGB histogram, quantized to uint8 (separates recolored variants)
+
+The index is a single .npz of parallel arrays (~84 bytes per image) under
+IMAGE_CACHE_PATH. Lookups use multi-index hashing: the pHash is split into
+four 16-bit chunks with one table per chunk, and probing every chunk value
+within CHUNK_RADIUS bits finds every row within 4 * (CHUNK_RADIUS + 1) - 1
+bits of the query (pigeonhole), without scanning the catalog. Candidates are
+then ranked by pHash + dHash distance with the color distance as a tiebreak.
+
+Build (or rebuild) the index with:
+    python -m app.core.image_hash
+It hashes the cached 320px variants from app.core.images, rendering any
+that are missing, so it doubles as a pre-warm of those thumbnails.
+"""
+import io
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 bits per hash
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+CHUNK_RADIUS = 2  # Probes per chunk: 1 + 16 + 120; exact for pHash distances up to 11
+MAX_PHASH_DISTANCE = CHUNKS * (CHUNK_RADIUS + 1) - 1
+CONFIDENT_DISTANCE = 12  # pHash + dHash bits; at most this, the picture is the same one re-encoded or resized
+HASH_SOURCE_WIDTH = 320
+
+_DCT_SIZE = 32
+_DCT = np.cos(
+    np.pi * (2 * np.arange(_DCT_SIZE)[None, :] + 1) * np.arange(_DCT_SIZE)[:, None] / (2 * _DCT_SIZE)
+)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(64, dtype=np.uint64))[::-1]
+
+
+class ImageHashes(NamedTuple):
+    phash: int
+    dhash: int
+    color: np.ndarray  # uint8[64], sums to ~255
+
+
+class HashMatch(NamedTuple):
+    product_id: int
+    phash_distance: int
+    dhash_distance: int
+    color_distance: float  # L1 between normalized histograms, 0..2
+    confident: bool
+
+
+def index_path() -> Path:
+    return Path(settings.IMAGE_CACHE_PATH) / "phash_index.npz"
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int(np.bitwise_or.reduce(_BIT_WEIGHTS[bits.ravel()]))
+
+
+def _trim_border(image):
+    """Crop a uniform border (screenshot padding, letterboxing) if it leaves a reasonable picture"""
+    from PIL import Image, ImageChops
+
+    background = image.getpixel((0, 0))
+    diff = ImageChops.difference(image, Image.new("RGB", image.size, background))
+    bbox = ImageChops.add(diff, diff, 2.0, -24).getbbox()  # Ignore JPEG noise in the border
+    if not bbox:
+        return image
+    width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    if width < image.width * 0.3 or height < image.height * 0.3:
+        return image
+    return image.crop(bbox)
+
+
+def hash_image(data: bytes) -> ImageHashes:
+    """pHash, dHash and color histogram of an encoded image"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (HASH_SOURCE_WIDTH, HASH_SOURCE_WIDTH))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image = _trim_border(image)
+
+        gray = image.convert("L")
+        pixels = np.asarray(gray.resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.LANCZOS), dtype=np.float64)
+        low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+        phash = _bits_to_int(low > np.median(low.ravel()[1:]))  # DC term excluded from the median
+
+        small = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS), dtype=np.int16)
+        dhash = _bits_to_int(small[:, 1:] > small[:, :-1])
+
+        rgb = np.asarray(image.resize((64, 64), Image.Resampling.BILINEAR), dtype=np.uint8) >> 6  # 4 levels per channel
+        bins = np.bincount((rgb[..., 0] * 16 + rgb[..., 1] * 4 + rgb[..., 2]).ravel(), minlength=64)
+        color = np.round(bins * 255.0 / bins.sum()).astype(np.uint8)
+
+    return ImageHashes(phash, dhash, color)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(values).astype(np.int32)
+
+
+def _chunk(value, index: int):
+    return (value >> np.uint64(CHUNK_BITS * index)) & np.uint64((1 << CHUNK_BITS) - 1)
+
+
+def _neighbours(value: int) -> Iterable[int]:
+    """Every CHUNK_BITS-bit value within CHUNK_RADIUS bits of `value`"""
+    yield value
+    for radius in range(1, CHUNK_RADIUS + 1):
+        for bits in itertools.combinations(range(CHUNK_BITS), radius):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            yield flipped
+
+
+class HashIndex:
+    """In-memory arrays plus one chunk -> rows table per pHash chunk"""
+
+    def __init__(self, product_ids: np.ndarray, phashes: np.ndarray, dhashes: np.ndarray, colors: np.ndarray):
+        self.product_ids = product_ids
+        self.phashes = phashes
+        self.dhashes = dhashes
+        self.colors = colors.astype(np.float32) / 255.0
+        self._tables: List[Dict[int, np.ndarray]] = []
+        for index in range(CHUNKS):
+            keys = _chunk(phashes, index).astype(np.int64)
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            bounds = np.r_[starts, len(order)]
+            self._tables.append({
+                int(sorted_keys[start]): order[start:end] for start, end in zip(bounds[:-1], bounds[1:])
+            })
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def _candidates(self, phash: int) -> np.ndarray:
+        found = []
+        for index, table in enumerate(self._tables):
+            chunk = (phash >> (CHUNK_BITS * index)) & ((1 << CHUNK_BITS) - 1)
+            for probe in _neighbours(chunk):
+                rows = table.get(probe)
+                if rows is not None:
+                    found.append(rows)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def search(self, hashes: ImageHashes, limit: int = 5) -> List[HashMatch]:
+        """Closest products within MAX_PHASH_DISTANCE, best first, one entry per product"""
+        rows = self._candidates(hashes.phash)
+        if len(rows) == 0:
+            return []
+        phash_distance = _popcount(self.phashes[rows] ^ np.uint64(hashes.phash))
+        keep = phash_distance <= MAX_PHASH_DISTANCE
+        rows, phash_distance = rows[keep], phash_distance[keep]
+        dhash_distance = _popcount(self.dhashes[rows] ^ np.uint64(hashes.dhash))
+        query_color = hashes.color.astype(np.float32) / 255.0
+        color_distance = np.abs(self.colors[rows] - query_color).sum(axis=1)
+
+        order = np.lexsort((color_distance, phash_distance + dhash_distance))
+        matches, seen = [], set()
+        for i in order:
+            product_id = int(self.product_ids[rows[i]])
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            distance = int(phash_distance[i] + dhash_distance[i])
+            matches.append(HashMatch(
+                product_id=product_id,
+                phash_distance=int(phash_distance[i]),
+                dhash_distance=int(dhash_distance[i]),
+                color_distance=round(float(color_distance[i]), 3),
+                confident=distance <= CONFIDENT_DISTANCE,
+            ))
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+def save_index(product_ids: List[int], hashes: List[ImageHashes], path: Optional[Path] = None):
+    path = path or index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.part.npz")
+    np.savez(
+        tmp,
+        product_ids=np.asarray(product_ids, dtype=np.int32),
+        phashes=np.asarray([h.phash for h in hashes], dtype=np.uint64),
+        dhashes=np.asarray([h.dhash for h in hashes], dtype=np.uint64),
+        colors=np.asarray([h.color for h in hashes], dtype=np.uint8).reshape(len(hashes), 64),
+    )
+    os.replace(tmp, path)
+
+
+class _IndexHolder:
+    """The loaded index, reloaded when the file on disk is replaced"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp: Optional[int] = None
+        self._index: Optional[HashIndex] = None
+
+    def get(self) -> Optional[HashIndex]:
+        path = index_path()
+        try:
+            stamp = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if stamp != self._stamp:
+                with np.load(path) as data:
+                    self._index = HashIndex(data["product_ids"], data["phashes"], data["dhashes"], data["colors"])
+                self._stamp = stamp
+                logger.info(f"🖼️ Loaded image hash index: {len(self._index)} images")
+            return self._index
+
+
+_holder = _IndexHolder()
+
+
+def get_index() -> Optional[HashIndex]:
+    return _holder.get()
+
+
+def search_image(data: bytes, limit: int = 5) -> Tuple[List[HashMatch], Optional[ImageHashes]]:
+    """Matches for an uploaded image ([] when no index has been built yet) and its hashes"""
+    index = get_index()
+    hashes = hash_image(data)
+    if index is None:
+        return [], hashes
+    return index.search(hashes, limit), hashes
+
+
+def build_index(rows: Iterable[Tuple[int, str]], concurrency: int = 4) -> dict:
+    """Hash the 320px variant of every (product_id, image URL); images that fail are skipped"""
+    from PIL import Image
+
+    from app.core.images import ImageError, get_variant
+
+    def hash_one(row):
+        product_id, url = row
+        try:
+            return product_id, hash_image(get_variant(url, HASH_SOURCE_WIDTH, "jpeg", wait=True).read_bytes())
+        except (ImageError, OSError, Image.DecompressionBombError) as e:
+            logger.warning(f"⚠️ Skipping image of product {product_id}: {e}")
+            return product_id, None
+
+    product_ids, hashes, failed = [], [], 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="imghash") as pool:
+        for product_id, result in pool.map(hash_one, rows):
+            if result is None:
+                failed += 1
+                continue
+            product_ids.append(product_id)
+            hashes.append(result)
+    save_index(product_ids, hashes)
+    return {"images": len(hashes), "failed": failed, "path": str(index_path())}
+
+
+def main():
+    import argparse
+
+    from app.core.database import LegacySessionLocal
+    from app.core.images import renderer
+    from app.models.product_legacy import ProductLegacy
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Build the perceptual-hash index of product images")
+    parser.add_argument("--concurrency", type=int, default=settings.IMAGE_WORKERS * 2)
+    parser.add_argument("--primary-only", action="store_true", help="Skip additional product images")
+    args = parser.parse_args()
+
+    db = LegacySessionLocal()
+    try:
+        rows = []
+        for product_id, primary, extra in db.query(
+            ProductLegacy.id, ProductLegacy.primary_image, ProductLegacy.images
+        ).yield_per(5000):
+            urls = [primary] + ([] if args.primary_only else list(extra or []))
+            rows.extend((product_id, url) for url in dict.fromkeys(urls) if url)
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    try:
+        report = build_index(rows, args.concurrency)
+    finally:
+        renderer.shutdown()
+    report["seconds"] = round(time.perf_counter() - started, 1)
+    print(json.dumps(report, indent=2))
+
+
+__all__ = [
+    "ImageHashes", "HashMatch", "HashIndex", "hash_image", "search_image", "get_index",
+    "build_index", "save_index", "index_path", "MAX_PHASH_DISTANCE", "CONFIDENT_DISTANCE",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+Resized product image variants with a content-addressed disk cache.
+
+Bots send product photos by URL, so Telegram/WhatsApp used to fetch full-size
+originals on every send. get_variant() fetches (or reads) the original once,
+renders a bounded-size JPEG or WebP variant with Pillow in a process pool,
+and keeps it on disk under IMAGE_CACHE_PATH:
+
+    sources/ab/ab12...                     sha256 of the original's bytes, keyed by sha256 of its URL
+    variants/cd/cd34..._640.jpeg           variant, named by the original's sha256, size and format
+
+Variants are named by content, so the same picture behind several URLs is
+rendered and stored once. The cache is an LRU by total size: hits refresh a
+variant's mtime (at most once per TOUCH_INTERVAL), and once the directory
+grows past IMAGE_CACHE_MAX_BYTES the least recently used variants are
+deleted down to EVICT_TO_FRACTION of the limit.
+
+Rendering runs in spawned worker processes so decoding large JPEGs neither
+holds the GIL nor stalls request threads; like the password hasher, jobs
+beyond IMAGE_MAX_PENDING are rejected (ImageServiceBusy) instead of queueing.
+
+Pre-render the whole catalog with:
+    python -m app.core.images
+    python -m app.core.images --widths 320 640 --format webp --concurrency 8
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (160, 320, 640, 1280)  # Allowed bounding-box sizes; a fixed set keeps the cache finite
+DEFAULT_WIDTH = 640
+FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp"}
+QUALITY = {"jpeg": 82, "webp": 80}
+TOUCH_INTERVAL = 3600  # Seconds; a hit refreshes a variant's LRU position at most this often
+SOURCE_RECHECK_SECONDS = 7 * 86400  # How long a URL -> content hash mapping is trusted
+EVICT_TO_FRACTION = 0.9
+
+variant_requests = counter(
+    "zeta_image_variant_requests_total",
+    "Image variant lookups by result (hit, miss, error, busy)",
+    ["result"],
+)
+evicted_bytes = counter(
+    "zeta_image_cache_evicted_bytes_total",
+    "Bytes of image variants evicted from the disk cache",
+)
+
+
+class ImageError(Exception):
+    """The original could not be fetched or decoded"""
+
+
+class ImageServiceBusy(Exception):
+    """Raised when too many render jobs are already queued"""
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def cache_root() -> Path:
+    return Path(settings.IMAGE_CACHE_PATH)
+
+
+def source_path(url: str) -> Path:
+    key = url_key(url)
+    return cache_root() / "sources" / key[:2] / key
+
+
+def variant_path(content_sha: str, width: int, fmt: str) -> Path:
+    return cache_root() / "variants" / content_sha[:2] / f"{content_sha}_{width}.{fmt}"
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def read_original(url: str) -> bytes:
+    """Bytes of an original: http(s) URLs are downloaded, other paths are read from IMAGE_SOURCE_ROOT"""
+    limit = settings.IMAGE_MAX_SOURCE_BYTES
+    if url.startswith(("http://", "https://")):
+        request = urllib.request.Request(url, headers={"User-Agent": "zeta-image-service"})
+        try:
+            with urllib.request.urlopen(request, timeout=settings.IMAGE_FETCH_TIMEOUT_SECONDS) as response:
+                data = response.read(limit + 1)
+        except Exception as e:
+            raise ImageError(f"Could not fetch {url}: {e}")
+    else:
+        root = Path(settings.IMAGE_SOURCE_ROOT).resolve()
+        path = (root / url.lstrip("/")).resolve()
+        if not path.is_relative_to(root) or not path.is_file():
+            raise ImageError(f"No such image: {url}")
+        with open(path, "rb") as f:
+            data = f.read(limit + 1)
+    if len(data) > limit:
+        raise ImageError(f"Original is larger than {limit} bytes: {url}")
+    return data
+
+
+def render_variant(data: bytes, width: int, fmt: str) -> bytes:
+    """Decode, orient and shrink an image to fit width x width (runs in a worker process)"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG only: decode at the smallest DCT scale that still covers the target size
+        image.draft("RGB", (width, width))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, width), Image.Resampling.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if has_alpha:
+            image = image.convert("RGBA")
+            if fmt == "jpeg":
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        out = io.BytesIO()
+        if fmt == "jpeg":
+            image.save(out, "JPEG", quality=QUALITY["jpeg"], optimize=True, progressive=True)
+        else:
+            image.save(out, "WEBP", quality=QUALITY["webp"], method=4)
+        return out.getvalue()
+
+
+class ImageRenderer:
+    """Bounded process pool for render_variant, started on first use"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _submit(self, data: bytes, width: int, fmt: str, wait: bool) -> Future:
+        if not self._slots.acquire(blocking=wait):
+            raise ImageServiceBusy()
+        try:
+            future = self._pool().submit(render_variant, data, width, fmt)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render(self, data: bytes, width: int, fmt: str, wait: bool = False) -> bytes:
+        """Blocking; with wait=True a full queue blocks instead of raising ImageServiceBusy"""
+        future = self._submit(data, width, fmt, wait)
+        try:
+            return future.result(timeout=settings.IMAGE_RENDER_TIMEOUT_SECONDS)
+        except Exception as e:
+            raise ImageError(f"Could not render image: {e}")
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class VariantCache:
+    """Size-bounded LRU over the variants directory, ordered by mtime"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._bytes: Optional[int] = None  # Estimate; recounted by every eviction scan
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for path in (cache_root() / "variants").glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if not path.name.endswith(".part"):
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def touch(self, path: Path) -> bool:
+        """Mark a variant as used; False if it is not cached"""
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def store(self, path: Path, data: bytes):
+        _write_atomic(path, data)
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._bytes += len(data)
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict(keep=path)
+
+    def evict(self, keep: Optional[Path] = None):
+        """Delete least recently used variants (never `keep`) until the cache is below EVICT_TO_FRACTION of its limit"""
+        if not self._evict_lock.acquire(blocking=False):
+            return  # Another thread is already evicting
+        try:
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * EVICT_TO_FRACTION)
+            freed = 0
+            for _, size, path in entries:
+                if total - freed <= target:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                freed += size
+            with self._lock:
+                self._bytes = total - freed
+            if freed:
+                evicted_bytes.inc(freed)
+                logger.info(f"🧹 Evicted {freed} bytes of image variants ({total - freed} left)")
+        finally:
+            self._evict_lock.release()
+
+
+class _KeyedLocks:
+    """One lock per key while in use, so concurrent misses on a variant render it once"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: Dict[str, list] = {}  # key -> [lock, users]
+
+    def acquire(self, key: str) -> threading.Lock:
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return entry[0]
+
+    def release(self, key: str):
+        with self._lock:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+renderer = ImageRenderer(max_workers=settings.IMAGE_WORKERS, max_pending=settings.IMAGE_MAX_PENDING)
+variant_cache = VariantCache(max_bytes=settings.IMAGE_CACHE_MAX_BYTES)
+_inflight = _KeyedLocks()
+
+
+def _cached_source(url: str) -> Optional[str]:
+    """Content hash last seen at `url`; None once it is SOURCE_RECHECK_SECONDS old, so a replaced picture is picked up"""
+    path = source_path(url)
+    try:
+        if time.time() - path.stat().st_mtime > SOURCE_RECHECK_SECONDS:
+            return None
+        return path.read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def get_variant(url: str, width: int = DEFAULT_WIDTH, fmt: str = "jpeg", wait: bool = False) -> Path:
+    """
+    Path of the cached width/format variant of the image at `url`, rendering it on a miss.
+    Raises ImageError if the original is unavailable, ImageServiceBusy if the render queue is full.
+    """
+    if width not in WIDTHS or fmt not in FORMATS:
+        raise ValueError(f"Unsupported variant {width}/{fmt}")
+
+    content_sha = _cached_source(url)
+    if content_sha is not None:
+        path = variant_path(content_sha, width, fmt)
+        if variant_cache.touch(path):
+            variant_requests.inc(result="hit")
+            return path
+
+    key = f"{url_key(url)}:{width}:{fmt}"
+    _inflight.acquire(key)
+    try:
+        # Another request may have rendered it while we waited
+        content_sha = _cached_source(url)
+        if content_sha is not None and variant_cache.touch(variant_path(content_sha, width, fmt)):
+            variant_requests.inc(result="hit")
+            return variant_path(content_sha, width, fmt)
+
+        try:
+            data = read_original(url)
+            content_sha = hashlib.sha256(data).hexdigest()
+            _write_atomic(source_path(url), content_sha.encode())
+            path = variant_path(content_sha, width, fmt)
+            if not variant_cache.touch(path):  # Same picture already rendered under another URL
+                variant_cache.store(path, renderer.render(data, width, fmt, wait=wait))
+        except ImageServiceBusy:
+            variant_requests.inc(result="busy")
+            raise
+        except ImageError:
+            variant_requests.inc(result="error")
+            raise
+        variant_requests.inc(result="miss")
+        return path
+    finally:
+        _inflight.release(key)
+
+
+def thumbnail_url(product_id: int, image_url: Optional[str], width: int = DEFAULT_WIDTH) -> Optional[str]:
+    """
+    Public URL of a product's image variant, or None when IMAGE_PUBLIC_BASE_URL is unset.
+    `v` changes with the original's URL, so responses to it can be cached as immutable.
+    """
+    if not image_url or not settings.IMAGE_PUBLIC_BASE_URL:
+        return None
+    base = settings.IMAGE_PUBLIC_BASE_URL.rstrip("/")
+    return f"{base}/api/products/{product_id}/image?w={width}&v={url_key(image_url)[:12]}"
+
+
+def prewarm(urls, widths=(DEFAULT_WIDTH,), fmt: str = "jpeg", concurrency: int = 4) -> dict:
+    """Render every missing variant of `urls`; fetches run on threads, rendering on the process pool"""
+    report = {"images": 0, "variants": 0, "failed": 0}
+    failures = []
+
+    def warm(url: str):
+        for width in widths:
+            try:
+                get_variant(url, width, fmt, wait=True)
+            except ImageError as e:
+                return str(e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="imgwarm") as pool:
+        for error in pool.map(warm, urls):
+            report["images"] += 1
+            if error is None:
+                report["variants"] += len(widths)
+            else:
+                report["failed"] += 1
+                if len(failures) < 20:
+                    failures.append(error)
+            if report["images"] % 1000 == 0:
+                logger.info(f"🖼️ Pre-warmed {report['images']} images ({report['failed']} failed)")
+    report["failures_sample"] = failures
+    return report
+
+
+def main():
+    from app.core.database import LegacySessionLocal
+    from app.models.product_legacy import ProductLegacy
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Render image variants for every product in the catalog")
+    parser.add_argument("--widths", type=int, nargs="+", default=[DEFAULT_WIDTH], choices=WIDTHS)
+    parser.add_argument("--format", default="jpeg", choices=sorted(FORMATS))
+    parser.add_argument("--concurrency", type=int, default=settings.IMAGE_WORKERS * 2)
+    args = parser.parse_args()
+
+    db = LegacySessionLocal()
+    try:
+        urls = sorted({
+            url for (url,) in db.query(ProductLegacy.primary_image).filter(
+                ProductLegacy.primary_image.isnot(None), ProductLegacy.primary_image != ""
+            ).yield_per(5000)
+        })
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    try:
+        report = prewarm(urls, args.widths, args.format, args.concurrency)
+    finally:
+        renderer.shutdown()
+    report["seconds"] = round(time.perf_counter() - started, 1)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+__all__ = [
+    "WIDTHS", "DEFAULT_WIDTH", "FORMATS", "ImageError", "ImageServiceBusy", "get_variant",
+    "render_variant", "read_original", "thumbnail_url", "prewarm", "renderer", "variant_cache",
+]
+
+
+if __name__ == "__main__":
+    main()
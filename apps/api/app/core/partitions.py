@@ -0,0 +1,171 @@
+"""
+Monthly range partitions for the time-series tables.
+
+messages and analytics_events are partitioned by created_at into one table
+per calendar month (UTC), named {table}_pYYYYMM, plus a {table}_default
+partition that catches rows outside every month (e.g. a bot with a skewed
+clock). Queries filtered on created_at only touch the months they cover, and
+old months are archived and dropped whole (app.core.archive) instead of
+being deleted row by row.
+
+Run periodically (cron, daily) to create upcoming months and archive old ones:
+    python -m app.core.partitions
+    python -m app.core.partitions --archive-older-than-days 365
+    python -m app.core.partitions --dry-run
+"""
+import argparse
+import json
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("messages", "analytics_events")
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+class Partition(NamedTuple):
+    table: str
+    name: str
+    start: date  # Inclusive, first day of the month
+    end: date  # Exclusive, first day of the next month
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_for(table: str, day: date) -> Partition:
+    start = month_start(day)
+    return Partition(table, f"{table}_p{start:%Y%m}", start, add_months(start, 1))
+
+
+def _bound(day: date) -> str:
+    # UTC midnight; for timestamp-without-time-zone columns the offset is ignored
+    return f"'{day.isoformat()} 00:00:00+00'"
+
+
+def list_partitions(conn: Connection, table: str) -> List[Partition]:
+    """Monthly partitions of `table`, oldest first (the default partition is not included)"""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": table})
+    partitions = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.match(name)
+        if match and match.group("table") == table:
+            partitions.append(partition_for(table, date(int(match.group("year")), int(match.group("month")), 1)))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+def create_partition(conn: Connection, partition: Partition):
+    """
+    Create one month's partition. Rows for that month already sitting in the
+    default partition are moved into it first, since Postgres refuses to
+    attach a range the default partition has rows for.
+    """
+    table, name = partition.table, partition.name
+    default = f"{table}_default"
+    in_range = f"created_at >= {_bound(partition.start)} AND created_at < {_bound(partition.end)}"
+    stranded = conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})")).scalar()
+    if not stranded:
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ({_bound(partition.start)}) TO ({_bound(partition.end)})"
+        ))
+        return
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE {in_range} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    conn.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ({_bound(partition.start)}) TO ({_bound(partition.end)})"
+    ))
+
+
+def ensure_partitions(
+    conn: Connection,
+    table: str,
+    since: Optional[date] = None,
+    months_ahead: Optional[int] = None,
+) -> List[str]:
+    """Create the default partition and every missing month from `since` (default: this month) to `months_ahead` ahead"""
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    today = datetime.now(timezone.utc).date()
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+    existing = {partition.name for partition in list_partitions(conn, table)}
+    created = []
+    month = month_start(since or today)
+    last = add_months(month_start(today), months_ahead)
+    while month <= last:
+        partition = partition_for(table, month)
+        if partition.name not in existing:
+            create_partition(conn, partition)
+            created.append(partition.name)
+        month = add_months(month, 1)
+    return created
+
+
+def partitions_to_archive(conn: Connection, table: str, older_than_days: int) -> List[Partition]:
+    """Months that ended more than `older_than_days` ago"""
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=older_than_days)
+    return [partition for partition in list_partitions(conn, table) if partition.end <= cutoff]
+
+
+def main():
+    from app.core import archive
+    from app.core.database import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Create upcoming partitions and archive old ones")
+    parser.add_argument(
+        "--archive-older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+        help="Archive and drop months that ended more than N days ago (0 disables archiving)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+    args = parser.parse_args()
+
+    archive.finalize_pending(engine)  # Manifests left behind by an interrupted run
+    report = {}
+    for table in PARTITIONED_TABLES:
+        with engine.begin() as conn:
+            created = ensure_partitions(conn, table)
+            due = partitions_to_archive(conn, table, args.archive_older_than_days) if args.archive_older_than_days else []
+        report[table] = {"created": created, "archived": []}
+        for partition in due:
+            if args.dry_run:
+                report[table]["archived"].append({"partition": partition.name, "dry_run": True})
+                continue
+            manifest = archive.archive_partition(engine, partition)
+            report[table]["archived"].append({"partition": partition.name, "rows": manifest["rows"]})
+    print(json.dumps(report, indent=2))
+
+
+__all__ = [
+    "PARTITIONED_TABLES", "Partition", "partition_for", "list_partitions", "create_partition",
+    "ensure_partitions", "partitions_to_archive", "month_start", "add_months",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""
+Price-list ingestion: apply an uploaded price list to the city's products.
+
+Supplier price lists are spreadsheets or CSVs with a SKU column and price
+and/or stock columns, under whatever headers the supplier likes. Ingestion:
+
+1. Streams rows from the file (app.core.extraction.iter_table_rows), so a
+   50k-row list is never held in memory.
+2. Detects the SKU / price / stock columns of each sheet from its header row
+   ("Артикул", "Цена розн.", "Остаток", ...). Without a recognizable header
+   it samples the first rows instead: the SKU column is the one whose values
+   match catalog SKUs, price and stock are the numeric columns.
+3. COPYs (row, sku, price, stock) into a temp table, keeps the last row per
+   normalized SKU (app.core.sku), and applies everything with one UPDATE
+   joined on the products (city_id, sku key) index, in one transaction with
+   the import record and the audit log.
+4. Writes every change (old and new price and stock) to a CSV report, and
+   records how many SKUs in the file matched no product.
+
+Cells that don't parse are left alone: a row with a price but a stock of
+"в наличии" updates only the price.
+"""
+import csv
+import io
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from itertools import chain, groupby
+from pathlib import Path
+from statistics import median
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.document_storage import report_path, storage_root
+from app.core.extraction import iter_table_rows
+from app.core.sku import normalize_sku, sku_key_sql
+from app.middleware.audit import create_audit_log
+from app.models.document import Document
+from app.models.price_import import PriceImport
+
+logger = logging.getLogger(__name__)
+
+PRICE_LIST_SUFFIXES = {".xlsx", ".xls", ".csv"}
+HEADER_SCAN_ROWS = 30  # Header rows are usually preceded by a logo, a title and contacts
+SAMPLE_ROWS = 200  # Rows examined per sheet when there is no recognizable header
+COPY_CHUNK_ROWS = 10_000
+UNMATCHED_SAMPLE_SIZE = 20
+MAX_PRICE = Decimal("99999999.99")  # products.price is NUMERIC(10, 2)
+
+SKU_HEADER = re.compile(r"\b(артикул\w*|арт|sku|article|vendor\s*code|part\s*n(o|umber))\b", re.I)
+CODE_HEADER = re.compile(r"\b(код|code)\b", re.I)  # Often 1C's internal code: the SKU only without an article column
+BARCODE_HEADER = re.compile(r"(штрих|bar)\W*(код|code)|\b(ean\w*|gtin|upc)\b", re.I)
+PRICE_HEADER = re.compile(r"\b(цен[аы]\w*|price|стоимость|розн\w*|retail)\b", re.I)
+RETAIL_HEADER = re.compile(r"\b(розн\w*|retail)\b", re.I)
+STOCK_HEADER = re.compile(r"\b(остат\w*|наличи\w*|stock|кол-во|количеств\w*|qty|склад\w*)\b", re.I)
+
+OUT_OF_STOCK = {"нет", "нет в наличии", "отсутствует", "-", "—", "out of stock"}
+_MONEY_NOISE = re.compile(r"[\s  ₸$€]|тг\.?|тенге|kzt|руб\.?", re.I)
+_STOCK_NUMBER = re.compile(r"[<>~≈]?\s*(\d+)(?:[.,]0+)?\s*(шт\.?|pcs)?", re.I)
+_THOUSANDS = re.compile(r"\d{1,3}(?:[.,]\d{3})+")
+
+
+def _price_text(raw: str) -> Optional[str]:
+    """
+    Normalize the separators of a price string to a plain decimal point.
+    
+    With both "," and "." the last one is the decimal separator; a separator
+    repeated is a thousands separator. A single one followed by exactly three
+    digits ("12.500", "1,234") could be either, so None.
+    """
+    last = max(raw.rfind(","), raw.rfind("."))
+    if last < 0:
+        return raw
+    separator = raw[last]
+    whole, fraction = raw[:last], raw[last + 1:]
+    other = "." if separator == "," else ","
+    if other in whole:
+        # "1.234,50", "1,234.50": the other separator groups thousands
+        return whole.replace(other, "") + "." + fraction if _THOUSANDS.fullmatch(whole) else None
+    if separator in whole:
+        # "1.234.567": repeated, so thousands
+        return raw.replace(separator, "") if _THOUSANDS.fullmatch(raw) else None
+    if len(fraction) == 3 and whole.lstrip("-") not in ("", "0"):
+        return None
+    return whole + "." + fraction
+
+
+def parse_price(value) -> Optional[Decimal]:
+    """'12 500,00 ₸', '1.234,50' -> Decimal; None for anything that isn't a sane, unambiguous price"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        raw = str(value)
+    else:
+        raw = _price_text(_MONEY_NOISE.sub("", str(value)))
+        if raw is None:
+            return None
+    try:
+        price = Decimal(raw).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None
+    if not price.is_finite() or price < 0 or price > MAX_PRICE:
+        return None
+    return price
+
+
+def parse_stock(value) -> Optional[int]:
+    """12, '12 шт', '>10' -> int; 'нет' -> 0; 'в наличии' and the like -> None (count unknown)"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return int(value) if value >= 0 and value == int(value) else None
+    raw = str(value).strip().lower()
+    if raw in OUT_OF_STOCK:
+        return 0
+    match = _STOCK_NUMBER.fullmatch(raw)
+    return int(match.group(1)) if match else None
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # Excel stores numeric SKUs as floats: 123456.0
+    return str(value).strip()
+
+
+def _cell(row: tuple, index: Optional[int]):
+    return row[index] if index is not None and index < len(row) else None
+
+
+def _header_columns(row: tuple) -> Optional[dict]:
+    sku = price = stock = sku_rank = None
+    for index, cell in enumerate(row):
+        label = _cell_text(cell)
+        if not label or len(label) > 60:
+            continue
+        # Check price and stock first: "Код" alone is a SKU, "Цена" never is
+        if PRICE_HEADER.search(label):
+            if price is None or (RETAIL_HEADER.search(label) and not RETAIL_HEADER.search(_cell_text(row[price]))):
+                price = index
+        elif STOCK_HEADER.search(label):
+            stock = index if stock is None else stock
+        elif BARCODE_HEADER.search(label):
+            continue  # "Штрих-код", EAN: never matches catalog SKUs
+        elif SKU_HEADER.search(label) or CODE_HEADER.search(label):
+            # "Артикул" beats a "Код" column, whichever comes first
+            rank = 0 if SKU_HEADER.search(label) else 1
+            if sku is None or rank < sku_rank:
+                sku, sku_rank = index, rank
+    if sku is None or (price is None and stock is None):
+        return None
+    return {"sku": sku, "price": price, "stock": stock}
+
+
+def _sampled_columns(rows: List[tuple], catalog_keys: Set[str]) -> Optional[dict]:
+    width = max((len(row) for row in rows), default=0)
+    best_sku, best_hits = None, 0.0
+    numeric = {}
+    for index in range(width):
+        cells = [row[index] for row in rows if index < len(row) and _cell_text(row[index])]
+        if not cells:
+            continue
+        hits = sum(1 for cell in cells if normalize_sku(_cell_text(cell)) in catalog_keys) / len(cells)
+        if hits > best_hits:
+            best_sku, best_hits = index, hits
+        prices = [parse_price(cell) for cell in cells]
+        prices = [price for price in prices if price is not None]
+        if len(prices) >= 0.8 * len(cells):
+            numeric[index] = prices
+    if best_sku is None or best_hits < 0.3:
+        return None
+    numeric.pop(best_sku, None)
+    if not numeric:
+        return None
+    # The price is the numeric column with the largest values; stock, if any, is a smaller whole-number one
+    by_size = sorted(numeric, key=lambda index: median(numeric[index]), reverse=True)
+    price = by_size[0]
+    stock = next((index for index in by_size[1:] if all(value == int(value) for value in numeric[index])), None)
+    return {"sku": best_sku, "price": price, "stock": stock}
+
+
+def detect_columns(rows: List[tuple], catalog_keys: Optional[Set[str]] = None) -> Optional[dict]:
+    """
+    Find the SKU / price / stock columns in the first rows of a sheet.
+    Returns {"header_row", "sku", "price", "stock"} (indexes; header_row is
+    None when detected by content), or None if the sheet has no price data.
+    """
+    for index, row in enumerate(rows[:HEADER_SCAN_ROWS]):
+        columns = _header_columns(row)
+        if columns:
+            return {"header_row": index, **columns}
+    if catalog_keys:
+        columns = _sampled_columns(rows, catalog_keys)
+        if columns:
+            return {"header_row": None, **columns}
+    return None
+
+
+def price_rows(
+    rows: Iterable[Tuple[Optional[str], int, tuple]],
+    catalog_keys: Optional[Set[str]],
+    detected: dict,
+) -> Iterator[Tuple[int, str, Optional[Decimal], Optional[int]]]:
+    """
+    (sequence, sku, price, stock) for every data row of every sheet with
+    detectable columns; `detected` is filled with each sheet's columns.
+    The sequence orders rows across sheets, so later rows win on duplicates.
+    """
+    sequence = 0
+    for sheet, sheet_rows in groupby(rows, key=lambda item: item[0]):
+        head = []
+        for item in sheet_rows:
+            head.append(item[2])
+            if len(head) >= SAMPLE_ROWS:
+                break
+        columns = detect_columns(head, catalog_keys)
+        if columns is None:
+            continue
+        detected[sheet or ""] = columns
+        start = columns["header_row"] + 1 if columns["header_row"] is not None else 0
+
+        for offset, row in enumerate(chain(head, (item[2] for item in sheet_rows))):
+            if offset < start:
+                continue
+            sku = _cell_text(_cell(row, columns["sku"]))
+            if not sku or len(sku) > 255:
+                continue
+            price, stock = parse_price(_cell(row, columns["price"])), parse_stock(_cell(row, columns["stock"]))
+            if price is None and stock is None:
+                continue  # Section headings, subtotals, "по запросу"
+            sequence += 1
+            yield sequence, sku, price, stock
+
+
+def _catalog_keys(db: Session, city_id: int) -> Set[str]:
+    rows = db.execute(
+        text(f"SELECT DISTINCT {sku_key_sql()} FROM products WHERE city_id = :city_id AND sku IS NOT NULL"),
+        {"city_id": city_id},
+    )
+    return {row[0] for row in rows if row[0]}
+
+
+def _copy_rows(cursor, rows: Iterator[tuple]) -> int:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = total = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert("COPY price_rows (seq, sku, price, stock) FROM STDIN WITH (FORMAT csv)", buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+        pending += 1
+        total += 1
+        if pending >= COPY_CHUNK_ROWS:
+            flush()
+            pending = 0
+    if pending:
+        flush()
+    return total
+
+
+APPLY_SQL = f"""
+WITH matched AS (
+    SELECT p.id, p.sku, p.name, p.price AS old_price, p.stock AS old_stock,
+           COALESCE(i.price, p.price) AS new_price, COALESCE(i.stock, p.stock) AS new_stock
+    FROM price_incoming i
+    JOIN products p ON p.city_id = %(city_id)s AND {sku_key_sql("p.sku")} = i.sku_key
+    FOR UPDATE OF p
+), updated AS (
+    UPDATE products p
+    SET price = m.new_price, stock = m.new_stock
+    FROM matched m
+    WHERE p.id = m.id
+      AND (p.price IS DISTINCT FROM m.new_price OR p.stock IS DISTINCT FROM m.new_stock)
+    RETURNING p.id
+)
+SELECT m.id, m.sku, m.name, m.old_price, m.new_price, m.old_stock, m.new_stock, u.id IS NOT NULL
+FROM matched m
+LEFT JOIN updated u ON u.id = m.id
+ORDER BY m.id
+"""
+
+UNMATCHED_SQL = f"""
+SELECT count(*) OVER (), i.sku
+FROM price_incoming i
+WHERE NOT EXISTS (
+    SELECT 1 FROM products p WHERE p.city_id = %(city_id)s AND {sku_key_sql("p.sku")} = i.sku_key
+)
+ORDER BY i.seq
+LIMIT {UNMATCHED_SAMPLE_SIZE}
+"""
+
+REPORT_HEADER = ["product_id", "sku", "name", "old_price", "new_price", "old_stock", "new_stock"]
+
+
+def _apply(db: Session, price_import: PriceImport, rows: Iterator[tuple], report_tmp: Path):
+    """Load, match and update inside the session's transaction; the caller commits"""
+    cursor = db.connection().connection.cursor()
+    cursor.execute(
+        "CREATE TEMP TABLE price_rows (seq integer, sku text, price numeric(10, 2), stock integer) ON COMMIT DROP"
+    )
+    price_import.rows_total = _copy_rows(cursor, rows)
+    cursor.execute(
+        f"CREATE TEMP TABLE price_incoming ON COMMIT DROP AS "
+        f"SELECT DISTINCT ON (sku_key) seq, sku, sku_key, price, stock "
+        f"FROM (SELECT *, {sku_key_sql('sku')} AS sku_key FROM price_rows) r "
+        f"WHERE sku_key <> '' ORDER BY sku_key, seq DESC"
+    )
+    cursor.execute("ANALYZE price_incoming")
+
+    cursor.execute(APPLY_SQL, {"city_id": price_import.city_id})
+    matched = changed = 0
+    with open(report_tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_HEADER)
+        while True:
+            batch = cursor.fetchmany(5000)
+            if not batch:
+                break
+            for product_id, sku, name, old_price, new_price, old_stock, new_stock, was_changed in batch:
+                matched += 1
+                if was_changed:
+                    changed += 1
+                    writer.writerow([product_id, sku, name, old_price, new_price, old_stock, new_stock])
+        f.flush()
+        os.fsync(f.fileno())
+    price_import.rows_matched = matched
+    price_import.rows_changed = changed
+
+    cursor.execute(UNMATCHED_SQL, {"city_id": price_import.city_id})
+    unmatched = cursor.fetchall()
+    price_import.rows_unmatched = unmatched[0][0] if unmatched else 0
+    price_import.unmatched_sample = [sku for _, sku in unmatched]
+
+
+class _LazyKeys:
+    """Set-like view of a city's catalog SKU keys, queried on first use"""
+
+    def __init__(self, db: Session, city_id: int):
+        self._db = db
+        self._city_id = city_id
+        self._keys = None
+
+    def _load(self) -> Set[str]:
+        if self._keys is None:
+            self._keys = _catalog_keys(self._db, self._city_id)
+        return self._keys
+
+    def __contains__(self, key) -> bool:
+        return key in self._load()
+
+    def __bool__(self) -> bool:
+        return True
+
+
+def ingest_price_list(db: Session, document: Document) -> PriceImport:
+    """Apply `document` (a price_list spreadsheet or CSV) to its city's products"""
+    price_import = PriceImport(document_id=document.id, city_id=document.city_id, status="running")
+    db.add(price_import)
+    db.commit()
+
+    source = storage_root() / document.storage_path
+    destination = report_path(document.city_id, price_import.id)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    report_tmp = destination.with_suffix(".csv.part")
+    detected = {}
+
+    try:
+        # Catalog keys are only needed for sheets without a recognizable header; load them lazily
+        catalog_keys = _LazyKeys(db, document.city_id)
+        rows = price_rows(iter_table_rows(source), catalog_keys, detected)
+        _apply(db, price_import, rows, report_tmp)
+        if not detected:
+            raise ValueError("No SKU and price/stock columns found")
+        price_import.columns = detected
+        price_import.status = "applied"
+        price_import.diff_path = str(destination.relative_to(storage_root()))
+        price_import.finished_at = datetime.now(timezone.utc)
+        os.replace(report_tmp, destination)
+        create_audit_log(
+            db,
+            user_id=document.uploaded_by,
+            city_id=document.city_id,
+            action="UPDATE",
+            table_name="products",
+            new_value={
+                "price_import_id": price_import.id,
+                "document_id": document.id,
+                "rows_changed": price_import.rows_changed,
+            }
+        )  # Commits the product updates together with the import record
+    except Exception as e:
+        db.rollback()
+        report_tmp.unlink(missing_ok=True)
+        destination.unlink(missing_ok=True)
+        price_import.status = "failed"
+        price_import.error = str(e)[:1000]
+        price_import.columns = detected or None
+        price_import.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.warning(f"✗ Price list {document.id} was not applied: {e}")
+        return price_import
+
+    logger.info(
+        f"💰 Price list {document.id}: {price_import.rows_total} rows, {price_import.rows_matched} matched, "
+        f"{price_import.rows_changed} changed, {price_import.rows_unmatched} unknown SKUs"
+    )
+    return price_import
+
+
+__all__ = [
+    "ingest_price_list", "detect_columns", "price_rows", "parse_price", "parse_stock",
+    "PRICE_LIST_SUFFIXES",
+]
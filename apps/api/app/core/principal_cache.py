@@ -0,0 +1,165 @@
+"""
+Principal cache for authenticated requests.
+
+Maps the SHA-256 of a bearer token to a snapshot of its user, so repeated requests
+with the same token skip JWT verification and the users/sessions lookups.
+Entries live at most PRINCIPAL_CACHE_TTL_SECONDS and never past the token's own expiry.
+
+Revocation is checked in O(1) on every request, cached or not:
+- revoke_token() blacklists a single token (logout)
+- invalidate_user() bumps the user's epoch so all their cached entries miss (role change, delete)
+- invalidate_all() bumps a cache-wide generation so every entry misses
+
+ORM flushes of a User call invalidate_user(); bulk update(User)/delete(User) statements
+run through a Session call invalidate_all(). Changes this process never sees (other API
+workers, alembic, admin scripts editing the table directly) are only picked up when the
+entry expires, so the TTL is capped at MAX_TTL_SECONDS.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import counter
+from app.models.user import User
+
+MAX_TTL_SECONDS = 60  # Bound on how long a change made outside this process can go unseen
+
+cache_requests = counter(
+    "zeta_principal_cache_requests_total",
+    "Principal cache lookups by result (hit, miss, revoked)",
+    ["result"],
+)
+
+
+class _Entry(NamedTuple):
+    user: User
+    epoch: int
+    generation: int
+    expires_at: float
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def snapshot_user(user: User) -> User:
+    """Copy the fields handlers read into a transient User not bound to any session"""
+    return User(
+        id=user.id,
+        email=user.email,
+        role=user.role,
+        created_at=user.created_at,
+    )
+
+
+class PrincipalCache:
+    """Bounded LRU of token hash -> user snapshot with a revocation list"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = min(ttl_seconds, MAX_TTL_SECONDS)
+        self._generation = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}  # token_hash -> token expiry (epoch seconds)
+        self._user_epochs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token_hash: str) -> Optional[User]:
+        """Return the cached user for a token hash, or None on miss"""
+        now = time.time()
+        with self._lock:
+            if token_hash in self._revoked:
+                cache_requests.inc(result="revoked")
+                return None
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                cache_requests.inc(result="miss")
+                return None
+            if (
+                entry.expires_at <= now
+                or entry.generation != self._generation
+                or entry.epoch != self._user_epochs.get(entry.user.id, 0)
+            ):
+                del self._entries[token_hash]
+                cache_requests.inc(result="miss")
+                return None
+            self._entries.move_to_end(token_hash)
+        cache_requests.inc(result="hit")
+        return entry.user
+
+    def put(self, token_hash: str, user: User, token_expires_at: Optional[float] = None):
+        """Cache a user for a token; TTL is capped at the token's expiry"""
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if token_hash in self._revoked:
+                return
+            self._entries[token_hash] = _Entry(
+                user=snapshot_user(user),
+                epoch=self._user_epochs.get(user.id, 0),
+                generation=self._generation,
+                expires_at=expires_at,
+            )
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, token_hash: str) -> bool:
+        return token_hash in self._revoked
+
+    def revoke_token(self, token_hash: str, token_expires_at: Optional[float] = None):
+        """Reject a token from now until it would have expired anyway"""
+        now = time.time()
+        with self._lock:
+            self._entries.pop(token_hash, None)
+            self._revoked[token_hash] = token_expires_at or now + self.ttl_seconds
+            if len(self._revoked) > self.max_entries:
+                self._revoked = {h: exp for h, exp in self._revoked.items() if exp > now}
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached principal of a user; they are reloaded from the database"""
+        with self._lock:
+            self._user_epochs[user_id] = self._user_epochs.get(user_id, 0) + 1
+
+    def invalidate_all(self):
+        """Drop every cached principal (the affected users are not known)"""
+        with self._lock:
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+            self._user_epochs.clear()
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_user_change(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk_user_change(orm_execute_state):
+    # update(User)/delete(User) and Query.update()/delete() bypass the mapper events above
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is User:
+        principal_cache.invalidate_all()
+
+
+__all__ = ["PrincipalCache", "principal_cache", "hash_token", "snapshot_user"]
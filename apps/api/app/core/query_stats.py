@@ -0,0 +1,163 @@
+"""
+Per-request SQL instrumentation.
+
+Engine event listeners time every statement and add it to the stats object of
+the current request (a ContextVar set by QueryStatsMiddleware). Sync routes run
+in a threadpool with a copy of the request context, so they share the same
+RequestQueryStats instance. Statements outside a request (init_db, scripts)
+are only timed into the global histogram and the slow-query log.
+"""
+import logging
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.slow_query")
+
+query_duration = histogram(
+    "zeta_db_query_duration_seconds",
+    "SQL statement execution time",
+)
+queries_per_request = histogram(
+    "zeta_db_queries_per_request",
+    "SQL statements executed while serving one request",
+    ["route"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+repeated_statements = counter(
+    "zeta_db_repeated_statements_total",
+    "Requests that ran an identical statement at least QUERY_REPEAT_THRESHOLD times (likely N+1)",
+    ["route"],
+)
+
+_WHITESPACE = re.compile(r"\s+")
+MAX_LOGGED_STATEMENT = 500
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace so the same query compares equal across calls"""
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Describe bound parameters by type and size, never by value"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: describe the first row and the row count
+            return {"rows": len(parameters), "row": parameter_shape(parameters[0])}
+        return [_value_shape(value) for value in parameters]
+    return _value_shape(parameters)
+
+
+def _value_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+@dataclass
+class RequestQueryStats:
+    """Statements executed while serving one request"""
+
+    count: int = 0
+    total_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: Optional[str] = None
+    statement_counts: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.statement_counts[statement] = self.statement_counts.get(statement, 0) + 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """(statement, count) pairs executed at least `threshold` times, most frequent first"""
+        return sorted(
+            ((statement, n) for statement, n in self.statement_counts.items() if n >= threshold),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def start_request_stats() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    elapsed = time.perf_counter() - started
+    query_duration.observe(elapsed)
+
+    normalized = normalize_statement(statement)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(normalized, elapsed)
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        slow_query_logger.warning(
+            "Slow query %.1fms: %s | params=%s",
+            elapsed * 1000,
+            normalized[:MAX_LOGGED_STATEMENT],
+            parameter_shape(parameters),
+        )
+
+
+def _handle_error(exception_context):
+    # The statement failed, so after_cursor_execute never ran; drop its start time
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine):
+    """Attach timing listeners to an engine (idempotent)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+__all__ = [
+    "RequestQueryStats",
+    "start_request_stats",
+    "current_request_stats",
+    "instrument_engine",
+    "normalize_statement",
+    "parameter_shape",
+    "queries_per_request",
+    "repeated_statements",
+]
@@ -0,0 +1,52 @@
+"""
+In-memory sliding-window rate limiter keyed by client (e.g. IP address)
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque
+
+
+class SlidingWindowLimiter:
+    """Allows at most `limit` hits per key within `window` seconds"""
+
+    def __init__(self, limit: int, window: int, max_keys: int = 100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> float:
+        """
+        Record a hit for key.
+
+        Returns:
+            0 if allowed, otherwise seconds until the next hit would be allowed
+        """
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = deque()
+                self._hits[key] = hits
+            else:
+                self._hits.move_to_end(key)
+
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+
+            if len(hits) >= self.limit:
+                return hits[0] + self.window - now
+
+            hits.append(now)
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+            return 0
+
+    def reset(self, key: str):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+__all__ = ["SlidingWindowLimiter"]
@@ -1,10 +1,82 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import counter
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+)
+
+hash_rejections = counter(
+    "zeta_password_hash_rejected_total",
+    "Password hash jobs rejected because the hashing queue was full",
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hash jobs are already queued"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so worker threads hash in parallel
+    without stalling the event loop or FastAPI's request threadpool.
+    Jobs beyond max_pending are rejected instead of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pwhash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            hash_rejections.inc()
+            raise PasswordHasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self._submit(pwd_context.verify, plain_password, hashed_password))
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(pwd_context.hash, password))
+
+    def verify_sync(self, plain_password: str, hashed_password: str) -> bool:
+        """Blocking variant for sync route handlers (already off the event loop)"""
+        return self._submit(pwd_context.verify, plain_password, hashed_password).result()
+
+    def hash_sync(self, password: str) -> str:
+        return self._submit(pwd_context.hash, password).result()
+
+
+def hasher_busy_exception() -> HTTPException:
+    """503 for a request turned away because the password hashing queue is full"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy. Try again shortly.",
+        headers={"Retry-After": "1"}
+    )
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -0,0 +1,38 @@
+"""
+SKU normalization shared by Python and SQL.
+
+Price lists and the catalog spell the same SKU differently: "ZT-000123",
+"zt 000123", "ZT000123", or with Cyrillic look-alike letters typed on a
+Russian layout ("ZТ-000123" with a Cyrillic Т). The key drops everything but
+letters and digits, uppercases, and maps Cyrillic look-alikes to Latin.
+SKU_KEY_SQL is the same transformation for Postgres; products has an
+expression index on (city_id, SKU_KEY_SQL) so matching by key stays indexed.
+"""
+import re
+
+CYRILLIC_LOOKALIKES = "АВЕКМНОРСТХУ"
+LATIN_EQUIVALENTS = "ABEKMHOPCTXY"
+
+_NON_ALNUM = re.compile(r"[\W_]+", re.UNICODE)
+_LOOKALIKES = str.maketrans(CYRILLIC_LOOKALIKES, LATIN_EQUIVALENTS)
+
+
+def normalize_sku(sku) -> str:
+    if sku is None:
+        return ""
+    if isinstance(sku, float) and sku.is_integer():
+        sku = int(sku)  # Excel stores numeric SKUs as floats: 123456.0
+    return _NON_ALNUM.sub("", str(sku)).upper().translate(_LOOKALIKES)
+
+
+def sku_key_sql(column: str = "sku") -> str:
+    return (
+        f"translate(upper(regexp_replace({column}, '[^[:alnum:]]', '', 'g')), "
+        f"'{CYRILLIC_LOOKALIKES}', '{LATIN_EQUIVALENTS}')"
+    )
+
+
+SKU_KEY_SQL = sku_key_sql()
+
+
+__all__ = ["normalize_sku", "sku_key_sql", "SKU_KEY_SQL"]
@@ -0,0 +1,427 @@
+"""
+Per-city ANN index of document-chunk embeddings.
+
+Vectors are stored int8-quantized with one float32 scale per row
+(row ~= q * scale), a quarter of the float32 size, and are only ever read
+through np.load(mmap_mode="r"). Layout under {city}/vectors/:
+
+    store.json              {"embedder", "dim"}; vectors of another embedder are rejected
+    CURRENT                 name of the live base generation
+    gen-<ns>/               base generation, rows grouped by IVF cluster:
+        vectors.npy  int8  [n, dim]
+        scales.npy   f32   [n]
+        doc_ids.npy  i32   [n]
+        chunk_ids.npy i32  [n]      chunk number in the document's BM25 segment
+        centroids.npy f32  [k, dim] unit-length k-means centroids
+        offsets.npy  i64   [k + 1]  cluster c is rows offsets[c]:offsets[c + 1]
+    delta/<doc>.vec.npy     int8 rows of one document added since the last rebuild
+    delta/<doc>.scl.npy     its scales; chunk ids are simply 0..n-1
+
+Adding a document writes its delta files; deleting one removes them, and
+its base rows are filtered out by the caller's live document ids until the
+next rebuild. A search probes the `nprobe` clusters nearest to the query
+and scans every delta exhaustively, so deltas are kept small by rebuilding
+(k-means over a sample, then assigning every row) once they or the stale
+base rows pass REBUILD_*_FRACTION of the base.
+
+Like app.core.doc_index this module has no settings or database imports.
+"""
+import fcntl
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.doc_index import Segment
+
+STORE_FILE = "store.json"
+CURRENT_FILE = "CURRENT"
+DELTA_DIR = "delta"
+LOCK_FILE = ".lock"
+
+EMBED_BATCH = 256
+KMEANS_ITERATIONS = 20
+KMEANS_MAX_TRAIN = 50_000
+ASSIGN_BATCH = 8192
+MAX_CLUSTERS = 1024
+REBUILD_MIN_ROWS = 2000
+REBUILD_DELTA_FRACTION = 0.2
+REBUILD_STALE_FRACTION = 0.2
+
+
+class VectorStoreMismatch(Exception):
+    """The store was built with a different embedder or dimension"""
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization"""
+    peak = np.abs(vectors).max(axis=1) if len(vectors) else np.zeros(0, dtype=np.float32)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def dequantize(quantized: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return quantized.astype(np.float32) * scales[:, None]
+
+
+def _save_atomic(path: Path, array: np.ndarray):
+    partial = path.with_name(path.name + ".part")
+    with open(partial, "wb") as f:
+        np.save(f, array)
+    os.replace(partial, path)
+
+
+@contextmanager
+def _locked(store_dir: Path):
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with open(store_dir / LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _check_store(store_dir: Path, spec: str, dim: int):
+    """Record the embedder on first use; refuse vectors from any other"""
+    path = store_dir / STORE_FILE
+    if path.exists():
+        info = json.loads(path.read_text())
+        if info["embedder"] != spec or info["dim"] != dim:
+            raise VectorStoreMismatch(
+                f"{store_dir} holds {info['embedder']} ({info['dim']}d) vectors, not {spec} ({dim}d); "
+                f"remove it and re-extract the city's documents"
+            )
+        return
+    partial = path.with_name(path.name + ".part")
+    partial.write_text(json.dumps({"embedder": spec, "dim": dim}))
+    os.replace(partial, path)
+
+
+def _delta_paths(store_dir: Path, document_id: int) -> Tuple[Path, Path]:
+    delta = store_dir / DELTA_DIR
+    return delta / f"{document_id}.vec.npy", delta / f"{document_id}.scl.npy"
+
+
+def write_document(store_dir: Path, document_id: int, vectors: np.ndarray, spec: str):
+    """Store one document's chunk vectors (row i = chunk i) as a delta"""
+    store_dir = Path(store_dir)
+    quantized, scales = quantize(vectors)
+    # Under the store lock so a concurrent rebuild never folds or drops a half-written delta
+    with _locked(store_dir):
+        _check_store(store_dir, spec, vectors.shape[1])
+        vec_path, scl_path = _delta_paths(store_dir, document_id)
+        vec_path.parent.mkdir(parents=True, exist_ok=True)
+        # Scales first: a reader that sees the new vectors also sees matching scales
+        _save_atomic(scl_path, scales)
+        _save_atomic(vec_path, quantized)
+
+
+def remove_document(store_dir: Path, document_id: int):
+    """Drop the document's delta; its base rows are ignored once it is no longer live"""
+    for path in _delta_paths(Path(store_dir), document_id):
+        path.unlink(missing_ok=True)
+
+
+def embed_segment(segment_path: str, store_dir: str, spec: str) -> int:
+    """Embed every chunk of a BM25 segment and write it as the document's delta; returns the row count"""
+    from app.core.embeddings import get_embedder
+
+    embedder = get_embedder(spec)
+    segment = Segment(segment_path)
+    vectors = np.zeros((segment.n_chunks, embedder.dim), dtype=np.float32)
+    for start in range(0, segment.n_chunks, EMBED_BATCH):
+        stop = min(start + EMBED_BATCH, segment.n_chunks)
+        texts = [segment.chunk(chunk)[2] for chunk in range(start, stop)]
+        vectors[start:stop] = embedder.embed(texts)
+    write_document(Path(store_dir), segment.document_id, vectors, embedder.spec)
+    return segment.n_chunks
+
+
+class _Generation:
+    def __init__(self, path: Path):
+        self.name = path.name
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.scales = np.load(path / "scales.npy", mmap_mode="r")
+        self.doc_ids = np.load(path / "doc_ids.npy", mmap_mode="r")
+        self.chunk_ids = np.load(path / "chunk_ids.npy", mmap_mode="r")
+        self.centroids = np.load(path / "centroids.npy")
+        self.offsets = np.load(path / "offsets.npy")
+
+    @property
+    def count(self) -> int:
+        return len(self.doc_ids)
+
+
+def _read_current(store_dir: Path) -> Optional[str]:
+    try:
+        return (store_dir / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class VectorStore:
+    """
+    Read side of one city's store. refresh() picks up a new base generation
+    and changed deltas by name and mtime, so a long-lived instance stays
+    current without reloading untouched files.
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.base: Optional[_Generation] = None
+        self.deltas: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._delta_stamps: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            current = _read_current(self.store_dir)
+            if current is None:
+                self.base = None
+            elif self.base is None or self.base.name != current:
+                try:
+                    self.base = _Generation(self.store_dir / current)
+                except FileNotFoundError:
+                    # A rebuild replaced and removed it between reading CURRENT and loading
+                    current = _read_current(self.store_dir)
+                    self.base = _Generation(self.store_dir / current) if current else None
+
+            stamps = {}
+            delta_dir = self.store_dir / DELTA_DIR
+            if delta_dir.is_dir():
+                for entry in os.scandir(delta_dir):
+                    if entry.name.endswith(".vec.npy"):
+                        stamps[int(entry.name.split(".", 1)[0])] = entry.stat().st_mtime_ns
+            deltas = {}
+            for document_id, stamp in stamps.items():
+                if self._delta_stamps.get(document_id) == stamp and document_id in self.deltas:
+                    deltas[document_id] = self.deltas[document_id]
+                    continue
+                vec_path, scl_path = _delta_paths(self.store_dir, document_id)
+                try:
+                    vectors = np.load(vec_path, mmap_mode="r")
+                    scales = np.load(scl_path, mmap_mode="r")
+                except (FileNotFoundError, ValueError):
+                    continue  # Removed or half-written; next refresh sees the final state
+                if len(vectors) == len(scales):
+                    deltas[document_id] = (vectors, scales)
+            self.deltas = deltas
+            self._delta_stamps = {doc: stamps[doc] for doc in deltas}
+
+    def delta_rows(self) -> int:
+        return sum(len(scales) for _, scales in self.deltas.values())
+
+    def stale_rows(self, live_ids: Set[int]) -> int:
+        """Base rows of deleted documents or of documents re-embedded into a delta"""
+        if self.base is None or not self.base.count:
+            return 0
+        keep = np.isin(self.base.doc_ids, np.fromiter(live_ids, dtype=np.int32, count=len(live_ids)))
+        keep &= ~np.isin(self.base.doc_ids, np.fromiter(self.deltas, dtype=np.int32, count=len(self.deltas)))
+        return int(self.base.count - keep.sum())
+
+    def search(self, query: np.ndarray, live_ids: Set[int], limit: int, nprobe: int) -> List[Tuple[int, int, float]]:
+        """Top `limit` (document_id, chunk_id, cosine) among live documents"""
+        base, deltas = self.base, self.deltas
+        live = np.fromiter(live_ids, dtype=np.int32, count=len(live_ids))
+        shadowed = np.fromiter(deltas, dtype=np.int32, count=len(deltas))
+        scores, doc_ids, chunk_ids = [], [], []
+
+        if base is not None and base.count:
+            if base.centroids.shape[1] != query.shape[0]:
+                raise VectorStoreMismatch(f"Query has {query.shape[0]} dims, store has {base.centroids.shape[1]}")
+            probes = np.argsort(-(base.centroids @ query))[:nprobe]
+            for cluster in probes:
+                lo, hi = int(base.offsets[cluster]), int(base.offsets[cluster + 1])
+                if lo == hi:
+                    continue
+                docs = np.asarray(base.doc_ids[lo:hi])
+                mask = np.isin(docs, live) & ~np.isin(docs, shadowed)
+                if not mask.any():
+                    continue
+                cluster_scores = (base.vectors[lo:hi].astype(np.float32) @ query) * base.scales[lo:hi]
+                scores.append(cluster_scores[mask])
+                doc_ids.append(docs[mask])
+                chunk_ids.append(np.asarray(base.chunk_ids[lo:hi])[mask])
+
+        for document_id, (vectors, scales) in deltas.items():
+            if document_id not in live_ids or not len(scales):
+                continue
+            scores.append((vectors.astype(np.float32) @ query) * scales)
+            doc_ids.append(np.full(len(scales), document_id, dtype=np.int32))
+            chunk_ids.append(np.arange(len(scales), dtype=np.int32))
+
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        doc_ids = np.concatenate(doc_ids)
+        chunk_ids = np.concatenate(chunk_ids)
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(doc_ids[i]), int(chunk_ids[i]), float(scores[i])) for i in top]
+
+
+_stores: Dict[str, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(store_dir: Path) -> VectorStore:
+    """Process-wide VectorStore for `store_dir`, refreshed"""
+    key = str(store_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = VectorStore(Path(store_dir))
+    store.refresh()
+    return store
+
+
+def kmeans(sample: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (cosine) on unit rows; returns unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points instead of letting them die
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, scales: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BATCH):
+        stop = start + ASSIGN_BATCH
+        batch = dequantize(np.asarray(vectors[start:stop]), np.asarray(scales[start:stop]))
+        labels[start:stop] = np.argmax(batch @ centroids.T, axis=1)
+    return labels
+
+
+def needs_rebuild(store: VectorStore, live_ids: Set[int]) -> bool:
+    base_rows = store.base.count if store.base is not None else 0
+    threshold = max(REBUILD_MIN_ROWS, base_rows * REBUILD_DELTA_FRACTION)
+    if store.delta_rows() >= threshold:
+        return True
+    return base_rows > 0 and store.stale_rows(live_ids) >= max(REBUILD_MIN_ROWS, base_rows * REBUILD_STALE_FRACTION)
+
+
+def rebuild(store_dir: Path, live_ids: Set[int]) -> dict:
+    """
+    Fold live base rows and all live deltas into a new clustered generation,
+    switch CURRENT to it, and delete the deltas and generation it replaced.
+    Serialized per city by a file lock; readers keep their old mappings.
+    """
+    store_dir = Path(store_dir)
+    started = time.monotonic()
+    with _locked(store_dir):
+        store = VectorStore(store_dir)
+        store.refresh()
+        live = np.fromiter(live_ids, dtype=np.int32, count=len(live_ids))
+        shadowed = np.fromiter(store.deltas, dtype=np.int32, count=len(store.deltas))
+
+        parts = []  # (vectors, scales, doc_ids, chunk_ids)
+        base = store.base
+        if base is not None and base.count:
+            keep = np.isin(base.doc_ids, live) & ~np.isin(base.doc_ids, shadowed)
+            if keep.any():
+                parts.append((base.vectors[keep], base.scales[keep], base.doc_ids[keep], base.chunk_ids[keep]))
+        # Deltas of documents the caller doesn't know yet (uploaded after it read
+        # live_ids) stay for the next round; deletes remove their own deltas
+        folded = [document_id for document_id in store.deltas if document_id in live_ids]
+        for document_id in folded:
+            vectors, scales = store.deltas[document_id]
+            if len(scales):
+                parts.append((
+                    np.asarray(vectors), np.asarray(scales),
+                    np.full(len(scales), document_id, dtype=np.int32),
+                    np.arange(len(scales), dtype=np.int32),
+                ))
+
+        info_path = store_dir / STORE_FILE
+        dim = json.loads(info_path.read_text())["dim"] if info_path.exists() else 0
+        if parts:
+            vectors = np.concatenate([p[0] for p in parts])
+            scales = np.concatenate([p[1] for p in parts]).astype(np.float32)
+            doc_ids = np.concatenate([p[2] for p in parts]).astype(np.int32)
+            chunk_ids = np.concatenate([p[3] for p in parts]).astype(np.int32)
+        else:
+            vectors = np.zeros((0, dim), dtype=np.int8)
+            scales = np.zeros(0, dtype=np.float32)
+            doc_ids = np.zeros(0, dtype=np.int32)
+            chunk_ids = np.zeros(0, dtype=np.int32)
+
+        count = len(scales)
+        k = max(1, min(MAX_CLUSTERS, int(round(math.sqrt(count))))) if count else 0
+        if k:
+            rng = np.random.default_rng(0)
+            train_rows = np.sort(rng.choice(count, size=min(count, KMEANS_MAX_TRAIN), replace=False))
+            sample = dequantize(vectors[train_rows], scales[train_rows])
+            norms = np.linalg.norm(sample, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = kmeans(sample / norms, min(k, len(sample)))
+            k = len(centroids)
+            labels = _assign(vectors, scales, centroids)
+            order = np.argsort(labels, kind="stable")
+            offsets = np.searchsorted(labels[order], np.arange(k + 1)).astype(np.int64)
+        else:
+            centroids = np.zeros((0, dim), dtype=np.float32)
+            order = np.arange(0)
+            offsets = np.zeros(1, dtype=np.int64)
+
+        generation = store_dir / f"gen-{time.time_ns()}"
+        generation.mkdir()
+        np.save(generation / "vectors.npy", vectors[order])
+        np.save(generation / "scales.npy", scales[order])
+        np.save(generation / "doc_ids.npy", doc_ids[order])
+        np.save(generation / "chunk_ids.npy", chunk_ids[order])
+        np.save(generation / "centroids.npy", centroids)
+        np.save(generation / "offsets.npy", offsets)
+        partial = store_dir / (CURRENT_FILE + ".part")
+        partial.write_text(generation.name)
+        os.replace(partial, store_dir / CURRENT_FILE)
+
+        for document_id in folded:
+            remove_document(store_dir, document_id)
+        for old in store_dir.glob("gen-*"):
+            if old.name != generation.name:
+                shutil.rmtree(old, ignore_errors=True)
+
+    return {
+        "rows": count,
+        "clusters": k,
+        "documents": len(np.unique(doc_ids)),
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+__all__ = [
+    "VectorStoreMismatch",
+    "quantize",
+    "dequantize",
+    "write_document",
+    "remove_document",
+    "embed_segment",
+    "VectorStore",
+    "open_store",
+    "kmeans",
+    "needs_rebuild",
+    "rebuild",
+]
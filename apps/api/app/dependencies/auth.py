@@ -1,20 +1,64 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import Optional
 from app.core.database import get_db
 from app.core.security import decode_access_token
+from app.core.principal_cache import principal_cache, hash_token
+from app.core.rate_limit import SlidingWindowLimiter
+from app.core.metrics import counter
+from app.core.config import settings
 from app.models.user import User, UserRole
 from app.models.city import City, CityAdmin
 
 security = HTTPBearer()
 
+login_limiter = SlidingWindowLimiter(
+    limit=settings.LOGIN_RATE_LIMIT_ATTEMPTS,
+    window=settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+)
+login_throttled = counter(
+    "zeta_login_throttled_total",
+    "Login attempts rejected by the per-IP rate limit",
+)
+
+
+async def check_login_rate_limit(request: Request):
+    """
+    Reject login attempts over the per-IP limit before any DB or bcrypt work.
+    Behind a reverse proxy request.client is the proxy itself unless uvicorn runs with
+    --proxy-headers and the proxy is listed in FORWARDED_ALLOW_IPS; then it is the
+    X-Forwarded-For client, and a client-supplied header from anywhere else is ignored.
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = login_limiter.hit(client_ip)
+    if retry_after:
+        login_throttled.inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Try again later.",
+            headers={"Retry-After": str(int(retry_after) + 1)}
+        )
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
     token = credentials.credentials
+    token_hash = hash_token(token)
+    
+    # Fast path: token already verified and not revoked since
+    cached_user = principal_cache.get(token_hash)
+    if cached_user is not None:
+        return cached_user
+    
+    if principal_cache.is_revoked(token_hash):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+    
     payload = decode_access_token(token)
     
     if payload is None:
@@ -24,7 +68,8 @@ async def get_current_user(
         )
     
     user_id: int = payload.get("sub")
-    if user_id is None:
+    # Scoped tokens (e.g. the escalation stream token) are only valid where they are issued for
+    if user_id is None or payload.get("scope"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
@@ -37,6 +82,7 @@ async def get_current_user(
             detail="User not found"
         )
     
+    principal_cache.put(token_hash, user, token_expires_at=payload.get("exp"))
     return user
 
 
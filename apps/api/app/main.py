@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.routes import auth, cities, bot_config, products, analytics, audit_logs, health, escalations
+from app.core.metrics import MetricsMiddleware
+from app.middleware.query_stats import QueryStatsMiddleware
+from app.routes import auth, cities, bot_config, categories, products, products_public, analytics, audit_logs, health, escalations, metrics, conversations
+from app.routers import documents
 
 app = FastAPI(
     title="ZETA Platform API",
@@ -18,15 +21,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency and in-flight metrics, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Per-request SQL counts, N+1 warnings; X-DB-* headers when DEBUG is on
+app.add_middleware(QueryStatsMiddleware)
+
 # Include routers
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(auth.router)
 app.include_router(cities.router)
 app.include_router(bot_config.router)
+app.include_router(categories.router)
 app.include_router(products.router)
+app.include_router(products_public.router)
 app.include_router(analytics.router)
+app.include_router(conversations.router)
 app.include_router(escalations.router)
 app.include_router(audit_logs.router)
+app.include_router(documents.router)
 
 
 @app.get("/")
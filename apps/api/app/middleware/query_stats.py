@@ -0,0 +1,70 @@
+import logging
+from typing import Iterable
+
+from app.core.config import settings
+from app.core.query_stats import (
+    MAX_LOGGED_STATEMENT,
+    queries_per_request,
+    repeated_statements,
+    start_request_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware collecting SQL statistics per request.
+
+    Repeated identical statements (likely N+1) are always logged. With
+    settings.DEBUG the totals are also returned as X-DB-* response headers
+    and logged for every request.
+    """
+
+    def __init__(self, app, exclude_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = start_request_stats()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                headers = list(message.get("headers", []))
+                headers.extend([
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-query-time-ms", f"{stats.total_seconds * 1000:.1f}".encode()),
+                    (b"x-db-slowest-query-ms", f"{stats.slowest_seconds * 1000:.1f}".encode()),
+                ])
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._report(scope, stats)
+
+    def _report(self, scope, stats):
+        route = getattr(scope.get("route"), "path", "unmatched")
+        method = scope.get("method", "")
+        if stats.count:
+            queries_per_request.observe(stats.count, route=route)
+
+        repeated = stats.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        if repeated:
+            repeated_statements.inc(route=route)
+            for statement, n in repeated:
+                logger.warning(
+                    f"Possible N+1 on {method} {route}: statement ran {n} times: "
+                    f"{statement[:MAX_LOGGED_STATEMENT]}"
+                )
+
+        if settings.DEBUG:
+            logger.info(
+                f"{method} {route}: {stats.count} queries in {stats.total_seconds * 1000:.1f}ms "
+                f"(slowest {stats.slowest_seconds * 1000:.1f}ms: {(stats.slowest_statement or '-')[:200]})"
+            )
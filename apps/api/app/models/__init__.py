@@ -3,12 +3,16 @@ from app.models.session import Session
 from app.models.city import City, CityAdmin
 from app.models.bot_config import BotConfig
 from app.models.category import Category
+from app.models.category_closure import CategoryClosure
 from app.models.product import Product
 from app.models.conversation import Conversation
 from app.models.message import Message
 from app.models.audit_log import AuditLog
 from app.models.escalation import Escalation
 from app.models.analytics_event import AnalyticsEvent
+from app.models.document import Document
+from app.models.extraction_job import ExtractionJob
+from app.models.price_import import PriceImport
 
 __all__ = [
     "User",
@@ -17,10 +21,14 @@ __all__ = [
     "CityAdmin",
     "BotConfig",
     "Category",
+    "CategoryClosure",
     "Product",
     "Conversation",
     "Message",
     "AuditLog",
     "Escalation",
     "AnalyticsEvent",
+    "Document",
+    "ExtractionJob",
+    "PriceImport",
 ]
@@ -6,12 +6,14 @@ from app.core.database import Base
 
 class AnalyticsEvent(Base):
     __tablename__ = "analytics_events"
+    # Monthly partitions by created_at (app.core.partitions), so the key includes it
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), nullable=False)
     event_type = Column(String, nullable=False, index=True)  # "search", "escalation", "product_view", etc.
     data = Column(JSON, nullable=True)  # Event-specific data
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True, index=True)
 
     # Relationships
     city = relationship("City", back_populates="analytics_events")
@@ -19,6 +19,7 @@ class BotConfig(Base):
     greeting_message = Column(Text, nullable=True)
     manager_contact = Column(String, nullable=True)
     escalation_action = Column(Enum(EscalationAction), default=EscalationAction.LOG_ONLY, nullable=False)
+    version = Column(Integer, default=1, server_default="1", nullable=False)  # Bumped on every write, pushed to bots
 
     # Relationships
     city = relationship("City", back_populates="bot_config")
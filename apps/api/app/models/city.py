@@ -12,6 +12,7 @@ class City(Base):
     bot_token = Column(String, nullable=True)
     webhook_url = Column(String, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    category_version = Column(Integer, default=0, nullable=False)  # Bumped on every category tree change
 
     # Relationships
     admins = relationship("CityAdmin", back_populates="city", cascade="all, delete-orphan")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -6,11 +6,17 @@ from app.core.database import Base
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Latest conversation of a bot user (app.core.conversation_log)
+        Index("ix_conversations_user_lookup", "city_id", "channel", "user_telegram_id", "started_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), nullable=False, index=True)
-    user_telegram_id = Column(String, nullable=False, index=True)
+    user_telegram_id = Column(String, nullable=False, index=True)  # Telegram user id, or WhatsApp phone number
+    channel = Column(String, default="telegram", nullable=False)  # telegram, whatsapp
     started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_message_at = Column(DateTime, nullable=True)
     ended_at = Column(DateTime, nullable=True)
 
     # Relationships
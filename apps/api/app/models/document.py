@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Document(Base):
+    __tablename__ = "documents"
+    __table_args__ = (
+        # Content-addressed: the same bytes are stored once per city
+        UniqueConstraint("city_id", "sha256", name="uq_documents_city_sha256"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), nullable=False, index=True)
+    sha256 = Column(String(64), nullable=False)
+    filename = Column(String, nullable=False)  # Original name as uploaded
+    doc_type = Column(String, nullable=False)  # "catalog", "price_list", "manual", "other"
+    description = Column(Text, nullable=True)
+    content_type = Column(String, nullable=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    storage_path = Column(String, nullable=False)  # Relative to DOCUMENT_STORAGE_PATH
+    uploaded_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    city = relationship("City")
+    uploader = relationship("User", foreign_keys=[uploaded_by])
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, JSON, DateTime, Text
+from sqlalchemy import Column, Integer, String, BigInteger, Boolean, ForeignKey, JSON, DateTime, Text, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -6,6 +7,16 @@ from app.core.database import Base
 
 class Escalation(Base):
     __tablename__ = "escalations"
+    __table_args__ = (
+        # Inbox listing: filter by city (+status), newest first, keyset on (created_at, id)
+        Index("ix_escalations_city_status_created", "city_id", "status", "created_at", "id"),
+        Index("ix_escalations_city_created", "city_id", "created_at", "id"),
+        # At most one escalation per user and city still collecting repeat requests
+        Index(
+            "uq_escalations_open_per_user", "city_id", "user_telegram_id",
+            unique=True, postgresql_where=text("is_open")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), nullable=False)
@@ -19,6 +30,13 @@ class Escalation(Base):
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     resolved_at = Column(DateTime(timezone=True), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)  # Claim returns to the queue after this
+    is_open = Column(Boolean, default=True, server_default=text("true"), nullable=False)  # Repeat requests merge into this row
+    product_skus = Column(JSONB, nullable=True)  # Every SKU asked about, first request first
+    reasons = Column(JSONB, nullable=True)
+    event_count = Column(Integer, default=1, server_default="1", nullable=False)
+    last_event_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     city = relationship("City", back_populates="escalations")
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class PriceImport(Base):
+    __tablename__ = "price_imports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="SET NULL"), nullable=True, index=True)
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String, default="running", nullable=False)  # running, applied, failed
+    columns = Column(JSONB, nullable=True)  # {"sheet", "header_row", "sku", "price", "stock"} as detected
+    rows_total = Column(Integer, default=0, nullable=False)  # Data rows with a SKU and a price or stock
+    rows_matched = Column(Integer, default=0, nullable=False)  # Products found by normalized SKU
+    rows_changed = Column(Integer, default=0, nullable=False)  # Products whose price or stock changed
+    rows_unmatched = Column(Integer, default=0, nullable=False)
+    unmatched_sample = Column(JSONB, nullable=True)  # First unmatched SKUs as written in the file
+    diff_path = Column(String, nullable=True)  # CSV of every change, relative to DOCUMENT_STORAGE_PATH
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    document = relationship("Document")
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.sku import SKU_KEY_SQL
 
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Price-list matching by normalized SKU (app.core.sku)
+        Index("ix_products_city_sku_key", "city_id", text(f"({SKU_KEY_SQL})")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), nullable=False, index=True)
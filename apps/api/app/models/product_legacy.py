@@ -1,14 +1,19 @@
 """
 Legacy Product Model - matches old ZETA bot database schema
 37,318 furniture products imported from zeta-bot dump
+
+Mapped on its own declarative base: its table is also called "products", so it
+cannot share metadata with app.models.Product, and alembic (which migrates
+Base.metadata) never touches it. Query it through get_legacy_db/LegacySessionLocal.
 """
 from sqlalchemy import Column, Integer, String, Text, Numeric, ARRAY, JSON
 from sqlalchemy.dialects.postgresql import JSONB
-from datetime import datetime
-from app.core.database import Base
+from sqlalchemy.orm import declarative_base
+
+LegacyBase = declarative_base()
 
 
-class ProductLegacy(Base):
+class ProductLegacy(LegacyBase):
     """Product model matching old zeta-bot schema (37k products)"""
     __tablename__ = "products"
     
@@ -4,14 +4,24 @@ from sqlalchemy import select
 from datetime import timedelta
 
 from app.database import get_db
-from app.models import User, Session as DBSession
+from app.models import User
+from app.session_store import session_store, SessionStoreUnavailable, start_session_purge, stop_session_purge
 from app.schemas import UserCreate, UserLogin, UserResponse, Token
 from app.auth import (
     hash_password, verify_password, create_access_token, 
-    hash_token, get_current_user
+    hash_token, get_current_user, session_store_unavailable_exception
 )
+from app.core.principal_cache import principal_cache
+from app.core.security import PasswordHasherBusy, hasher_busy_exception
+from app.dependencies.auth import check_login_rate_limit
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+# The app mounting this router runs the SQL session purge for its lifetime
+router = APIRouter(
+    prefix="/auth",
+    tags=["Authentication"],
+    on_startup=[start_session_purge],
+    on_shutdown=[stop_session_purge]
+)
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -26,10 +36,15 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             detail="Email already registered"
         )
     
+    try:
+        password_hash = await hash_password(user_data.password)
+    except PasswordHasherBusy:
+        raise hasher_busy_exception()
+    
     # Create new user
     new_user = User(
         email=user_data.email,
-        password_hash=hash_password(user_data.password),
+        password_hash=password_hash,
         role=user_data.role
     )
     
@@ -40,7 +55,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     return new_user
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(check_login_rate_limit)])
 async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login and receive access token"""
     
@@ -48,7 +63,12 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == credentials.email))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(credentials.password, user.password_hash):
+    try:
+        password_ok = user is not None and await verify_password(credentials.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise hasher_busy_exception()
+    
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -60,15 +80,7 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     )
     
     # Store session
-    token_hash = hash_token(access_token)
-    session = DBSession(
-        user_id=user.id,
-        token_hash=token_hash,
-        expires_at=expires_at
-    )
-    
-    db.add(session)
-    await db.commit()
+    await session_store.create(user.id, hash_token(access_token), expires_at)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -81,15 +93,15 @@ async def logout(
     """Logout and invalidate current session"""
     
     # Delete all sessions for this user (or just current one if you track it)
-    result = await db.execute(
-        select(DBSession).where(DBSession.user_id == current_user.id)
-    )
-    sessions = result.scalars().all()
+    try:
+        token_hashes = await session_store.delete_user(current_user.id)
+    except SessionStoreUnavailable:
+        raise session_store_unavailable_exception()
     
-    for session in sessions:
-        await db.delete(session)
-    
-    await db.commit()
+    # Sessions are gone; drop cached principals so the tokens stop working now
+    principal_cache.invalidate_user(current_user.id)
+    for token_hash in token_hashes:
+        principal_cache.revoke_token(token_hash)
     return None
 
 
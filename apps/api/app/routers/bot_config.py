@@ -10,6 +10,7 @@ from app.schemas import BotConfigUpdate, BotConfigResponse, AnalyticsResponse, C
 from app.dependencies import get_user_city_access
 from app.config import settings
 from app.auth import get_current_user
+from app.core.config_events import publish_config_update_async
 
 router = APIRouter(prefix="/cities/{city_id}", tags=["Bot Configuration"])
 
@@ -113,6 +114,7 @@ async def update_bot_config(
         setattr(bot_config, field, value)
     
     bot_config.updated_by = current_user.id
+    bot_config.version = BotConfig.version + 1
     
     # Log audit
     audit = AuditLog(
@@ -129,8 +131,17 @@ async def update_bot_config(
     await db.commit()
     await db.refresh(bot_config)
     
-    # Invalidate cache
+    # Invalidate cache and push the new version to subscribed bots
     await invalidate_cache(city.id)
+    await publish_config_update_async(city.id, bot_config.version, {
+        "id": bot_config.id,
+        "city_id": bot_config.city_id,
+        "system_prompt": bot_config.system_prompt,
+        "greeting_message": bot_config.greeting_message,
+        "manager_contact": bot_config.manager_contact,
+        "escalation_action": bot_config.escalation_action.value,
+        "version": bot_config.version
+    })
     
     return bot_config
 
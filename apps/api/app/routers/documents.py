@@ -3,308 +3,741 @@ Document Upload & Management API
 Allows admins to upload catalogs, price lists, manuals for bot reference
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
-from typing import List, Optional
-import os
-import shutil
-from pathlib import Path
+import hashlib
 import logging
+import os
+import time
+import uuid
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-# TODO: Import actual dependencies when implementing
-# from app.dependencies import get_current_admin
-# from app.database import get_db
+import anyio
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core import doc_index
+from app.core.doc_index import segment_cache
+from app.core import vector_index
+from app.core.document_storage import (
+    index_path, object_path, storage_root, text_path, tmp_dir as upload_tmp_dir, vectors_dir,
+)
+from app.core.embeddings import get_embedder
+from app.core.extraction_jobs import ACTIVE_STATUSES, enqueue_extraction, latest_job
+from app.dependencies.auth import get_current_user, get_user_cities
+from app.middleware.audit import create_audit_log
+from app.models.document import Document
+from app.models.extraction_job import ExtractionJob
+from app.models.price_import import PriceImport
+from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-# Document storage configuration
-DOCUMENT_STORAGE_BASE = os.getenv("DOCUMENT_STORAGE_PATH", "/data/documents")
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+MAX_FILE_SIZE = settings.DOCUMENT_MAX_FILE_SIZE
 ALLOWED_EXTENSIONS = {".pdf", ".xlsx", ".xls", ".docx", ".txt", ".csv"}
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+MAX_FORM_FIELD_SIZE = 64 * 1024  # doc_type, description
+MAX_FORM_PARTS = 8
+MAX_SEARCH_RESULTS = 20
+SEARCH_MODES = {"keyword", "semantic"}
 
 
-@router.post("/cities/{city_id}/documents")
-async def upload_document(
-    city_id: int,
-    file: UploadFile = File(...),
-    doc_type: str = Form(...),  # "catalog" / "price_list" / "manual" / "other"
-    description: Optional[str] = Form(None),
-    # current_user = Depends(get_current_admin)  # TODO: Add auth
-):
-    """
-    Upload document for bot to reference.
-    
-    Bot can search within these documents using:
-    - PyPDF2 for PDF text extraction
-    - pandas for Excel parsing
-    - OpenAI embeddings for semantic search
-    
-    Args:
-        city_id: City ID document belongs to
-        file: Uploaded file
-        doc_type: Document type (catalog/price_list/manual/other)
-        description: Optional description
-    
-    Returns:
-        Document metadata and file ID
-    
-    TODO (Next Phase):
-    - Add authentication/authorization
-    - Implement actual database storage
-    - Extract text content for indexing
-    - Generate embeddings for semantic search
-    - Setup document versioning
-    """
-    logger.info(f"Document upload request: {file.filename} for city {city_id}")
-    
-    # Validate file extension
-    file_ext = Path(file.filename).suffix.lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
+class DocumentResponse(BaseModel):
+    id: int
+    city_id: int
+    sha256: str
+    filename: str
+    doc_type: str
+    description: Optional[str]
+    content_type: Optional[str]
+    size_bytes: int
+    uploaded_by: Optional[int]
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class DocumentUploadResponse(DocumentResponse):
+    duplicate: bool = False
+    job_id: Optional[int] = None
+
+
+class ExtractionJobResponse(BaseModel):
+    id: int
+    document_id: int
+    city_id: int
+    status: str
+    pages_done: int
+    pages_total: Optional[int]
+    progress: Optional[float] = None  # 0..1, when the page count is known
+    attempts: int
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+class PriceImportResponse(BaseModel):
+    id: int
+    document_id: Optional[int]
+    city_id: int
+    status: str  # running, applied, failed
+    columns: Optional[dict]  # Detected columns per sheet
+    rows_total: int
+    rows_matched: int
+    rows_changed: int
+    rows_unmatched: int
+    unmatched_sample: Optional[List[str]]
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+class DocumentSearchRequest(BaseModel):
+    city_id: int
+    query: str
+    doc_type: Optional[str] = None
+    limit: int = 5
+    mode: str = "keyword"  # "keyword" (BM25) or "semantic" (embeddings)
+
+
+class DocumentSearchResult(BaseModel):
+    document_id: int
+    filename: str
+    doc_type: str
+    page: int
+    label: str  # "p. 12", "Прайс, rows 101-200", ...
+    score: float
+    excerpt: str
+    highlights: List[List[int]]
+
+
+class DocumentSearchResponse(BaseModel):
+    query: str
+    city_id: int
+    mode: str
+    results: List[DocumentSearchResult]
+    count: int
+    took_ms: float
+
+
+def _job_response(job: ExtractionJob) -> ExtractionJobResponse:
+    result = ExtractionJobResponse.model_validate(job)
+    if job.status == "done":
+        result.progress = 1.0
+    elif job.pages_total:
+        result.progress = round(min(job.pages_done / job.pages_total, 1.0), 3)
+    return result
+
+
+def _check_city_access(current_user: User, db: Session, city_id: int):
+    if city_id not in get_user_cities(current_user, db):
         raise HTTPException(
-            status_code=400,
-            detail=f"File type not allowed. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this city"
         )
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {MAX_FILE_SIZE // (1024 * 1024)} MB limit"
+    )
+
+
+def _bad_upload(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+class _StreamedUpload:
+    """
+    multipart.MultipartParser callbacks for one upload.
     
-    # Create city document directory
-    city_dir = Path(DOCUMENT_STORAGE_BASE) / str(city_id)
-    city_dir.mkdir(parents=True, exist_ok=True)
+    Small form fields are kept in memory; bytes of the "file" part are hashed
+    and queued in `pending` for the caller to write, so nothing is spooled.
+    """
     
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_filename = f"{timestamp}_{file.filename}"
-    file_path = city_dir / safe_filename
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.pending: List[bytes] = []
+        self.complete = False
+        self._parts = 0
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name: Optional[str] = None
+        self._is_file = False
+        self._value = bytearray()
+    
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_end": self.on_end,
+        }
+    
+    def on_part_begin(self):
+        self._parts += 1
+        if self._parts > MAX_FORM_PARTS:
+            raise _bad_upload("Too many form fields")
+        self._headers = {}
+        self._value = bytearray()
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+    
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._is_file = self._name == "file" and b"filename" in options
+        if not self._is_file:
+            return
+        if self.filename is not None:
+            raise _bad_upload("Only one file per upload")
+        self.filename = options[b"filename"].decode("utf-8", "replace")
+        self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+        # Reject a wrong type before its bytes arrive
+        if Path(self.filename).suffix.lower() not in ALLOWED_EXTENSIONS:
+            raise _bad_upload(f"File type not allowed. Allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}")
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        if self._is_file:
+            self.size += len(chunk)
+            if self.size > MAX_FILE_SIZE:
+                raise _too_large()
+            self.digest.update(chunk)
+            self.pending.append(chunk)
+        else:
+            self._value += chunk
+            if len(self._value) > MAX_FORM_FIELD_SIZE:
+                raise _bad_upload(f"Form field '{self._name}' is too large")
+    
+    def on_part_end(self):
+        if not self._is_file and self._name:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+    
+    def on_end(self):
+        self.complete = True
+
+
+async def _receive_upload(request: Request, tmp_path: Path) -> _StreamedUpload:
+    """
+    Parse the multipart body as it arrives, writing the file part to tmp_path.
     
-    # Save file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        logger.info(f"✓ File saved: {file_path}")
-    except Exception as e:
-        logger.error(f"✗ File save error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-    
-    # TODO: Extract content for search indexing
-    # if file_ext == '.pdf':
-    #     text_content = extract_pdf_text(file_path)
-    # elif file_ext in ['.xlsx', '.xls']:
-    #     text_content = extract_excel_text(file_path)
-    # else:
-    #     text_content = extract_text_content(file_path)
-    
-    # TODO: Generate embeddings for semantic search
-    # embeddings = await generate_embeddings(text_content)
-    
-    # TODO: Store in database
-    # doc_record = await db.execute(
-    #     "INSERT INTO documents (city_id, filename, file_path, doc_type, description) "
-    #     "VALUES (?, ?, ?, ?, ?)",
-    #     (city_id, file.filename, str(file_path), doc_type, description)
-    # )
-    
-    return {
-        "success": True,
-        "file_id": safe_filename,  # TODO: Use actual DB ID
-        "filename": file.filename,
-        "doc_type": doc_type,
-        "file_path": str(file_path),
-        "size_bytes": file_path.stat().st_size,
-        "uploaded_at": datetime.now().isoformat(),
-        "message": "Document uploaded successfully. TODO: Implement indexing and search."
-    }
+    Each byte is hashed and written once; FastAPI's form parsing (which spools
+    the whole body to a temp file before the handler runs) is never involved.
+    Raises 413 as soon as the file passes MAX_FILE_SIZE and 400 on a malformed
+    body; the caller removes the partial temp file.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise _bad_upload("Expected a multipart/form-data body")
+    
+    upload = _StreamedUpload()
+    parser = MultipartParser(options[b"boundary"], upload.callbacks())
+    async with await anyio.open_file(tmp_path, "wb") as out:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if upload.pending:
+                    await out.write(b"".join(upload.pending))
+                    upload.pending.clear()
+            parser.finalize()
+        except MultipartParseError:
+            raise _bad_upload("Malformed multipart body")
+        if not upload.complete:
+            raise _bad_upload("Incomplete multipart body")
+        await out.flush()
+        await anyio.to_thread.run_sync(os.fsync, out.wrapped.fileno())
+    return upload
 
 
-@router.get("/cities/{city_id}/documents")
-async def list_documents(
-    city_id: int,
-    doc_type: Optional[str] = None,
-    # current_user = Depends(get_current_admin)  # TODO: Add auth
-):
+def _find_document(db: Session, city_id: int, sha256: str) -> Optional[Document]:
+    return db.query(Document).filter(
+        Document.city_id == city_id,
+        Document.sha256 == sha256
+    ).first()
+
+
+def _lock_content(db: Session, city_id: int, sha256: str):
+    """
+    Serialize uploads and deletes of the same bytes until the transaction ends.
+    
+    Holding it, "is there a row for this hash" and the file operations that depend
+    on the answer (renaming a blob in, unlinking it) cannot interleave.
+    """
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:city_id, :key)"),
+        {"city_id": city_id, "key": int(sha256[:8], 16) - 2 ** 31}
+    )
+
+
+def _save_document(
+    db: Session, document: Document, tmp_path: Path, current_user: User
+) -> Tuple[Document, Optional[ExtractionJob], bool]:
     """
-    List documents for city.
+    Move the upload into content-addressed storage, insert the metadata row and queue its extraction job.
     
-    TODO: Implement database query and return actual documents
+    Returns (document, job, duplicate). A duplicate returns the existing document and
+    its latest job and discards the upload: the blob the existing row points to is kept,
+    even when the duplicate arrived under another extension.
     """
-    logger.info(f"List documents for city {city_id}, type={doc_type}")
-    
-    city_dir = Path(DOCUMENT_STORAGE_BASE) / str(city_id)
-    
-    if not city_dir.exists():
-        return {"documents": [], "count": 0}
-    
-    # Stub: List files in directory
-    # TODO: Query from database instead
-    documents = []
-    for file_path in city_dir.iterdir():
-        if file_path.is_file():
-            documents.append({
-                "filename": file_path.name,
-                "size_bytes": file_path.stat().st_size,
-                "modified_at": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-            })
-    
-    return {
-        "city_id": city_id,
-        "documents": documents,
-        "count": len(documents),
-        "message": "TODO: Implement database-backed document listing"
+    _lock_content(db, document.city_id, document.sha256)
+    existing = _find_document(db, document.city_id, document.sha256)
+    if existing:
+        db.rollback()  # Release the lock
+        tmp_path.unlink(missing_ok=True)
+        return existing, latest_job(db, existing.id), True
+    
+    final_path = storage_root() / document.storage_path
+    try:
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        # Same directory tree, same filesystem: the rename is atomic
+        os.replace(tmp_path, final_path)
+    except OSError as e:
+        db.rollback()
+        tmp_path.unlink(missing_ok=True)
+        logger.error(f"✗ File save error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save file")
+    
+    db.add(document)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Only reachable without the lock's protection (e.g. a row inserted by hand)
+        db.rollback()
+        final_path.unlink(missing_ok=True)
+        existing = _find_document(db, document.city_id, document.sha256)
+        return existing, latest_job(db, existing.id), True
+    job = enqueue_extraction(db, document)
+    db.commit()
+    db.refresh(document)
+    db.refresh(job)
+    
+    create_audit_log(
+        db=db,
+        user_id=current_user.id,
+        city_id=document.city_id,
+        action="CREATE",
+        table_name="documents",
+        record_id=document.id,
+        new_value={"filename": document.filename, "sha256": document.sha256, "size_bytes": document.size_bytes}
+    )
+    return document, job, False
+
+
+# The body is parsed by _receive_upload, not FastAPI; describe the form for the docs
+UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file", "doc_type"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "doc_type": {"type": "string", "description": "catalog / price_list / manual / other"},
+                        "description": {"type": "string"},
+                    },
+                }
+            }
+        },
     }
+}
 
 
-@router.delete("/cities/{city_id}/documents/{document_id}")
-async def delete_document(
+@router.post(
+    "/cities/{city_id}/documents",
+    response_model=DocumentUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=UPLOAD_FORM_SCHEMA
+)
+async def upload_document(
     city_id: int,
-    document_id: str,
-    # current_user = Depends(get_current_admin)  # TODO: Add auth
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
 ):
     """
-    Delete document.
+    Upload a document for the bot to reference (multipart form: file, doc_type, description).
+    
+    The body is parsed as it arrives: the file is hashed (SHA-256) and written
+    once, to a temp file in the storage tree, then renamed into
+    content-addressed storage. Oversized uploads are refused by Content-Length
+    before reading, or with 413 as soon as the limit is passed. Uploading
+    bytes the city already has returns the existing record with
+    duplicate=true and 200, and the new copy is discarded.
     
-    TODO: Implement actual deletion with database cleanup
+    Text extraction runs in the background worker; poll
+    GET /documents/jobs/{job_id} for progress.
     """
-    logger.info(f"Delete document {document_id} from city {city_id}")
+    # Multipart overhead makes Content-Length an upper bound of the file size
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + UPLOAD_CHUNK_SIZE:
+        raise _too_large()
     
-    # TODO: Query database for document
-    # TODO: Delete file
-    # TODO: Delete database record
-    # TODO: Delete embeddings
+    await run_in_threadpool(_check_city_access, current_user, db, city_id)
+    # Don't hold a pooled connection while the file is being received
+    await run_in_threadpool(db.close)
     
-    return {
-        "success": False,
-        "message": "TODO: Implement document deletion"
-    }
+    tmp_dir = upload_tmp_dir(city_id)
+    await anyio.Path(tmp_dir).mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_dir / f"{uuid.uuid4().hex}.part"
+    
+    try:
+        upload = await _receive_upload(request, tmp_path)
+        if upload.filename is None or not upload.fields.get("doc_type"):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Form fields 'file' and 'doc_type' are required"
+            )
+    except OSError as e:
+        await anyio.Path(tmp_path).unlink(missing_ok=True)
+        logger.error(f"✗ File save error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save file")
+    except Exception:
+        await anyio.Path(tmp_path).unlink(missing_ok=True)  # Rejected, malformed or client disconnected
+        raise
+    
+    sha256, size = upload.digest.hexdigest(), upload.size
+    final_path = object_path(city_id, sha256, Path(upload.filename).suffix.lower())
+    
+    document = Document(
+        city_id=city_id,
+        sha256=sha256,
+        filename=upload.filename,
+        doc_type=upload.fields["doc_type"],
+        description=upload.fields.get("description") or None,
+        content_type=upload.content_type,
+        size_bytes=size,
+        storage_path=str(final_path.relative_to(storage_root())),
+        uploaded_by=current_user.id,
+    )
+    document, job, duplicate = await run_in_threadpool(_save_document, db, document, tmp_path, current_user)
+    
+    if duplicate:
+        response.status_code = status.HTTP_200_OK
+        logger.info(f"↺ Duplicate upload {upload.filename} for city {city_id} matches document {document.id}")
+    else:
+        logger.info(f"✓ Document {document.id} stored: {sha256} ({size} bytes), extraction job {job.id} queued")
+    
+    result = DocumentUploadResponse.model_validate(document)
+    result.duplicate = duplicate
+    result.job_id = job.id if job else None
+    return result
 
 
-@router.post("/search")
-async def search_documents(
+@router.get("/cities/{city_id}/documents", response_model=List[DocumentResponse])
+def list_documents(
     city_id: int,
-    query: str,
     doc_type: Optional[str] = None,
-    limit: int = 5
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
 ):
-    """
-    Search within documents using semantic search.
-    
-    TODO (Next Phase):
-    - Implement vector similarity search
-    - Use OpenAI embeddings for query
-    - Rank results by relevance
-    - Return excerpts with highlighting
-    
-    Args:
-        city_id: City ID to search within
-        query: Search query
-        doc_type: Optional document type filter
-        limit: Max results to return
-    
-    Returns:
-        List of relevant document excerpts
-    """
-    logger.info(f"Document search: '{query}' in city {city_id}")
-    
-    # TODO: Implement actual semantic search
-    # 1. Generate query embedding
-    # 2. Search vector database for similar chunks
-    # 3. Rank and return results
-    
-    return {
-        "query": query,
-        "city_id": city_id,
-        "results": [],
-        "count": 0,
-        "message": "TODO: Implement semantic document search with embeddings"
-    }
-
+    """List documents for city, newest first"""
+    _check_city_access(current_user, db, city_id)
+    
+    query = db.query(Document).filter(Document.city_id == city_id)
+    if doc_type:
+        query = query.filter(Document.doc_type == doc_type)
+    return query.order_by(Document.created_at.desc()).all()
 
-# Document text extraction utilities
-# TODO: Implement in next phase
 
-def extract_pdf_text(file_path: Path) -> str:
-    """
-    Extract text from PDF.
-    
-    TODO: Implement using PyPDF2 or pdfplumber
-    
-    Example:
-        import PyPDF2
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            return text
-    """
-    logger.warning("PDF text extraction: TODO")
-    return ""
+@router.delete("/cities/{city_id}/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_document(
+    city_id: int,
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete document record and its stored file"""
+    _check_city_access(current_user, db, city_id)
+    
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.city_id == city_id
+    ).first()
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    create_audit_log(
+        db=db,
+        user_id=current_user.id,
+        city_id=city_id,
+        action="DELETE",
+        table_name="documents",
+        record_id=document.id,
+        old_value={"filename": document.filename, "sha256": document.sha256}
+    )
+    
+    sha256 = document.sha256
+    storage_path = storage_root() / document.storage_path
+    extracted_path = text_path(document.city_id, sha256)
+    segment_path = index_path(document.city_id, document.id)
+    db.delete(document)
+    db.commit()
+    
+    # Files go only once the delete is committed, and only if an upload of the same
+    # bytes has not re-created the row meanwhile (the lock keeps one from starting now)
+    _lock_content(db, city_id, sha256)
+    if _find_document(db, city_id, sha256) is None:
+        storage_path.unlink(missing_ok=True)
+        extracted_path.unlink(missing_ok=True)
+    db.rollback()  # Release the lock
+    segment_path.unlink(missing_ok=True)
+    segment_cache.evict(str(segment_path))
+    vector_index.remove_document(vectors_dir(city_id), document_id)
+    
+    return None
 
 
-def extract_excel_text(file_path: Path) -> str:
-    """
-    Extract text from Excel.
+@router.post("/cities/{city_id}/documents/{document_id}/extract", response_model=ExtractionJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def reextract_document(
+    city_id: int,
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a new extraction job, e.g. after a failure or a parser upgrade"""
+    _check_city_access(current_user, db, city_id)
+    
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.city_id == city_id
+    ).first()
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
     
-    TODO: Implement using pandas
+    job = latest_job(db, document.id)
+    if job and job.status in ACTIVE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Extraction job {job.id} is already {job.status}"
+        )
     
-    Example:
-        import pandas as pd
-        df = pd.read_excel(file_path)
-        return df.to_string()
-    """
-    logger.warning("Excel text extraction: TODO")
-    return ""
+    job = enqueue_extraction(db, document)
+    db.commit()
+    db.refresh(job)
+    return _job_response(job)
 
 
-def extract_text_content(file_path: Path) -> str:
-    """
-    Extract text from generic file.
+@router.get("/cities/{city_id}/jobs", response_model=List[ExtractionJobResponse])
+def list_extraction_jobs(
+    city_id: int,
+    status_filter: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recent extraction jobs for city, newest first"""
+    _check_city_access(current_user, db, city_id)
     
-    TODO: Implement based on file type
-    """
-    logger.warning("Text extraction: TODO")
-    return ""
+    query = db.query(ExtractionJob).filter(ExtractionJob.city_id == city_id)
+    if status_filter:
+        query = query.filter(ExtractionJob.status == status_filter)
+    return [_job_response(job) for job in query.order_by(ExtractionJob.id.desc()).limit(limit).all()]
 
 
-async def generate_embeddings(text: str) -> List[float]:
-    """
-    Generate embeddings for text using OpenAI.
+@router.get("/jobs/{job_id}", response_model=ExtractionJobResponse)
+def get_extraction_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Extraction status and page progress"""
+    job = db.query(ExtractionJob).filter(ExtractionJob.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    _check_city_access(current_user, db, job.city_id)
     
-    TODO: Implement using OpenAI embeddings API
+    return _job_response(job)
+
+
+def _get_price_import(db: Session, current_user: User, import_id: int) -> PriceImport:
+    price_import = db.query(PriceImport).filter(PriceImport.id == import_id).first()
+    if not price_import:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Price import not found"
+        )
+    _check_city_access(current_user, db, price_import.city_id)
+    return price_import
+
+
+@router.get("/cities/{city_id}/price-imports", response_model=List[PriceImportResponse])
+def list_price_imports(
+    city_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Price lists applied to the city's products, newest first"""
+    _check_city_access(current_user, db, city_id)
+    
+    return db.query(PriceImport).filter(
+        PriceImport.city_id == city_id
+    ).order_by(PriceImport.id.desc()).limit(limit).all()
+
+
+@router.get("/price-imports/{import_id}", response_model=PriceImportResponse)
+def get_price_import(
+    import_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Price import status and match counts"""
+    return _get_price_import(db, current_user, import_id)
+
+
+@router.get("/price-imports/{import_id}/diff")
+def get_price_import_diff(
+    import_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """CSV of every product whose price or stock the import changed"""
+    price_import = _get_price_import(db, current_user, import_id)
+    if not price_import.diff_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Price import has no report"
+        )
     
-    Example:
-        from openai import AsyncOpenAI
-        client = AsyncOpenAI()
-        response = await client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
+    return FileResponse(
+        storage_root() / price_import.diff_path,
+        media_type="text/csv",
+        filename=f"price-import-{price_import.id}.csv"
+    )
+
+
+def _semantic_hits(city_id: int, query: str, segments: dict, limit: int) -> List[doc_index.SearchHit]:
+    """Nearest chunks by embedding, restricted to documents that have a segment"""
+    try:
+        embedding = get_embedder(settings.DOCUMENT_EMBEDDER).embed([query])[0]
+        candidates = vector_index.open_store(vectors_dir(city_id)).search(
+            embedding, set(segments), limit * 4, settings.DOCUMENT_VECTOR_NPROBE
         )
-        return response.data[0].embedding
-    """
-    logger.warning("Embedding generation: TODO")
-    return []
+    except vector_index.VectorStoreMismatch as e:
+        logger.error(f"Vector index for city {city_id} unusable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Semantic index is unavailable; use keyword search"
+        )
+    ranked = ((segments[document_id], chunk, score) for document_id, chunk, score in candidates)
+    return doc_index.collect_hits(ranked, query, limit)
 
 
-async def index_document(city_id: int, filename: str, text: str):
+@router.post("/search", response_model=DocumentSearchResponse)
+def search_documents(
+    body: DocumentSearchRequest,
+    db: Session = Depends(get_db)
+):
     """
-    Index document for search.
-    
-    TODO: Implement chunking and vector storage
-    - Split text into chunks
-    - Generate embeddings for each chunk
-    - Store in vector database (Pinecone/Qdrant/pgvector)
-    
-    Example:
-        chunks = split_into_chunks(text, chunk_size=500)
-        for i, chunk in enumerate(chunks):
-            embedding = await generate_embeddings(chunk)
-            await vector_db.insert({
-                "id": f"{city_id}_{filename}_{i}",
-                "text": chunk,
-                "embedding": embedding,
-                "metadata": {"city_id": city_id, "filename": filename}
-            })
+    Search within a city's documents.
+    
+    mode=keyword ranks chunks by BM25; mode=semantic by embedding similarity
+    (IVF over int8 vectors). Public, like product search: the bot calls it
+    for /docs. Each result is the best-matching excerpt of one page, with
+    `highlights` as [start, end) character offsets of query-term matches.
     """
-    logger.warning("Document indexing: TODO")
+    started = time.perf_counter()
+    limit = min(max(body.limit, 1), MAX_SEARCH_RESULTS)
+    if body.mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"mode must be one of: {', '.join(sorted(SEARCH_MODES))}"
+        )
+    
+    query = db.query(Document.id, Document.filename, Document.doc_type).filter(Document.city_id == body.city_id)
+    if body.doc_type:
+        query = query.filter(Document.doc_type == body.doc_type)
+    documents = {row.id: row for row in query.all()}
+    
+    # The table is authoritative: segments of deleted documents are never searched
+    segments = {}
+    for document_id in documents:
+        try:
+            segment = segment_cache.get(str(index_path(body.city_id, document_id)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable index segment for document {document_id}: {e}")
+            continue
+        if segment is not None:
+            segments[document_id] = segment
+    
+    if body.mode == "semantic":
+        hits = _semantic_hits(body.city_id, body.query, segments, limit)
+    else:
+        hits = doc_index.search(list(segments.values()), body.query, limit)
+    results = [
+        DocumentSearchResult(
+            document_id=hit.document_id,
+            filename=documents[hit.document_id].filename,
+            doc_type=documents[hit.document_id].doc_type,
+            page=hit.page,
+            label=hit.label,
+            score=hit.score,
+            excerpt=hit.excerpt,
+            highlights=[list(span) for span in hit.highlights],
+        )
+        for hit in hits
+    ]
+    took_ms = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(f"Document search '{body.query}' in city {body.city_id}: {len(results)} results in {took_ms}ms")
+    
+    return DocumentSearchResponse(
+        query=body.query,
+        city_id=body.city_id,
+        mode=body.mode,
+        results=results,
+        count=len(results),
+        took_ms=took_ms,
+    )
 
 
 __all__ = ["router"]
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel
 
+from app.core.archive import archived_counts
 from app.core.database import get_db
 from app.models.conversation import Conversation
 from app.models.message import Message
@@ -66,11 +67,12 @@ def get_city_analytics(
         Conversation.ended_at.is_(None)
     ).scalar()
     
-    # Total messages
+    # Total messages (months older than the live partitions come from the archive)
     total_messages = db.query(func.count(Message.id)).join(Conversation).filter(
         Conversation.city_id == city_id,
         Message.created_at >= start_date
     ).scalar()
+    total_messages += sum(archived_counts("messages", city_id, start_date.date()).values())
     
     # Unique users
     unique_users = db.query(func.count(func.distinct(Conversation.user_telegram_id))).filter(
@@ -95,6 +97,8 @@ def get_city_analytics(
     
     for event_type, count in events:
         event_counts[event_type] = count
+    for event_type, count in archived_counts("analytics_events", city_id, start_date.date()).items():
+        event_counts[event_type] = event_counts.get(event_type, 0) + count
     
     # Escalations
     total_escalations = db.query(func.count(Escalation.id)).filter(
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import create_access_token, decode_access_token, hasher_busy_exception, password_hasher, PasswordHasherBusy
+from app.core.principal_cache import principal_cache, hash_token
 from app.core.config import settings
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse, Token, LoginRequest
-from app.dependencies.auth import get_current_user
+from app.dependencies.auth import get_current_user, security, check_login_rate_limit
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -22,10 +24,15 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             detail="Email already registered"
         )
     
+    try:
+        password_hash = password_hasher.hash_sync(user_data.password)
+    except PasswordHasherBusy:
+        raise hasher_busy_exception()
+    
     # Create new user
     user = User(
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         role=user_data.role
     )
     db.add(user)
@@ -35,12 +42,17 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     return user
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(check_login_rate_limit)])
 def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     """Login and get access token"""
     user = db.query(User).filter(User.email == login_data.email).first()
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    try:
+        password_ok = user is not None and password_hasher.verify_sync(login_data.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise hasher_busy_exception()
+    
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -57,8 +69,14 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/logout")
-def logout(current_user: User = Depends(get_current_user)):
-    """Logout (client should discard token)"""
+def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user)
+):
+    """Logout and revoke the current token"""
+    token = credentials.credentials
+    payload = decode_access_token(token) or {}
+    principal_cache.revoke_token(hash_token(token), token_expires_at=payload.get("exp"))
     return {"message": "Successfully logged out"}
 
 
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_db, SessionLocal
+from app.core.config_events import publish_config_update, config_subscription, next_config_update
 from app.models.bot_config import BotConfig
 from app.models.user import User
 from app.schemas.bot_config import BotConfigCreate, BotConfigUpdate, BotConfigResponse
@@ -9,6 +14,25 @@ from app.middleware.audit import create_audit_log
 
 router = APIRouter(tags=["Bot Configuration"])
 
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def _serialize_config(config: BotConfig) -> dict:
+    return BotConfigResponse.model_validate(config).model_dump(mode="json")
+
+
+def _load_config_snapshot(city_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        config = db.query(BotConfig).filter(BotConfig.city_id == city_id).first()
+        return _serialize_config(config) if config else None
+    finally:
+        db.close()
+
+
+def _sse_event(payload: dict) -> str:
+    return f"event: config\nid: {payload['version']}\ndata: {json.dumps(payload)}\n\n"
+
 
 @router.get("/cities/{city_id}/bot-config", response_model=BotConfigResponse)
 def get_bot_config_public(
@@ -26,6 +50,48 @@ def get_bot_config_public(
     return config
 
 
+@router.get("/cities/{city_id}/bot-config/stream")
+async def stream_bot_config(
+    city_id: int,
+    request: Request,
+    since: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Server-sent events stream of config changes (public endpoint for bots).
+    
+    Sends the current config first if it is newer than `since` / Last-Event-ID,
+    then every subsequent version as it is written.
+    """
+    known_version = last_event_id if last_event_id is not None else (since or 0)
+    
+    async def event_stream():
+        nonlocal known_version
+        # Subscribe before reading the snapshot so no write falls in between
+        async with config_subscription(city_id) as pubsub:
+            snapshot = await run_in_threadpool(_load_config_snapshot, city_id)
+            if snapshot and snapshot["version"] > known_version:
+                known_version = snapshot["version"]
+                yield _sse_event(snapshot)
+            
+            while not await request.is_disconnected():
+                update = await next_config_update(pubsub, timeout=STREAM_HEARTBEAT_SECONDS)
+                if update is None:
+                    yield ": keepalive\n\n"
+                    continue
+                config = update.get("config") or {}
+                config.setdefault("version", update.get("version", 0))
+                if config["version"] > known_version:
+                    known_version = config["version"]
+                    yield _sse_event(config)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/cities/{city_id}/config", response_model=BotConfigResponse)
 def get_bot_config(
     city_id: int,
@@ -99,6 +165,7 @@ def update_bot_config(
         update_data = config_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(config, field, value)
+        config.version = BotConfig.version + 1
         
         db.commit()
         db.refresh(config)
@@ -114,4 +181,7 @@ def update_bot_config(
             new_value=update_data
         )
     
+    # Push to subscribed bots
+    publish_config_update(city_id, config.version, _serialize_config(config))
+    
     return config
@@ -0,0 +1,181 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.core.category_tree import CategoryMoveError, add_category, bump_version, get_tree, move_category
+from app.core.database import get_db
+from app.models.category import Category
+from app.models.user import User
+from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse, CategoryTreeResponse
+from app.dependencies.auth import get_current_user
+from app.middleware.audit import create_audit_log
+
+router = APIRouter(tags=["Categories"])
+
+
+def _check_access(city_id: int, current_user: User, db: Session):
+    from app.dependencies.auth import get_user_cities
+    
+    accessible_city_ids = get_user_cities(current_user, db)
+    if city_id not in accessible_city_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this city"
+        )
+
+
+def _get_category(db: Session, city_id: int, category_id: Optional[int], detail: str = "Category not found") -> Category:
+    category = db.query(Category).filter(
+        Category.id == category_id,
+        Category.city_id == city_id
+    ).first()
+    
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=detail
+        )
+    
+    return category
+
+
+@router.get(
+    "/cities/{city_id}/categories/tree",
+    response_model=CategoryTreeResponse,
+    responses={304: {"description": "Tree unchanged since the ETag sent in If-None-Match"}}
+)
+def get_category_tree(
+    city_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Whole category tree of a city (public, for bots).
+    Served from a cached snapshot; send the ETag back in If-None-Match to get 304 while it is unchanged.
+    """
+    tree = get_tree(db, city_id)
+    if tree is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="City not found"
+        )
+    
+    version, body = tree
+    etag = f'"{city_id}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post("/cities/{city_id}/categories", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
+def create_category(
+    city_id: int,
+    category_data: CategoryCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create a category, optionally under a parent"""
+    _check_access(city_id, current_user, db)
+    
+    bump_version(db, city_id)
+    if category_data.parent_id is not None:
+        _get_category(db, city_id, category_data.parent_id, detail="Parent category not found")
+    
+    category = Category(city_id=city_id, **category_data.model_dump())
+    db.add(category)
+    db.flush()
+    add_category(db, category)
+    db.commit()
+    db.refresh(category)
+    
+    create_audit_log(
+        db=db,
+        user_id=current_user.id,
+        city_id=city_id,
+        action="CREATE",
+        table_name="categories",
+        record_id=category.id,
+        new_value=category_data.model_dump()
+    )
+    
+    return category
+
+
+@router.put("/cities/{city_id}/categories/{category_id}", response_model=CategoryResponse)
+def update_category(
+    city_id: int,
+    category_id: int,
+    category_data: CategoryUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Rename a category, or move it with its subtree by setting parent_id"""
+    _check_access(city_id, current_user, db)
+    
+    bump_version(db, city_id)
+    category = _get_category(db, city_id, category_id)
+    old_values = {"name": category.name, "parent_id": category.parent_id}
+    update_data = category_data.model_dump(exclude_unset=True)
+    
+    if "parent_id" in update_data and update_data["parent_id"] != category.parent_id:
+        if update_data["parent_id"] is not None:
+            _get_category(db, city_id, update_data["parent_id"], detail="Parent category not found")
+        try:
+            move_category(db, category, update_data["parent_id"])
+        except CategoryMoveError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    if update_data.get("name"):
+        category.name = update_data["name"]
+    
+    db.commit()
+    db.refresh(category)
+    
+    create_audit_log(
+        db=db,
+        user_id=current_user.id,
+        city_id=city_id,
+        action="UPDATE",
+        table_name="categories",
+        record_id=category.id,
+        old_value=old_values,
+        new_value=update_data
+    )
+    
+    return category
+
+
+@router.delete("/cities/{city_id}/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_category(
+    city_id: int,
+    category_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a category with its subtree; their products are kept, uncategorized"""
+    _check_access(city_id, current_user, db)
+    
+    bump_version(db, city_id)
+    category = _get_category(db, city_id, category_id)
+    old_values = {"name": category.name, "parent_id": category.parent_id}
+    
+    # Bulk delete so the database cascades remove the subtree and its closure rows
+    # (the ORM would detach children instead) and set the products' category to NULL
+    db.query(Category).filter(Category.id == category_id).delete(synchronize_session=False)
+    db.commit()
+    
+    create_audit_log(
+        db=db,
+        user_id=current_user.id,
+        city_id=city_id,
+        action="DELETE",
+        table_name="categories",
+        record_id=category_id,
+        old_value=old_values
+    )
+    
+    return None
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.core.conversation_log import LoggedMessage, log_messages
+from app.core.database import get_db
+from app.models.city import City
+from app.models.message import MessageRole
+
+router = APIRouter(tags=["Conversations"])
+
+CHANNELS = {"telegram", "whatsapp"}
+
+
+# Schemas
+class LoggedMessageCreate(BaseModel):
+    user_id: str  # Telegram user id or WhatsApp phone number
+    role: str  # "user" / "assistant"
+    content: str
+    created_at: datetime
+    client_id: Optional[str] = Field(None, max_length=64)  # Unique per message; makes retries idempotent
+
+
+class MessageBatchCreate(BaseModel):
+    city_id: int
+    channel: str = "telegram"
+    messages: List[LoggedMessageCreate]
+
+
+class MessageBatchResponse(BaseModel):
+    stored: int
+    conversations_started: int
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.post("/conversations/messages/batch", response_model=MessageBatchResponse, status_code=status.HTTP_201_CREATED)
+def create_message_batch(
+    batch: MessageBatchCreate,
+    db: Session = Depends(get_db)
+):
+    """Store buffered chat messages from a bot (called by bot - no auth required)"""
+    if batch.channel not in CHANNELS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown channel '{batch.channel}'"
+        )
+    if len(batch.messages) > settings.MESSAGE_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.MESSAGE_BATCH_MAX} messages per batch"
+        )
+    
+    if not db.query(City.id).filter(City.id == batch.city_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="City not found"
+        )
+    
+    try:
+        messages = [
+            LoggedMessage(
+                user_id=message.user_id,
+                role=MessageRole(message.role.lower()),
+                content=message.content,
+                created_at=_naive_utc(message.created_at),
+                client_id=message.client_id
+            )
+            for message in batch.messages
+        ]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    return log_messages(db, batch.city_id, batch.channel, messages)
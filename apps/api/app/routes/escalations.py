@@ -1,19 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import json
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
-from datetime import datetime
+from sqlalchemy import and_, case, cast, desc, func, literal, literal_column, or_, tuple_
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.escalation_events import publish_escalation_event, escalation_subscription, next_escalation_event
+from app.core.security import create_access_token, decode_access_token
 from app.models.escalation import Escalation
-from app.models.user import User
+from app.models.user import User, UserRole
 from app.dependencies.auth import get_current_user
 from app.middleware.audit import create_audit_log
 
 
 router = APIRouter(tags=["Escalations"])
 
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_TOKEN_SECONDS = 60  # Only needs to outlive opening the EventSource; reconnects fetch a new one
+STREAM_TOKEN_SCOPE = "escalation_stream"
+
+optional_bearer = HTTPBearer(auto_error=False)
+
 
 # Schemas
 class EscalationCreate(BaseModel):
@@ -25,6 +40,11 @@ class EscalationCreate(BaseModel):
     conversation: Optional[list] = None
 
 
+class StreamToken(BaseModel):
+    token: str
+    expires_in: int
+
+
 class EscalationUpdate(BaseModel):
     status: Optional[str] = None
     assigned_to: Optional[int] = None
@@ -44,33 +64,202 @@ class EscalationResponse(BaseModel):
     notes: Optional[str]
     created_at: datetime
     resolved_at: Optional[datetime]
+    claimed_at: Optional[datetime] = None
+    lease_expires_at: Optional[datetime] = None
+    product_skus: Optional[List[str]] = None
+    reasons: Optional[List[str]] = None
+    event_count: int = 1
+    last_event_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class EscalationSummary(BaseModel):
+    """Inbox row: everything except the conversation blob"""
+    id: int
+    city_id: int
+    user_telegram_id: int
+    user_name: Optional[str]
+    product_sku: Optional[str]
+    reason: str
+    status: str
+    assigned_to: Optional[int]
+    created_at: datetime
+    resolved_at: Optional[datetime]
+    lease_expires_at: Optional[datetime] = None
+    product_skus: Optional[List[str]] = None
+    event_count: int = 1
+    last_event_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EscalationPage(BaseModel):
+    items: List[EscalationSummary]
+    next_cursor: Optional[str] = None
+
+
+# Columns loaded for inbox rows; the conversation JSON is only read by the detail endpoint
+SUMMARY_COLUMNS = (
+    Escalation.id,
+    Escalation.city_id,
+    Escalation.user_telegram_id,
+    Escalation.user_name,
+    Escalation.product_sku,
+    Escalation.reason,
+    Escalation.status,
+    Escalation.assigned_to,
+    Escalation.created_at,
+    Escalation.resolved_at,
+    Escalation.lease_expires_at,
+    Escalation.product_skus,
+    Escalation.event_count,
+    Escalation.last_event_at,
+)
+
+
+def _summary(escalation: Escalation) -> dict:
+    return EscalationSummary.model_validate(escalation).model_dump(mode="json")
+
+
+def _claimable(now: datetime):
+    """Pending escalations plus claims whose lease ran out (abandoned by their manager)"""
+    return or_(
+        Escalation.status == "pending",
+        and_(Escalation.status == "in_progress", Escalation.lease_expires_at < now)
+    )
+
+
+def _lease_active(escalation: Escalation, now: datetime) -> bool:
+    return (
+        escalation.status == "in_progress"
+        and escalation.lease_expires_at is not None
+        and escalation.lease_expires_at > now
+    )
+
+
+def _append_distinct(column, new_items):
+    """jsonb array `column` with `new_items` appended unless already present"""
+    current = func.coalesce(column, cast(literal("[]"), JSONB))
+    return case(
+        (current.op("@>", is_comparison=True)(new_items), current),
+        else_=current.op("||", return_type=JSONB)(new_items)
+    )
+
+
+def _upsert_escalation(db: Session, data: EscalationCreate, now: datetime) -> Tuple[int, bool]:
+    """
+    Insert an escalation or merge it into the user's open one in the same city.
+    
+    Returns (escalation id, inserted). An open escalation stops accepting merges
+    once it is claimed or has been quiet for ESCALATION_COALESCE_WINDOW_SECONDS.
+    """
+    window = timedelta(seconds=settings.ESCALATION_COALESCE_WINDOW_SECONDS)
+    
+    # Close the window on a stale open escalation first, so the insert below creates a new one
+    db.query(Escalation).filter(
+        Escalation.city_id == data.city_id,
+        Escalation.user_telegram_id == data.user_telegram_id,
+        Escalation.is_open.is_(True),
+        Escalation.last_event_at < now - window
+    ).update({Escalation.is_open: False}, synchronize_session=False)
+    
+    stmt = pg_insert(Escalation).values(
+        **data.model_dump(),
+        product_skus=[data.product_sku] if data.product_sku else [],
+        reasons=[data.reason],
+        event_count=1,
+        last_event_at=now,
+        is_open=True
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Escalation.city_id, Escalation.user_telegram_id],
+        index_where=Escalation.is_open,  # Must match the partial index predicate exactly ("WHERE is_open")
+        set_={
+            "product_skus": _append_distinct(Escalation.product_skus, stmt.excluded.product_skus),
+            "reasons": _append_distinct(Escalation.reasons, stmt.excluded.reasons),
+            # Each request carries the whole history so far; keep only the newest copy
+            "conversation": func.coalesce(stmt.excluded.conversation, Escalation.conversation),
+            "user_name": func.coalesce(stmt.excluded.user_name, Escalation.user_name),
+            "product_sku": func.coalesce(Escalation.product_sku, stmt.excluded.product_sku),
+            "event_count": Escalation.event_count + 1,
+            "last_event_at": stmt.excluded.last_event_at,
+        }
+    ).returning(Escalation.id, literal_column("xmax = 0").label("inserted"))
+    
+    row = db.execute(stmt).one()
+    db.commit()
+    return row.id, row.inserted
+
+
+def _encode_cursor(created_at: datetime, escalation_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{escalation_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, escalation_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(escalation_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
 @router.post("/escalations", response_model=EscalationResponse, status_code=status.HTTP_201_CREATED)
 def create_escalation(
     escalation_data: EscalationCreate,
+    response: Response,
     db: Session = Depends(get_db)
 ):
-    """Create a new escalation (called by bot - no auth required for now)"""
-    escalation = Escalation(**escalation_data.model_dump())
-    db.add(escalation)
-    db.commit()
-    db.refresh(escalation)
+    """
+    Create a new escalation (called by bot - no auth required for now).
+    
+    Repeat requests from the same user and city within the coalescing window are
+    merged into the open escalation (SKUs and reasons appended) and answered with 200.
+    """
+    if settings.ESCALATION_COALESCE_WINDOW_SECONDS <= 0:
+        escalation = Escalation(
+            **escalation_data.model_dump(),
+            product_skus=[escalation_data.product_sku] if escalation_data.product_sku else [],
+            reasons=[escalation_data.reason],
+            is_open=False
+        )
+        db.add(escalation)
+        db.commit()
+        db.refresh(escalation)
+        publish_escalation_event(escalation.city_id, "created", _summary(escalation))
+        return escalation
+    
+    escalation_id, inserted = _upsert_escalation(db, escalation_data, datetime.now(timezone.utc))
+    escalation = db.query(Escalation).filter(Escalation.id == escalation_id).first()
+    
+    if not inserted:
+        response.status_code = status.HTTP_200_OK
+    publish_escalation_event(escalation.city_id, "created" if inserted else "coalesced", _summary(escalation))
     return escalation
 
 
-@router.get("/cities/{city_id}/escalations", response_model=List[EscalationResponse])
+@router.get("/cities/{city_id}/escalations", response_model=EscalationPage)
 def get_city_escalations(
     city_id: int,
     status_filter: Optional[str] = None,
-    limit: int = 100,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get escalations for a city"""
+    """
+    Escalation inbox for a city, newest first.
+    
+    Returns summary rows only; pass next_cursor back as `cursor` for the next page.
+    Use GET /escalations/{id} for the full conversation.
+    """
     from app.dependencies.auth import get_user_cities
     
     accessible_city_ids = get_user_cities(current_user, db)
@@ -80,13 +269,280 @@ def get_city_escalations(
             detail="Access denied to this city"
         )
     
-    query = db.query(Escalation).filter(Escalation.city_id == city_id)
+    query = db.query(*SUMMARY_COLUMNS).filter(Escalation.city_id == city_id)
     
     if status_filter:
         query = query.filter(Escalation.status == status_filter)
     
-    escalations = query.order_by(desc(Escalation.created_at)).limit(limit).all()
-    return escalations
+    # Keyset paging on (created_at, id) walks ix_escalations_city_status_created
+    # instead of counting past OFFSET rows
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.filter(
+            tuple_(Escalation.created_at, Escalation.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    
+    rows = query.order_by(desc(Escalation.created_at), desc(Escalation.id)).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return EscalationPage(
+        items=[EscalationSummary.model_validate(row) for row in rows],
+        next_cursor=next_cursor
+    )
+
+
+@router.post(
+    "/cities/{city_id}/escalations/claim",
+    response_model=EscalationResponse,
+    responses={204: {"description": "No escalation waiting"}}
+)
+def claim_next_escalation(
+    city_id: int,
+    lease_seconds: Optional[int] = Query(None, ge=60, le=86400),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Assign the oldest waiting escalation of a city to the current manager.
+    
+    Rows locked by a concurrent claim are skipped, so two managers never get the
+    same escalation. The claim holds a lease (ESCALATION_LEASE_SECONDS by default);
+    renew it via POST /escalations/{id}/lease or it returns to the queue.
+    """
+    from app.dependencies.auth import get_user_cities
+    
+    accessible_city_ids = get_user_cities(current_user, db)
+    if city_id not in accessible_city_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this city"
+        )
+    
+    now = datetime.now(timezone.utc)
+    escalation = db.query(Escalation).filter(
+        Escalation.city_id == city_id,
+        _claimable(now)
+    ).order_by(
+        Escalation.created_at, Escalation.id
+    ).with_for_update(skip_locked=True).first()
+    
+    if not escalation:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    
+    previous_assignee = escalation.assigned_to
+    escalation.status = "in_progress"
+    escalation.assigned_to = current_user.id
+    escalation.is_open = False
+    escalation.claimed_at = now
+    escalation.lease_expires_at = now + timedelta(seconds=lease_seconds or settings.ESCALATION_LEASE_SECONDS)
+    db.commit()
+    db.refresh(escalation)
+    
+    create_audit_log(
+        db=db,
+        user_id=current_user.id,
+        city_id=city_id,
+        action="CLAIM",
+        table_name="escalations",
+        record_id=escalation.id,
+        old_value={"assigned_to": previous_assignee},
+        new_value={"assigned_to": current_user.id}
+    )
+    publish_escalation_event(city_id, "claimed", _summary(escalation))
+    
+    return escalation
+
+
+@router.post("/escalations/{escalation_id}/lease", response_model=EscalationResponse)
+def renew_escalation_lease(
+    escalation_id: int,
+    lease_seconds: Optional[int] = Query(None, ge=60, le=86400),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Extend the current manager's claim on an escalation"""
+    escalation = db.query(Escalation).filter(
+        Escalation.id == escalation_id
+    ).with_for_update().first()
+    if not escalation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Escalation not found"
+        )
+    
+    now = datetime.now(timezone.utc)
+    if not _lease_active(escalation, now) or escalation.assigned_to != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Claim expired or held by another manager"
+        )
+    
+    escalation.lease_expires_at = now + timedelta(seconds=lease_seconds or settings.ESCALATION_LEASE_SECONDS)
+    db.commit()
+    db.refresh(escalation)
+    return escalation
+
+
+@router.post("/escalations/{escalation_id}/release", response_model=EscalationResponse)
+def release_escalation(
+    escalation_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Give a claimed escalation back to the queue"""
+    escalation = db.query(Escalation).filter(
+        Escalation.id == escalation_id
+    ).with_for_update().first()
+    if not escalation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Escalation not found"
+        )
+    
+    from app.dependencies.auth import get_user_cities
+    accessible_city_ids = get_user_cities(current_user, db)
+    if escalation.city_id not in accessible_city_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    if escalation.status != "in_progress":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Escalation is not claimed"
+        )
+    if escalation.assigned_to != current_user.id and current_user.role != UserRole.SUPER_ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Escalation is claimed by another manager"
+        )
+    
+    previous_assignee = escalation.assigned_to
+    escalation.status = "pending"
+    escalation.assigned_to = None
+    escalation.claimed_at = None
+    escalation.lease_expires_at = None
+    db.commit()
+    db.refresh(escalation)
+    
+    create_audit_log(
+        db=db,
+        user_id=current_user.id,
+        city_id=escalation.city_id,
+        action="RELEASE",
+        table_name="escalations",
+        record_id=escalation.id,
+        old_value={"assigned_to": previous_assignee}
+    )
+    publish_escalation_event(escalation.city_id, "released", _summary(escalation))
+    
+    return escalation
+
+
+@router.post("/cities/{city_id}/escalations/stream-token", response_model=StreamToken)
+def create_stream_token(
+    city_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Short-lived token for opening the escalation stream from a browser.
+    A browser EventSource cannot send an Authorization header, so pass it as ?token=.
+    It only opens this city's stream; the regular API rejects it.
+    """
+    from app.dependencies.auth import get_user_cities
+    
+    if city_id not in get_user_cities(current_user, db):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this city"
+        )
+    
+    token = create_access_token(
+        data={"sub": str(current_user.id), "scope": STREAM_TOKEN_SCOPE, "city_id": city_id},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_SECONDS)
+    )
+    return StreamToken(token=token, expires_in=STREAM_TOKEN_SECONDS)
+
+
+def _stream_token_user(db: Session, token: str, city_id: int) -> User:
+    payload = decode_access_token(token)
+    if (
+        payload is None
+        or not payload.get("sub")
+        or payload.get("scope") != STREAM_TOKEN_SCOPE
+        or payload.get("city_id") != city_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid stream token"
+        )
+    user = db.query(User).filter(User.id == int(payload["sub"])).first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return user
+
+
+@router.get("/cities/{city_id}/escalations/stream")
+async def stream_escalations(
+    city_id: int,
+    request: Request,
+    token: Optional[str] = Query(None, description="Token from POST .../escalations/stream-token (for EventSource)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events feed of escalation changes for the manager dashboard.
+    
+    Authenticate with a Bearer header (fetch-based clients) or, from a browser
+    EventSource, with ?token= from POST /cities/{city_id}/escalations/stream-token.
+    Events: created, claimed, released, updated; data is an inbox summary row.
+    After (re)connecting, reload the first inbox page - missed events are not replayed.
+    """
+    from app.dependencies.auth import get_user_cities
+    
+    if token:
+        current_user = await run_in_threadpool(_stream_token_user, db, token, city_id)
+    elif credentials:
+        current_user = await get_current_user(credentials, db)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    
+    accessible_city_ids = await run_in_threadpool(get_user_cities, current_user, db)
+    # Return the pooled connection now rather than holding it for the life of the stream
+    await run_in_threadpool(db.close)
+    if city_id not in accessible_city_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this city"
+        )
+    
+    async def event_stream():
+        async with escalation_subscription(city_id) as pubsub:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await next_escalation_event(pubsub, timeout=STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event.get('type', 'updated')}\ndata: {json.dumps(event.get('escalation'))}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/escalations/{escalation_id}", response_model=EscalationResponse)
@@ -122,7 +578,10 @@ def update_escalation(
     current_user: User = Depends(get_current_user)
 ):
     """Update escalation status, assignment, or notes"""
-    escalation = db.query(Escalation).filter(Escalation.id == escalation_id).first()
+    # Locked like claim/renew, so a claim cannot land between the lease check and the write
+    escalation = db.query(Escalation).filter(
+        Escalation.id == escalation_id
+    ).with_for_update().first()
     if not escalation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -137,6 +596,21 @@ def update_escalation(
             detail="Access denied"
         )
     
+    update_dict = update_data.model_dump(exclude_unset=True)
+    
+    # A live claim belongs to its manager; others must wait for release or lease expiry
+    now = datetime.now(timezone.utc)
+    if (
+        _lease_active(escalation, now)
+        and escalation.assigned_to != current_user.id
+        and current_user.role != UserRole.SUPER_ADMIN
+        and ({"status", "assigned_to"} & update_dict.keys())
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Escalation is claimed by another manager"
+        )
+    
     old_values = {
         "status": escalation.status,
         "assigned_to": escalation.assigned_to,
@@ -144,10 +618,15 @@ def update_escalation(
     }
     
     # Update fields
-    update_dict = update_data.model_dump(exclude_unset=True)
     for field, value in update_dict.items():
         setattr(escalation, field, value)
     
+    # Leaving in_progress ends the claim; anything but pending stops coalescing
+    if escalation.status != "in_progress":
+        escalation.lease_expires_at = None
+    if escalation.status != "pending":
+        escalation.is_open = False
+    
     # Mark as resolved if status changed to "resolved"
     if update_data.status == "resolved" and escalation.resolved_at is None:
         escalation.resolved_at = datetime.utcnow()
@@ -165,6 +644,7 @@ def update_escalation(
         old_value=old_values,
         new_value=update_dict
     )
+    publish_escalation_event(escalation.city_id, "updated", _summary(escalation))
     
     return escalation
 
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from app.core.category_tree import filter_subtree
 from app.core.database import get_db
 from app.models.product import Product
 from app.models.user import User
@@ -34,7 +35,8 @@ def list_products(
     query = db.query(Product).filter(Product.city_id == city_id)
     
     if category_id:
-        query = query.filter(Product.category_id == category_id)
+        # The category and everything under it
+        query = filter_subtree(query, category_id)
     
     if search:
         query = query.filter(Product.name.ilike(f"%{search}%"))
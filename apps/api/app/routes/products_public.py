@@ -3,13 +3,22 @@ Public Products API - No authentication required (for bot)
 Provides search endpoint for ZETA Telegram Bot
 Uses legacy product schema (37,318 products from old zeta-bot)
 """
-from fastapi import APIRouter, Depends, Query, HTTPException
+import os
+import re
+from fastapi import APIRouter, Depends, File, Form, Query, HTTPException, Request, Response, UploadFile
+from fastapi.responses import FileResponse
+from PIL import Image
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, func
-from typing import List, Optional
-from app.core.database import get_db
+from typing import Callable, Dict, List, Optional
+from app.core.database import get_legacy_db
+from app.core.config import settings
+from app.core.image_hash import search_image
+from app.core.images import (
+    DEFAULT_WIDTH, FORMATS, WIDTHS, ImageError, ImageServiceBusy, get_variant, thumbnail_url, url_key,
+)
 from app.models.product_legacy import ProductLegacy
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 
 router = APIRouter(prefix="/api/products", tags=["Products (Public)"])
 
@@ -25,16 +34,57 @@ class ProductSearchResponse(BaseModel):
     price: Optional[float] = None
     primary_image: Optional[str] = None
     
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        """Resized copy of primary_image served by this API (null until IMAGE_PUBLIC_BASE_URL is set)"""
+        return thumbnail_url(self.id, self.primary_image)
+    
     class Config:
         from_attributes = True
 
 
+class ImageMatchResponse(ProductSearchResponse):
+    phash_distance: int
+    dhash_distance: int
+    color_distance: float
+    confident: bool  # Near-identical picture (a screenshot or re-encode of this product's image)
+
+
+class ImageSearchResponse(BaseModel):
+    method: str = "phash"
+    products: List[ImageMatchResponse]
+
+
+def search_like(db: Session, q: str, limit: int, offset: int = 0) -> List[ProductLegacy]:
+    """Case-insensitive substring match over text columns, in table order"""
+    search_term = f"%{q.lower()}%"
+    
+    return db.query(ProductLegacy).filter(
+        or_(
+            func.lower(ProductLegacy.name).like(search_term),
+            func.lower(ProductLegacy.description).like(search_term),
+            func.lower(ProductLegacy.sku).like(search_term),
+            func.lower(ProductLegacy.category).like(search_term),
+            func.lower(ProductLegacy.material).like(search_term),
+            func.lower(ProductLegacy.color).like(search_term),
+        )
+    ).limit(limit).offset(offset).all()
+
+
+# Search implementations by name; benchmarks/search_eval.py scores every entry
+SEARCH_BACKENDS: Dict[str, Callable[[Session, str, int, int], List[ProductLegacy]]] = {
+    "like": search_like,
+}
+DEFAULT_SEARCH_BACKEND = "like"
+
+
 @router.get("/search", response_model=List[ProductSearchResponse])
 def search_products(
     q: str = Query(..., description="Search query"),
     limit: int = Query(20, ge=1, le=100, description="Maximum results"),
     offset: int = Query(0, ge=0, description="Pagination offset"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_legacy_db)
 ):
     """
     Search products by name, description, SKU, or category.
@@ -42,30 +92,52 @@ def search_products(
     
     Example: /api/products/search?q=кресло&limit=10
     """
+    return SEARCH_BACKENDS[DEFAULT_SEARCH_BACKEND](db, q, limit, offset)
+
+
+@router.post("/search-by-image", response_model=ImageSearchResponse)
+def search_by_image(
+    image: UploadFile = File(..., description="Photo or screenshot of a product"),
+    limit: int = Form(5, ge=1, le=20),
+    db: Session = Depends(get_legacy_db)
+):
+    """
+    Find catalog products whose image looks like the uploaded one (perceptual hash).
+    Public endpoint - no authentication required. Takes milliseconds, so bots call it
+    before OCR or Vision; an empty list means no near-duplicate catalog image.
+    """
+    data = image.file.read(settings.IMAGE_MAX_SOURCE_BYTES + 1)
+    if len(data) > settings.IMAGE_MAX_SOURCE_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
     
-    # Build search query
-    search_term = f"%{q.lower()}%"
+    try:
+        matches, _ = search_image(data, limit)
+    except (OSError, ValueError):  # Not an image Pillow can decode
+        raise HTTPException(status_code=400, detail="Could not read the image")
+    except Image.DecompressionBombError:  # Small file declaring a huge canvas; not an OSError
+        raise HTTPException(status_code=400, detail="Image dimensions are too large")
     
-    query = db.query(ProductLegacy).filter(
-        or_(
-            func.lower(ProductLegacy.name).like(search_term),
-            func.lower(ProductLegacy.description).like(search_term),
-            func.lower(ProductLegacy.sku).like(search_term),
-            func.lower(ProductLegacy.category).like(search_term),
-            func.lower(ProductLegacy.material).like(search_term),
-            func.lower(ProductLegacy.color).like(search_term),
+    products = {
+        product.id: product
+        for product in db.query(ProductLegacy).filter(ProductLegacy.id.in_([m.product_id for m in matches])).all()
+    }
+    results = [
+        ImageMatchResponse(
+            **ProductSearchResponse.model_validate(products[m.product_id]).model_dump(exclude={"thumbnail_url"}),
+            phash_distance=m.phash_distance,
+            dhash_distance=m.dhash_distance,
+            color_distance=m.color_distance,
+            confident=m.confident
         )
-    ).limit(limit).offset(offset)
-    
-    products = query.all()
-    
-    return products
+        for m in matches if m.product_id in products
+    ]
+    return ImageSearchResponse(products=results)
 
 
 @router.get("/{product_id}", response_model=ProductSearchResponse)
 def get_product(
     product_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_legacy_db)
 ):
     """
     Get product details by ID.
@@ -78,3 +150,86 @@ def get_product(
         raise HTTPException(status_code=404, detail="Product not found")
     
     return product
+
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, max-age=86400"
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _range_response(request: Request, path, media_type: str, headers: Dict[str, str]) -> Response:
+    """Whole file, or a single `Range: bytes=a-b` slice of it (206 / 416)"""
+    size = os.path.getsize(path)
+    match = _RANGE.match(request.headers.get("range", "").strip())
+    if not match or not any(match.groups()) or request.headers.get("if-range", headers["ETag"]) != headers["ETag"]:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1  # Suffix range: the last N bytes
+    if start > end or start >= size:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    
+    with open(path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start + 1)
+    return Response(
+        content=body,
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+    )
+
+
+@router.get("/{product_id}/image")
+def get_product_image(
+    product_id: int,
+    request: Request,
+    w: int = Query(DEFAULT_WIDTH, description=f"Bounding box size, one of {list(WIDTHS)}"),
+    fmt: str = Query("jpeg", pattern="^(jpeg|webp)$", description="Output format"),
+    index: Optional[int] = Query(None, ge=0, description="Position in `images`; primary image when omitted"),
+    v: Optional[str] = Query(None, description="Version from thumbnail_url; makes the response immutable"),
+    db: Session = Depends(get_legacy_db)
+):
+    """
+    Resized product image from the disk cache, rendered on first request.
+    Public endpoint - no authentication required. Supports ETag and byte ranges.
+    
+    Example: /api/products/123/image?w=320&fmt=webp
+    """
+    if w not in WIDTHS:
+        raise HTTPException(status_code=422, detail=f"w must be one of {list(WIDTHS)}")
+    
+    product = db.query(ProductLegacy.primary_image, ProductLegacy.images).filter(
+        ProductLegacy.id == product_id
+    ).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    if index is None:
+        source = product.primary_image
+    else:
+        source = product.images[index] if product.images and index < len(product.images) else None
+    if not source:
+        raise HTTPException(status_code=404, detail="Product has no image")
+    
+    try:
+        path = get_variant(source, w, fmt)
+    except ImageServiceBusy:
+        raise HTTPException(status_code=503, detail="Image service is busy", headers={"Retry-After": "1"})
+    except ImageError:
+        raise HTTPException(status_code=502, detail="Original image is unavailable")
+    
+    etag = f'"{path.stem}"'
+    versioned = v is not None and v == url_key(source)[:12]
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if versioned else REVALIDATE_CACHE,
+        "Accept-Ranges": "bytes",
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    return _range_response(request, path, FORMATS[fmt], headers)
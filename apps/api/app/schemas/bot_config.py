@@ -24,6 +24,7 @@ class BotConfigUpdate(BaseModel):
 class BotConfigResponse(BotConfigBase):
     id: int
     city_id: int
+    version: int = 1
 
     class Config:
         from_attributes = True
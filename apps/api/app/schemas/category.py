@@ -0,0 +1,36 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class CategoryBase(BaseModel):
+    name: str
+    parent_id: Optional[int] = None
+
+
+class CategoryCreate(CategoryBase):
+    pass
+
+
+class CategoryUpdate(BaseModel):
+    name: Optional[str] = None
+    parent_id: Optional[int] = None  # Set to move the category (with its subtree); null makes it a root
+
+
+class CategoryResponse(CategoryBase):
+    id: int
+    city_id: int
+
+    class Config:
+        from_attributes = True
+
+
+class CategoryTreeNode(BaseModel):
+    id: int
+    name: str
+    children: List["CategoryTreeNode"] = []
+
+
+class CategoryTreeResponse(BaseModel):
+    city_id: int
+    version: int
+    categories: List[CategoryTreeNode]
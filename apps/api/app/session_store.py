@@ -0,0 +1,244 @@
+"""
+Session storage backends for the async auth stack.
+
+RedisSessionStore keeps one key per token hash with a native TTL, so lookups are
+O(1) and expired sessions disappear on their own. SqlSessionStore uses the
+`sessions` table and needs purge_expired() to run periodically (see start_session_purge).
+The backend is chosen by settings.SESSION_BACKEND ("redis" or "sql").
+
+With the Redis backend, a Redis outage at runtime degrades instead of failing every
+request: FailoverSessionStore writes new sessions to SQL while Redis is unreachable and
+checks SQL for them, but a token whose session may only exist in Redis gets
+SessionStoreUnavailable (503) rather than being treated as logged out.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select, delete
+
+from app.config import settings
+from app.core.metrics import track_redis
+from app.database import AsyncSessionLocal
+from app.models import Session
+
+try:
+    import redis.asyncio as redis
+    from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+    REDIS_ERRORS = (RedisConnectionError, RedisTimeoutError)
+except ImportError:
+    redis = None
+    REDIS_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStoreUnavailable(Exception):
+    """Raised when the session backend cannot answer (callers respond 503)"""
+
+
+class SessionStore:
+    """Interface shared by all session backends"""
+
+    async def create(self, user_id: int, token_hash: str, expires_at: datetime):
+        raise NotImplementedError
+
+    async def get_user_id(self, token_hash: str) -> Optional[int]:
+        """Return the owner of a live session, or None if missing/expired"""
+        raise NotImplementedError
+
+    async def delete(self, token_hash: str):
+        raise NotImplementedError
+
+    async def delete_user(self, user_id: int) -> list:
+        """Delete all sessions of a user and return their token hashes"""
+        raise NotImplementedError
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as `session:{token_hash}` keys expiring together with the token"""
+
+    def __init__(self, redis_url: str, prefix: str = "session"):
+        if redis is None:
+            raise ImportError("redis package required for RedisSessionStore")
+        self.redis = redis.from_url(redis_url)
+        self.prefix = prefix
+
+    def _key(self, token_hash: str) -> str:
+        return f"{self.prefix}:{token_hash}"
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    async def create(self, user_id: int, token_hash: str, expires_at: datetime):
+        expire_ts = int(expires_at.replace(tzinfo=timezone.utc).timestamp())
+        user_key = self._user_key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(token_hash), user_id)
+            pipe.expireat(self._key(token_hash), expire_ts)
+            pipe.sadd(user_key, token_hash)
+            # Tokens share one lifetime, so the newest session expires last
+            pipe.expireat(user_key, expire_ts)
+            with track_redis("session_create"):
+                await pipe.execute()
+
+    async def get_user_id(self, token_hash: str) -> Optional[int]:
+        with track_redis("session_get"):
+            value = await self.redis.get(self._key(token_hash))
+        return int(value) if value is not None else None
+
+    async def delete(self, token_hash: str):
+        with track_redis("session_delete"):
+            await self.redis.delete(self._key(token_hash))
+
+    async def delete_user(self, user_id: int) -> list:
+        user_key = self._user_key(user_id)
+        with track_redis("session_delete_user"):
+            members = await self.redis.smembers(user_key)
+            token_hashes = [h.decode() if isinstance(h, bytes) else h for h in members]
+            await self.redis.delete(user_key, *(self._key(h) for h in token_hashes))
+        return token_hashes
+
+    async def close(self):
+        await self.redis.close()
+
+
+class SqlSessionStore(SessionStore):
+    """Sessions in the `sessions` table (fallback when Redis is not configured)"""
+
+    async def create(self, user_id: int, token_hash: str, expires_at: datetime):
+        async with AsyncSessionLocal() as db:
+            db.add(Session(user_id=user_id, token_hash=token_hash, expires_at=expires_at))
+            await db.commit()
+
+    async def get_user_id(self, token_hash: str) -> Optional[int]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Session.user_id).where(
+                    Session.token_hash == token_hash,
+                    Session.expires_at > datetime.utcnow()
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def delete(self, token_hash: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Session).where(Session.token_hash == token_hash))
+            await db.commit()
+
+    async def delete_user(self, user_id: int) -> list:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(Session).where(Session.user_id == user_id).returning(Session.token_hash)
+            )
+            await db.commit()
+            return list(result.scalars().all())
+
+    async def purge_expired(self) -> int:
+        """Delete expired sessions; returns the number of rows removed"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(Session).where(Session.expires_at <= datetime.utcnow()))
+            await db.commit()
+            return result.rowcount or 0
+
+
+class FailoverSessionStore(SessionStore):
+    """Redis sessions with the SQL table standing in while Redis is unreachable"""
+
+    def __init__(self, primary: RedisSessionStore, fallback: SqlSessionStore):
+        self.primary = primary
+        self.fallback = fallback
+
+    async def create(self, user_id: int, token_hash: str, expires_at: datetime):
+        try:
+            await self.primary.create(user_id, token_hash, expires_at)
+        except REDIS_ERRORS as e:
+            logger.warning(f"Redis session store unreachable ({e}) - storing session in SQL")
+            await self.fallback.create(user_id, token_hash, expires_at)
+
+    async def get_user_id(self, token_hash: str) -> Optional[int]:
+        try:
+            user_id = await self.primary.get_user_id(token_hash)
+        except REDIS_ERRORS as e:
+            user_id = await self.fallback.get_user_id(token_hash)
+            if user_id is None:
+                # The session may live in Redis: fail closed instead of logging the user out
+                raise SessionStoreUnavailable(str(e))
+            return user_id
+        if user_id is None:
+            # Created in SQL during an earlier outage
+            return await self.fallback.get_user_id(token_hash)
+        return user_id
+
+    async def delete(self, token_hash: str):
+        await self.fallback.delete(token_hash)
+        try:
+            await self.primary.delete(token_hash)
+        except REDIS_ERRORS as e:
+            raise SessionStoreUnavailable(str(e))
+
+    async def delete_user(self, user_id: int) -> list:
+        token_hashes = await self.fallback.delete_user(user_id)
+        try:
+            return token_hashes + await self.primary.delete_user(user_id)
+        except REDIS_ERRORS as e:
+            raise SessionStoreUnavailable(str(e))
+
+    async def purge_expired(self) -> int:
+        return await self.fallback.purge_expired()
+
+    async def close(self):
+        await self.primary.close()
+
+
+def create_session_store() -> SessionStore:
+    if settings.SESSION_BACKEND == "redis":
+        try:
+            return FailoverSessionStore(RedisSessionStore(settings.REDIS_URL), SqlSessionStore())
+        except ImportError as e:
+            logger.warning(f"Redis session store unavailable ({e}) - falling back to SQL sessions")
+    return SqlSessionStore()
+
+
+session_store = create_session_store()
+
+_purge_task: Optional[asyncio.Task] = None
+
+
+async def _purge_loop(store: SessionStore, interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await store.purge_expired()
+            if removed:
+                logger.info(f"Purged {removed} expired sessions")
+        except Exception as e:
+            logger.error(f"Session purge failed: {e}")
+
+
+def start_session_purge(interval: Optional[int] = None):
+    """Start the background purge of SQL sessions (Redis expires its keys itself)"""
+    global _purge_task
+    if not hasattr(session_store, "purge_expired"):
+        return
+    if _purge_task is None or _purge_task.done():
+        interval = interval or settings.SESSION_PURGE_INTERVAL_SECONDS
+        _purge_task = asyncio.create_task(_purge_loop(session_store, interval))
+
+
+def stop_session_purge():
+    if _purge_task and not _purge_task.done():
+        _purge_task.cancel()
+
+
+__all__ = [
+    "SessionStore",
+    "RedisSessionStore",
+    "SqlSessionStore",
+    "FailoverSessionStore",
+    "SessionStoreUnavailable",
+    "session_store",
+    "start_session_purge",
+    "stop_session_purge",
+]
@@ -0,0 +1,40 @@
+"""
+Deterministic vocabulary shared by the benchmark seeder, load driver and search eval.
+
+Kept free of app imports so the load driver runs without the API's dependencies.
+"""
+import random
+
+BENCH_PASSWORD = "bench-password"
+SUPER_ADMIN_EMAIL = "bench-admin@bench.zeta.kz"
+
+CITY_NAMES = [
+    "Алматы", "Астана", "Шымкент", "Караганда", "Актобе", "Тараз",
+    "Павлодар", "Усть-Каменогорск", "Семей", "Костанай", "Атырау", "Актау",
+]
+CITY_SLUGS = [
+    "almaty", "astana", "shymkent", "karaganda", "aktobe", "taraz",
+    "pavlodar", "oskemen", "semey", "kostanay", "atyrau", "aktau",
+]
+
+CATEGORY_TREE = {
+    "Мягкая мебель": ["Диваны", "Кресла", "Пуфы"],
+    "Столы": ["Обеденные столы", "Письменные столы", "Журнальные столики"],
+    "Стулья": ["Обеденные стулья", "Офисные кресла", "Барные стулья"],
+    "Спальня": ["Кровати", "Матрасы", "Тумбы прикроватные"],
+    "Хранение": ["Шкафы", "Комоды", "Стеллажи"],
+}
+
+PRODUCT_TYPES = [
+    "диван", "кресло", "пуф", "стол", "столик", "стул", "табурет", "кровать",
+    "матрас", "тумба", "шкаф", "комод", "стеллаж", "полка", "банкетка",
+]
+MATERIALS = ["дуб", "бук", "сосна", "орех", "металл", "стекло", "МДФ", "ЛДСП", "ротанг", "велюр", "экокожа", "рогожка"]
+COLORS = ["белый", "черный", "серый", "бежевый", "коричневый", "зеленый", "синий", "графит", "венге", "слоновая кость"]
+STYLES = ["лофт", "классик", "сканди", "модерн", "прованс", "минимал"]
+EVENT_TYPES = ["message", "search", "product_view", "image_search", "escalation", "start"]
+EVENT_WEIGHTS = [50, 25, 15, 4, 2, 4]
+
+
+def product_name(rng: random.Random) -> str:
+    return f"{rng.choice(PRODUCT_TYPES).capitalize()} {rng.choice(STYLES)} {rng.choice(MATERIALS)} {rng.choice(COLORS)}"
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+HTTP load driver for the admin API.
+
+Runs a weighted mix of scenarios (product search, product detail, bot config,
+analytics ingest, dashboard analytics) at a fixed concurrency against a running
+server seeded by benchmarks/seed.py, then prints p50/p95/p99 latency and RPS
+per scenario as JSON. With --baseline the run fails (exit 1) if any scenario's
+p95 regressed by more than --max-regression percent.
+
+Usage:
+    python benchmarks/load.py --url http://localhost:8000 --concurrency 32 --duration 60
+    python benchmarks/load.py --output current.json --baseline main.json --max-regression 15
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from dataset import BENCH_PASSWORD, PRODUCT_TYPES, SUPER_ADMIN_EMAIL  # noqa: E402
+
+DEFAULT_MIX = "search=30,detail=30,bot_config=20,ingest=15,dashboard=5"
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+class Context:
+    """State shared by all workers: auth header, city ids and sampled product ids"""
+
+    def __init__(self, headers: dict, city_ids: list, product_ids: dict):
+        self.headers = headers
+        self.city_ids = city_ids
+        self.product_ids = product_ids
+
+
+async def scenario_search(client, ctx, rng):
+    city_id = rng.choice(ctx.city_ids)
+    return await client.get(
+        f"/cities/{city_id}/products",
+        params={"search": rng.choice(PRODUCT_TYPES), "limit": 20},
+        headers=ctx.headers,
+    )
+
+
+async def scenario_detail(client, ctx, rng):
+    city_id = rng.choice(ctx.city_ids)
+    product_id = rng.choice(ctx.product_ids[city_id])
+    return await client.get(f"/cities/{city_id}/products/{product_id}", headers=ctx.headers)
+
+
+async def scenario_bot_config(client, ctx, rng):
+    return await client.get(f"/cities/{rng.choice(ctx.city_ids)}/bot-config")
+
+
+async def scenario_ingest(client, ctx, rng):
+    return await client.post("/analytics/events", json={
+        "city_id": rng.choice(ctx.city_ids),
+        "event_type": "search",
+        "data": {"query": rng.choice(PRODUCT_TYPES), "source": "benchmark"},
+    })
+
+
+async def scenario_dashboard(client, ctx, rng):
+    city_id = rng.choice(ctx.city_ids)
+    return await client.get(f"/cities/{city_id}/analytics", params={"days": 7}, headers=ctx.headers)
+
+
+async def scenario_inbox(client, ctx, rng):
+    city_id = rng.choice(ctx.city_ids)
+    return await client.get(
+        f"/cities/{city_id}/escalations",
+        params={"status_filter": "pending", "limit": 50},
+        headers=ctx.headers,
+    )
+
+
+SCENARIOS = {
+    "search": scenario_search,
+    "detail": scenario_detail,
+    "bot_config": scenario_bot_config,
+    "ingest": scenario_ingest,
+    "dashboard": scenario_dashboard,
+    "inbox": scenario_inbox,
+}
+
+
+async def prepare(client: httpx.AsyncClient, cities: int) -> Context:
+    response = await client.post("/auth/login", json={"email": SUPER_ADMIN_EMAIL, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await client.get("/cities", headers=headers)
+    response.raise_for_status()
+    city_ids = [city["id"] for city in response.json()][:cities]
+    if not city_ids:
+        raise SystemExit("No cities found - run benchmarks/seed.py first")
+
+    product_ids = {}
+    for city_id in city_ids:
+        response = await client.get(f"/cities/{city_id}/products", params={"limit": 1000}, headers=headers)
+        response.raise_for_status()
+        product_ids[city_id] = [product["id"] for product in response.json()]
+        if not product_ids[city_id]:
+            raise SystemExit(f"City {city_id} has no products - run benchmarks/seed.py first")
+    return Context(headers, city_ids, product_ids)
+
+
+async def worker(client, ctx, weights, deadline, remaining, samples, errors, seed):
+    rng = random.Random(seed)
+    names = list(weights)
+    cum_weights = list(weights.values())
+    while time.perf_counter() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        name = rng.choices(names, cum_weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await SCENARIOS[name](client, ctx, rng)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if failed:
+            errors[name] = errors.get(name, 0) + 1
+        else:
+            samples.setdefault(name, []).append(elapsed_ms)
+
+
+def summarize(latencies: list, error_count: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies) + error_count,
+        "errors": error_count,
+        "rps": round((len(latencies) + error_count) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+    }
+
+
+async def run(args) -> dict:
+    weights = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        ctx = await prepare(client, args.cities)
+
+        if args.warmup:
+            await asyncio.gather(*(
+                worker(client, ctx, weights, time.perf_counter() + args.warmup, None, {}, {}, args.seed + i)
+                for i in range(args.concurrency)
+            ))
+
+        samples, errors = {}, {}
+        remaining = [args.requests] if args.requests else None
+        deadline = time.perf_counter() + (args.duration if not args.requests else 10 ** 9)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, ctx, weights, deadline, remaining, samples, errors, args.seed + 1000 + i)
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [ms for values in samples.values() for ms in values]
+    return {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "mix": weights,
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": summarize(all_latencies, sum(errors.values()), elapsed),
+        "scenarios": {
+            name: summarize(samples.get(name, []), errors.get(name, 0), elapsed)
+            for name in weights
+        },
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    """Scenarios whose p95 got worse than baseline by more than max_regression percent"""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or not previous["latency_ms"]["p95"]:
+            continue
+        before = previous["latency_ms"]["p95"]
+        after = current["latency_ms"]["p95"]
+        change = (after - before) / before * 100
+        if change > max_regression:
+            regressions.append({"scenario": name, "p95_before_ms": before, "p95_after_ms": after,
+                                "change_pct": round(change, 1)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the admin API and report latency percentiles")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many measured requests")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--cities", type=int, default=12, help="Spread requests over the first N cities")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Previous report to compare p95 latency against")
+    parser.add_argument("--max-regression", type=float, default=20, help="Allowed p95 increase in percent")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.max_regression)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
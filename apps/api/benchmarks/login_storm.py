@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Login storm benchmark: event-loop latency while many logins hash passwords.
+
+Compares bcrypt called inline in a coroutine (what an async handler does with
+a plain verify_password call) against the bounded PasswordHasher pool.
+
+Usage:
+    python benchmarks/login_storm.py --logins 50 --rounds 12 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Settings are required at import time; the benchmark never touches the database
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/zeta_benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from passlib.context import CryptContext  # noqa: E402
+from app.core import security  # noqa: E402
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> list:
+    """Sleep `interval` repeatedly and record how late the loop wakes us up (ms)"""
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - started - interval) * 1000)
+    return lags
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_storm(mode: str, logins: int, password: str, hashed: str, context: CryptContext) -> dict:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0.05)
+
+    async def inline_login():
+        return context.verify(password, hashed)
+
+    async def pooled_login():
+        try:
+            return await security.password_hasher.verify(password, hashed)
+        except security.PasswordHasherBusy:
+            return None
+
+    login = inline_login if mode == "inline" else pooled_login
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    lags = await ticker
+    return {
+        "mode": mode,
+        "logins": logins,
+        "rejected": sum(1 for r in results if r is None),
+        "wall_seconds": round(elapsed, 3),
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50), 2),
+            "p95": round(percentile(lags, 95), 2),
+            "p99": round(percentile(lags, 99), 2),
+            "max": round(max(lags) if lags else 0.0, 2),
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Event-loop latency under a login storm")
+    parser.add_argument("--logins", type=int, default=50, help="Concurrent login attempts")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=4, help="Hashing pool size")
+    parser.add_argument("--max-pending", type=int, default=64, help="Hashing queue depth")
+    args = parser.parse_args()
+
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    security.pwd_context = context
+    security.password_hasher = security.PasswordHasher(max_workers=args.workers, max_pending=args.max_pending)
+
+    password = "correct horse battery staple"
+    hashed = context.hash(password)
+
+    report = {
+        "bcrypt_rounds": args.rounds,
+        "workers": args.workers,
+        "max_pending": args.max_pending,
+        "runs": [
+            await run_storm("inline", args.logins, password, hashed, context),
+            await run_storm("pool", args.logins, password, hashed, context),
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
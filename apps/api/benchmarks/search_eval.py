@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Search relevance and latency evaluation for products_public search backends.
+
+Loads the catalog once, resolves the graded rules in search_judgments.json
+into per-query relevance grades, then runs every backend in
+products_public.SEARCH_BACKENDS against the same database and reports
+nDCG@10, recall@20, zero-result rate and latency, overall and per query kind.
+
+recall@20 is capped: the denominator is min(relevant products, 20), so broad
+queries with thousands of relevant products can still reach 1.0.
+
+Usage:
+    python benchmarks/search_eval.py
+    python benchmarks/search_eval.py --backend like --per-query --output search.json
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import LegacySessionLocal  # noqa: E402
+from app.models.product_legacy import ProductLegacy  # noqa: E402
+from app.routes.products_public import SEARCH_BACKENDS  # noqa: E402
+
+JUDGMENTS_PATH = Path(__file__).resolve().parent / "search_judgments.json"
+GRADED_FIELDS = ("name", "description", "category", "material", "color", "sku")
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_catalog(db) -> list:
+    """All products as lowercase field dicts (37k rows fit comfortably in memory)"""
+    columns = [getattr(ProductLegacy, field) for field in GRADED_FIELDS]
+    rows = db.query(ProductLegacy.id, *columns).all()
+    return [
+        {"id": row[0], **{field: (value or "").lower() for field, value in zip(GRADED_FIELDS, row[1:])}}
+        for row in rows
+    ]
+
+
+def rule_matches(product: dict, rule: dict) -> bool:
+    return all(
+        any(fragment.lower() in product[field] for fragment in fragments)
+        for field, fragments in rule.items()
+        if field != "grade"
+    )
+
+
+def resolve_judgments(judgments: list, catalog: list, rng: random.Random) -> list:
+    """Turn rules and SKU templates into concrete {query, grades: {product_id: grade}}"""
+    with_sku = [p for p in catalog if p["sku"]]
+    resolved = []
+    for judgment in judgments:
+        query = judgment["query"]
+        grades = {}
+        if "{sku" in query:
+            product = rng.choice(with_sku)
+            sku = product["sku"]
+            digits = "".join(re.findall(r"\d+", sku)) or sku
+            query = query.format(sku=sku.upper(), sku_lower=sku, sku_digits=digits)
+            grades = {p["id"]: 3 for p in with_sku if p["sku"] == sku}
+        else:
+            for product in catalog:
+                grade = max((rule["grade"] for rule in judgment["relevant"] if rule_matches(product, rule)), default=0)
+                if grade:
+                    grades[product["id"]] = grade
+        resolved.append({**judgment, "query": query, "grades": grades})
+    return resolved
+
+
+def dcg(gains: list) -> float:
+    return sum((2 ** gain - 1) / math.log2(rank + 2) for rank, gain in enumerate(gains))
+
+
+def ndcg_at(ranked_ids: list, grades: dict, k: int) -> float:
+    ideal = dcg(sorted(grades.values(), reverse=True)[:k])
+    if not ideal:
+        return 0.0
+    return dcg([grades.get(pid, 0) for pid in ranked_ids[:k]]) / ideal
+
+
+def recall_at(ranked_ids: list, grades: dict, k: int) -> float:
+    if not grades:
+        return 0.0
+    found = sum(1 for pid in ranked_ids[:k] if grades.get(pid, 0) > 0)
+    return found / min(len(grades), k)
+
+
+def summarize(rows: list) -> dict:
+    latencies = [row["latency_ms"] for row in rows]
+    return {
+        "queries": len(rows),
+        "ndcg@10": round(sum(row["ndcg@10"] for row in rows) / len(rows), 4) if rows else 0.0,
+        "recall@20": round(sum(row["recall@20"] for row in rows) / len(rows), 4) if rows else 0.0,
+        "zero_result_rate": round(sum(1 for row in rows if row["results"] == 0) / len(rows), 4) if rows else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+    }
+
+
+def evaluate(db, backend, queries: list, repeat: int) -> list:
+    rows = []
+    for judged in queries:
+        timings = []
+        results = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = backend(db, judged["query"], 20, 0)
+            timings.append((time.perf_counter() - started) * 1000)
+        ranked_ids = [product.id for product in results]
+        rows.append({
+            "id": judged["id"],
+            "kind": judged["kind"],
+            "lang": judged["lang"],
+            "query": judged["query"],
+            "relevant": len(judged["grades"]),
+            "results": len(ranked_ids),
+            "ndcg@10": round(ndcg_at(ranked_ids, judged["grades"], 10), 4),
+            "recall@20": round(recall_at(ranked_ids, judged["grades"], 20), 4),
+            "latency_ms": round(min(timings), 2),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score product search backends against judged queries")
+    parser.add_argument("--backend", action="append", help="Backend name (default: all registered)")
+    parser.add_argument("--judgments", default=str(JUDGMENTS_PATH))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for sampling SKU queries")
+    parser.add_argument("--per-query", action="store_true", help="Include every query in the report")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    names = args.backend or list(SEARCH_BACKENDS)
+    unknown = [name for name in names if name not in SEARCH_BACKENDS]
+    if unknown:
+        raise SystemExit(f"Unknown backend(s): {', '.join(unknown)}; available: {', '.join(SEARCH_BACKENDS)}")
+
+    with open(args.judgments, encoding="utf-8") as f:
+        judgments = json.load(f)["queries"]
+
+    db = LegacySessionLocal()
+    try:
+        catalog = load_catalog(db)
+        if not catalog:
+            raise SystemExit("Catalog is empty - load the product dump first")
+        queries = resolve_judgments(judgments, catalog, random.Random(args.seed))
+
+        report = {"catalog_size": len(catalog), "backends": {}}
+        for name in names:
+            rows = evaluate(db, SEARCH_BACKENDS[name], queries, args.repeat)
+            kinds = sorted({row["kind"] for row in rows})
+            result = {
+                "overall": summarize(rows),
+                "by_kind": {kind: summarize([row for row in rows if row["kind"] == kind]) for kind in kinds},
+            }
+            if args.per_query:
+                result["queries"] = rows
+            report["backends"][name] = result
+    finally:
+        db.close()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
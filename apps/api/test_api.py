@@ -4,6 +4,7 @@ Quick API test script
 """
 import requests
 import sys
+import time
 
 BASE_URL = "http://localhost:8000"
 
@@ -85,6 +86,79 @@ def test_cities():
         return False
 
 
+def test_escalation_coalescing():
+    """Test that repeat escalations from one user merge into one open escalation"""
+    try:
+        response = requests.post(
+            f"{BASE_URL}/auth/login",
+            json={"email": "admin@zeta.local", "password": "admin123"}
+        )
+        
+        if response.status_code != 200:
+            print("✗ Cannot test escalations: login failed")
+            return False
+        
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        cities = requests.get(f"{BASE_URL}/cities", headers=headers).json()
+        if not cities:
+            print("✗ Cannot test escalations: no cities")
+            return False
+        
+        # A fresh user id so earlier runs' open escalations don't interfere
+        payload = {
+            "city_id": cities[0]["id"],
+            "user_telegram_id": int(time.time() * 1000),
+            "reason": "test_api coalescing"
+        }
+        first = requests.post(f"{BASE_URL}/escalations", json=payload)
+        second = requests.post(f"{BASE_URL}/escalations", json={**payload, "product_sku": "TEST-SKU-1"})
+        
+        if first.status_code != 201 or second.status_code != 200:
+            print(f"✗ Escalation coalescing failed: {first.status_code}, {second.status_code} (expected 201, 200)")
+            return False
+        if second.json()["id"] != first.json()["id"] or second.json()["event_count"] != 2:
+            print("✗ Escalation coalescing failed: repeat request did not merge into one row")
+            return False
+        
+        print("✓ Escalation coalescing works (201 then 200, one row)")
+        return True
+    except Exception as e:
+        print(f"✗ Escalation test error: {e}")
+        return False
+
+
+def test_product_image():
+    """Test the product image endpoint: 200, 304 on a matching ETag, 206 on a byte range"""
+    try:
+        products = requests.get(f"{BASE_URL}/api/products/search", params={"q": "", "limit": 100}).json()
+        product = next((p for p in products if p.get("primary_image")), None)
+        if product is None:
+            print("✗ Cannot test product images: no product with an image")
+            return False
+        
+        url = f"{BASE_URL}/api/products/{product['id']}/image"
+        full = requests.get(url)
+        if full.status_code != 200 or "ETag" not in full.headers:
+            print(f"✗ Product image failed: {full.status_code} (expected 200 with an ETag)")
+            return False
+        
+        cached = requests.get(url, headers={"If-None-Match": full.headers["ETag"]})
+        if cached.status_code != 304:
+            print(f"✗ Product image revalidation failed: {cached.status_code} (expected 304)")
+            return False
+        
+        partial = requests.get(url, headers={"Range": "bytes=0-99"})
+        if partial.status_code != 206 or partial.content != full.content[:100]:
+            print(f"✗ Product image range failed: {partial.status_code} (expected 206 with the first 100 bytes)")
+            return False
+        
+        print("✓ Product image works (200, 304 on ETag, 206 on range)")
+        return True
+    except Exception as e:
+        print(f"✗ Product image test error: {e}")
+        return False
+
+
 def main():
     print("=" * 50)
     print("ZETA Platform API - Quick Test")
@@ -98,6 +172,8 @@ def main():
     results.append(("Health Check", test_health()))
     results.append(("Authentication", test_auth()))
     results.append(("Cities API", test_cities()))
+    results.append(("Escalation Coalescing", test_escalation_coalescing()))
+    results.append(("Product Image", test_product_image()))
     
     print("\n" + "=" * 50)
     print("Test Results")
@@ -4,12 +4,18 @@ AI Assistant Module - OpenAI integration for natural conversation
 import os
 import json
 import logging
+import httpx
 from openai import AsyncOpenAI
 
+from core.metrics import httpx_event_hooks
+
 logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=httpx.AsyncClient(event_hooks=httpx_event_hooks()),
+)
 
 SYSTEM_PROMPT = """Ты - ассистент мебельного магазина "Zeta Furniture" в Талдыкоргане.
 
@@ -6,6 +6,8 @@ import logging
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+from core.metrics import aiohttp_trace_config
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,7 +41,7 @@ class AnalyticsTracker:
             True if tracked successfully, False otherwise
         """
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
                 url = f"{self.api_url}/analytics/events"
                 payload = {
                     "city_id": city_id,
@@ -4,6 +4,8 @@ API Client - Communicate with ZETA Platform backend
 import aiohttp
 import logging
 
+from core.metrics import aiohttp_trace_config
+
 logger = logging.getLogger(__name__)
 
 API_BASE_URL = "http://localhost:8000"
@@ -32,7 +34,7 @@ async def search_products_api(query: str, category: str = None, material: str =
         if material:
             params["material"] = material
         
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
             async with session.get(
                 f"{API_BASE_URL}/products/search",
                 params=params,
@@ -63,7 +65,7 @@ async def get_product_by_sku(sku: str) -> dict:
         Product dict or None
     """
     try:
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
             async with session.get(
                 f"{API_BASE_URL}/products/{sku}",
                 timeout=aiohttp.ClientTimeout(total=10)
@@ -78,3 +80,45 @@ async def get_product_by_sku(sku: str) -> dict:
     except Exception as e:
         logger.error(f"Get product error: {e}")
         return None
+
+
+async def search_documents_api(
+    city_id: int,
+    query: str,
+    doc_type: str = None,
+    limit: int = 5,
+    mode: str = "keyword"
+) -> dict:
+    """
+    Full-text search in the city's uploaded documents
+    
+    Args:
+        city_id: City ID
+        query: Search query
+        doc_type: Optional document type filter (catalog/price_list/manual/other)
+        limit: Max results
+        mode: "keyword" (exact words) or "semantic" (similar meaning)
+    
+    Returns:
+        Dict with "results" (filename, label, excerpt, highlights, score) and "count",
+        or None on error
+    """
+    try:
+        payload = {"city_id": city_id, "query": query, "limit": limit, "mode": mode}
+        if doc_type:
+            payload["doc_type"] = doc_type
+        
+        async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
+            async with session.post(
+                f"{API_BASE_URL}/documents/search",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as resp:
+                if resp.status == 200:
+                    return await resp.json()
+                logger.error(f"Document search failed with status {resp.status}")
+                return None
+    
+    except Exception as e:
+        logger.error(f"Document search error: {e}")
+        return None
@@ -1,15 +1,23 @@
 """
-Config Manager - Dynamic configuration loading with auto-reload
-Loads bot configuration from ZETA admin API and hot-reloads every 5 minutes
+Config Manager - Dynamic configuration loading with push updates
+Follows the admin API's config change stream (SSE) and applies new versions within a second.
+Periodic reload every 5 minutes remains as a fallback while the stream is disconnected.
 """
 import aiohttp
 import asyncio
+import json
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+from core.metrics import aiohttp_trace_config
+
 logger = logging.getLogger(__name__)
 
+# API sends a keep-alive every 15s; a silent socket for longer means the stream is dead
+STREAM_READ_TIMEOUT = 45
+STREAM_MAX_BACKOFF = 60
+
 
 class ConfigManager:
     """Manages dynamic bot configuration with hot-reload from admin API"""
@@ -27,19 +35,31 @@ class ConfigManager:
         self.city_id = city_id
         self.reload_interval = reload_interval
         self.config: Dict[str, Any] = {}
+        self.version: int = 0
         self.last_reload: Optional[datetime] = None
+        self.stream_connected = False
         self._reload_task: Optional[asyncio.Task] = None
+        self._stream_task: Optional[asyncio.Task] = None
+    
+    def _apply_config(self, config: Dict[str, Any]) -> bool:
+        """Apply config unless it is older than what we already have"""
+        version = config.get('version', 0)
+        if self.config and version and version < self.version:
+            return False
+        self.config = config
+        self.version = version
+        self.last_reload = datetime.now()
+        return True
     
     async def load_config(self) -> Dict[str, Any]:
         """Load configuration from API"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
                 url = f"{self.api_url}/cities/{self.city_id}/bot-config"
                 async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
                     if resp.status == 200:
-                        self.config = await resp.json()
-                        self.last_reload = datetime.now()
-                        logger.info(f"✅ Config loaded for city {self.city_id}")
+                        self._apply_config(await resp.json())
+                        logger.info(f"✅ Config loaded for city {self.city_id} (v{self.version})")
                         return self.config
                     else:
                         logger.error(f"❌ Failed to load config: HTTP {resp.status}")
@@ -49,15 +69,76 @@ class ConfigManager:
             raise
     
     async def auto_reload(self):
-        """Background task that reloads config every N seconds"""
+        """Fallback heartbeat: reload config every N seconds while the push stream is down"""
         while True:
             await asyncio.sleep(self.reload_interval)
+            if self.stream_connected:
+                continue
             try:
                 await self.load_config()
                 logger.info(f"🔄 Config auto-reloaded (every {self.reload_interval}s)")
             except Exception as e:
                 logger.error(f"❌ Auto-reload failed: {e}")
     
+    def _handle_stream_event(self, data: str):
+        try:
+            config = json.loads(data)
+        except ValueError:
+            logger.warning(f"⚠️ Malformed config event: {data[:100]}")
+            return
+        if self._apply_config(config):
+            logger.info(f"📥 Config v{self.version} pushed for city {self.city_id}")
+    
+    async def _follow_stream(self, session: aiohttp.ClientSession):
+        url = f"{self.api_url}/cities/{self.city_id}/bot-config/stream"
+        headers = {"Accept": "text/event-stream", "Last-Event-ID": str(self.version)}
+        async with session.get(url, headers=headers) as resp:
+            if resp.status != 200:
+                raise Exception(f"Config stream failed with status {resp.status}")
+            self.stream_connected = True
+            logger.info(f"📡 Config stream connected for city {self.city_id}")
+            
+            data_lines = []
+            async for raw_line in resp.content:
+                line = raw_line.decode('utf-8').rstrip('\r\n')
+                if line.startswith('data:'):
+                    data_lines.append(line[5:].lstrip())
+                elif not line and data_lines:
+                    self._handle_stream_event('\n'.join(data_lines))
+                    data_lines = []
+    
+    async def stream_updates(self):
+        """Background task that follows the config change stream, reconnecting with backoff"""
+        backoff = 1
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=STREAM_READ_TIMEOUT)
+        while True:
+            try:
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    await self._follow_stream(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Config stream dropped: {e}")
+            finally:
+                # Reset backoff after a healthy connection, grow it on repeated failures
+                if self.stream_connected:
+                    backoff = 1
+                self.stream_connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, STREAM_MAX_BACKOFF)
+    
+    def start_stream(self):
+        """Start following pushed config updates"""
+        if self._stream_task is None or self._stream_task.done():
+            self._stream_task = asyncio.create_task(self.stream_updates())
+            logger.info("🚀 Started config stream task")
+    
+    def stop_stream(self):
+        """Stop following pushed config updates"""
+        if self._stream_task and not self._stream_task.done():
+            self._stream_task.cancel()
+            logger.info("⏹️ Stopped config stream task")
+    
     def start_auto_reload(self):
         """Start the auto-reload background task"""
         if self._reload_task is None or self._reload_task.done():
@@ -6,6 +6,8 @@ import logging
 from typing import Optional, List, Dict
 from datetime import datetime
 
+from core.metrics import aiohttp_trace_config
+
 logger = logging.getLogger(__name__)
 
 
@@ -45,7 +47,7 @@ class EscalationLogger:
             True if logged successfully, False otherwise
         """
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
                 url = f"{self.api_url}/escalations"
                 payload = {
                     "city_id": city_id,
@@ -64,7 +66,11 @@ class EscalationLogger:
                     if resp.status in (200, 201):
                         data = await resp.json()
                         escalation_id = data.get('id')
-                        logger.info(f"✅ Escalation logged: #{escalation_id} - User {user_id}, Reason: {reason}")
+                        if resp.status == 200:
+                            # API merged this into the user's open escalation
+                            logger.info(f"🔁 Escalation merged: #{escalation_id} ({data.get('event_count')} requests) - User {user_id}, Reason: {reason}")
+                        else:
+                            logger.info(f"✅ Escalation logged: #{escalation_id} - User {user_id}, Reason: {reason}")
                         return True
                     else:
                         logger.error(f"❌ Failed to log escalation: HTTP {resp.status}")
@@ -0,0 +1,430 @@
+"""
+In-process metrics registry rendered in Prometheus text exposition format.
+
+Shared verbatim by the API and both bots. Recording a sample is a dict update
+under a lock; nothing is formatted until /metrics is scraped, so the cost
+while nobody scrapes is close to zero.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers sub-millisecond Redis ops through multi-second OpenAI calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, float]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {_format_labels(self.labelnames, key) or "total": value for key, value in self._values.items()}
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; may be computed lazily at scrape time via set_function()"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        """Compute the value only when scraped"""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def _current(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                values[key] = fn()
+            except Exception:
+                continue
+        return values
+
+    def collect(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._current().items()
+        ]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {_format_labels(self.labelnames, key) or "value": value for key, value in self._current().items()}
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets (seconds by default)"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        result = {}
+        for key, series in items:
+            count = sum(series[:-1])
+            result[_format_labels(self.labelnames, key) or "all"] = {
+                "count": count,
+                "avg_seconds": round(series[-1] / count, 6) if count else 0.0,
+            }
+        return result
+
+
+class MetricsRegistry:
+    """Holds all metrics of the process and renders them on scrape"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """JSON-friendly view of all metrics (for /stats style endpoints)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    """Get or create a counter in the global registry"""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    """Get or create a gauge in the global registry"""
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Iterable[str] = (),
+    buckets: Iterable[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    """Get or create a histogram in the global registry"""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Metrics common to every service
+http_request_duration = histogram(
+    "zeta_http_request_duration_seconds",
+    "Inbound HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+http_requests_in_flight = gauge(
+    "zeta_http_requests_in_flight",
+    "Inbound HTTP requests currently being served",
+)
+upstream_request_duration = histogram(
+    "zeta_upstream_request_duration_seconds",
+    "Outbound HTTP latency per upstream (openai, telegram, graph_api, zeta_api)",
+    ["upstream"],
+)
+upstream_request_errors = counter(
+    "zeta_upstream_request_errors_total",
+    "Outbound HTTP requests that failed",
+    ["upstream"],
+)
+redis_op_duration = histogram(
+    "zeta_redis_op_duration_seconds",
+    "Redis operation latency",
+    ["op"],
+)
+
+
+@contextmanager
+def track_upstream(upstream: str):
+    """Time an outbound call: `with track_upstream("openai"): await client...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        upstream_request_errors.inc(upstream=upstream)
+        raise
+    finally:
+        upstream_request_duration.observe(time.perf_counter() - start, upstream=upstream)
+
+
+@contextmanager
+def track_redis(op: str):
+    """Time a Redis operation: `with track_redis("get_history"): await redis...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        redis_op_duration.observe(time.perf_counter() - start, op=op)
+
+
+UPSTREAM_HOSTS = {
+    "api.openai.com": "openai",
+    "api.telegram.org": "telegram",
+    "graph.facebook.com": "graph_api",
+}
+
+
+def upstream_for_host(host: Optional[str], default: str = "zeta_api") -> str:
+    """Map a request host to an upstream label; unknown hosts are our own API"""
+    return UPSTREAM_HOSTS.get((host or "").lower(), default)
+
+
+_aiohttp_trace_config = None
+
+
+def aiohttp_trace_config():
+    """
+    aiohttp TraceConfig timing every request of a ClientSession per upstream:
+    `aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()])`
+    """
+    global _aiohttp_trace_config
+    if _aiohttp_trace_config is not None:
+        return _aiohttp_trace_config
+
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        upstream = upstream_for_host(params.url.host)
+        upstream_request_duration.observe(time.perf_counter() - context.start, upstream=upstream)
+        if params.response.status >= 500:
+            upstream_request_errors.inc(upstream=upstream)
+
+    async def on_request_exception(session, context, params):
+        upstream = upstream_for_host(params.url.host)
+        upstream_request_duration.observe(time.perf_counter() - context.start, upstream=upstream)
+        upstream_request_errors.inc(upstream=upstream)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    _aiohttp_trace_config = trace_config
+    return trace_config
+
+
+def httpx_event_hooks() -> Dict[str, list]:
+    """
+    httpx event hooks timing every request of a client per upstream:
+    `httpx.AsyncClient(event_hooks=httpx_event_hooks())`
+    """
+
+    async def on_request(request):
+        request.extensions["zeta_start"] = time.perf_counter()
+
+    async def on_response(response):
+        request = response.request
+        start = request.extensions.get("zeta_start")
+        if start is None:
+            return
+        upstream = upstream_for_host(request.url.host)
+        upstream_request_duration.observe(time.perf_counter() - start, upstream=upstream)
+        if response.status_code >= 500:
+            upstream_request_errors.inc(upstream=upstream)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route template and in-flight requests.
+
+    The route template (e.g. /cities/{city_id}/products) is read from the scope
+    after routing, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, exclude_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", "unmatched"),
+                status=status_holder["status"],
+            )
+
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "REGISTRY",
+    "CONTENT_TYPE_LATEST",
+    "counter",
+    "gauge",
+    "histogram",
+    "http_request_duration",
+    "http_requests_in_flight",
+    "upstream_request_duration",
+    "upstream_request_errors",
+    "redis_op_duration",
+    "track_upstream",
+    "track_redis",
+    "upstream_for_host",
+    "aiohttp_trace_config",
+    "httpx_event_hooks",
+    "MetricsMiddleware",
+]
@@ -0,0 +1,290 @@
+"""
+OCR Pool - Tesseract in worker processes, off the event loop
+
+OCR takes hundreds of milliseconds to seconds per photo; run inline it froze
+every chat the bot was serving. OcrPool runs it in a small pool of spawned
+worker processes:
+
+- Workers are started and warmed up front (Tesseract's language data loaded
+  by a first tiny recognition). With the optional tesserocr package each
+  worker keeps one Tesseract instance for its lifetime; otherwise every job
+  runs the tesseract binary through pytesseract.
+- Preprocessing happens in the worker too: grayscale, scale to a size
+  Tesseract reads well, autocontrast and an Otsu threshold.
+- Every job has a timeout; a job that overruns is abandoned and the photo is
+  treated as having no text. pytesseract kills the tesseract binary at the
+  timeout, but a tesserocr call can't be interrupted: an abandoned job still
+  on its worker STUCK_AFTER timeouts later has hung it, and the pool kills
+  its workers and starts fresh ones (the other jobs in flight fail).
+- Jobs are counted from submission until their worker finishes (abandoned
+  ones included). When `max_queue` jobs are in flight, run() raises OcrBusy
+  at once, and the handler asks the customer to describe the product in
+  words instead of making them wait behind the queue.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from core.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+OCR_LANG = "rus+eng"
+OCR_CONFIG = "--psm 6"  # Assume a uniform block of text
+MAX_SIDE = 1600  # Larger photos are downscaled; text stays legible and Tesseract runs faster
+MIN_SIDE = 800  # Smaller screenshots are upscaled 2x so small print reaches a readable height
+STUCK_AFTER = 3  # Timeouts an abandoned job may spend on a worker before the pool is restarted
+
+ocr_jobs = counter(
+    "zeta_bot_ocr_jobs_total",
+    "OCR jobs by outcome (ok, timeout, error, rejected, hung)",
+    ["outcome"],
+)
+ocr_duration = histogram(
+    "zeta_bot_ocr_duration_seconds",
+    "Time from submitting an OCR job to its result, queueing included",
+)
+ocr_in_flight = gauge(
+    "zeta_bot_ocr_jobs_in_flight",
+    "OCR jobs submitted and not yet finished by a worker",
+)
+
+
+class OcrBusy(Exception):
+    """Raised when the OCR queue is full"""
+
+
+# --- Worker process side ---
+
+_tesseract_api = None  # tesserocr.PyTessBaseAPI of this worker, when tesserocr is installed
+
+
+def _otsu_threshold(histogram_counts) -> int:
+    """Gray level that best separates text from background"""
+    total = sum(histogram_counts)
+    weighted_total = sum(level * count for level, count in enumerate(histogram_counts))
+    background = background_weighted = 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram_counts):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_weighted += level * count
+        mean_background = background_weighted / background
+        mean_foreground = (weighted_total - background_weighted) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def preprocess(data):
+    """Grayscale, resized and binarized image ready for Tesseract (from encoded bytes or a PIL image)"""
+    from PIL import Image, ImageOps
+
+    if isinstance(data, Image.Image):
+        image = data.convert("L")  # Already decoded and oriented by the caller
+    else:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("L", (MAX_SIDE, MAX_SIDE))  # JPEG: decode at a reduced scale when possible
+            image = ImageOps.exif_transpose(image).convert("L")
+
+    longest = max(image.size)
+    if longest > MAX_SIDE:
+        scale = MAX_SIDE / longest
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.Resampling.LANCZOS)
+    elif longest < MIN_SIDE:
+        image = image.resize((image.width * 2, image.height * 2), Image.Resampling.BICUBIC)
+
+    image = ImageOps.autocontrast(image, cutoff=1)
+    threshold = _otsu_threshold(image.histogram())
+    return image.point(lambda value: 255 if value > threshold else 0)
+
+
+def _recognize(image, lang: str, timeout: float) -> str:
+    if _tesseract_api is not None:
+        _tesseract_api.SetImage(image)
+        return _tesseract_api.GetUTF8Text()
+    import pytesseract
+    return pytesseract.image_to_string(image, lang=lang, config=OCR_CONFIG, timeout=timeout)
+
+
+def _init_worker(lang: str):
+    """Load Tesseract once per worker and run a throwaway recognition to warm it"""
+    global _tesseract_api
+    try:
+        import tesserocr
+        _tesseract_api = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM.SINGLE_BLOCK)
+    except ImportError:
+        _tesseract_api = None
+
+    from PIL import Image
+    try:
+        _recognize(Image.new("L", (64, 32), 255), lang, timeout=30)
+    except Exception as e:
+        logger.warning(f"⚠️ OCR warm-up failed: {e}")
+
+
+def run_ocr(data, lang: str, timeout: float) -> str:
+    """Preprocess and recognize one image (runs in a worker process)"""
+    return _recognize(preprocess(data), lang, timeout).strip()
+
+
+def _warm():
+    return os.getpid()
+
+
+# --- Event loop side ---
+
+class OcrPool:
+    """Bounded pool of warm OCR worker processes"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 8,
+        timeout: float = 10.0,
+        lang: str = OCR_LANG
+    ):
+        """
+        Initialize OcrPool
+
+        Args:
+            workers: Worker processes (each OCR job uses one CPU core)
+            max_queue: Jobs in flight (running or waiting) before run() raises OcrBusy
+            timeout: Seconds a caller waits for one job
+            lang: Tesseract languages
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.lang = lang
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        ocr_in_flight.set_function(lambda: self._in_flight)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.max_queue
+
+    def start(self):
+        """Start the workers and warm them in the background"""
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.lang,)
+        )
+        # One job per worker before any finishes makes the executor start them all now
+        for _ in range(self.workers):
+            self._executor.submit(_warm)
+        logger.info(f"✅ OCR pool started ({self.workers} workers, queue {self.max_queue}, timeout {self.timeout}s)")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self):
+        """Kill the workers (a hung one never exits by itself) and start fresh ones"""
+        executor, self._executor = self._executor, None
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        # The killed pool fails its pending futures, which releases their in-flight slots
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    def _watch(self, loop, future, executor, running_since: Optional[float] = None):
+        """Poll an abandoned job until it finishes; restart the pool if it stays on a worker too long"""
+        if future.done() or executor is not self._executor:
+            return
+        now = time.monotonic()
+        if future.running():  # Handed to a worker (at most one job queued ahead of it there)
+            running_since = running_since or now
+            if now - running_since >= self.timeout * STUCK_AFTER:
+                ocr_jobs.inc(outcome="hung")
+                logger.error(f"❌ OCR job stuck for {now - running_since:.0f}s, restarting workers")
+                self._restart()
+                return
+        loop.call_later(self.timeout, self._watch, loop, future, executor, running_since)
+
+    def _release(self):
+        self._in_flight -= 1
+
+    async def run(self, image) -> str:
+        """
+        Recognize text in an image (encoded bytes or a decoded PIL image)
+
+        Returns:
+            Extracted text, "" if the job failed or timed out
+
+        Raises:
+            OcrBusy: max_queue jobs are already in flight
+        """
+        if self.saturated:
+            ocr_jobs.inc(outcome="rejected")
+            raise OcrBusy()
+        if self._executor is None:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            future = self._executor.submit(run_ocr, image, self.lang, self.timeout)
+        except BrokenProcessPool:
+            logger.error("❌ OCR pool broken, restarting workers")
+            self.stop()
+            self.start()
+            future = self._executor.submit(run_ocr, image, self.lang, self.timeout)
+        executor = self._executor
+        self._in_flight += 1
+
+        def on_done(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # Loop already closed at shutdown
+
+        future.add_done_callback(on_done)
+
+        try:
+            text = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            ocr_jobs.inc(outcome="timeout")
+            logger.warning(f"⚠️ OCR timed out after {self.timeout}s ({self._in_flight} in flight)")
+            self._watch(loop, future, executor)
+            return ""
+        except Exception as e:
+            ocr_jobs.inc(outcome="error")
+            logger.error(f"OCR failed: {e}")
+            return ""
+
+        ocr_jobs.inc(outcome="ok")
+        ocr_duration.observe(time.perf_counter() - started)
+        logger.info(f"OCR extracted {len(text)} characters")
+        return text
+
+
+ocr_pool = OcrPool(
+    workers=int(os.getenv("OCR_WORKERS", "2")),
+    max_queue=int(os.getenv("OCR_MAX_QUEUE", "8")),
+    timeout=float(os.getenv("OCR_TIMEOUT_SECONDS", "10"))
+)
+
+
+__all__ = ["OcrPool", "OcrBusy", "ocr_pool", "preprocess", "run_ocr"]
@@ -0,0 +1,95 @@
+"""
+Photo Buffer - Download, decode and downscale a customer's photo once
+
+Image search used to write every photo to /tmp, then reopen it for OCR
+and again for the Vision upload, leaking the file whenever a step raised.
+Now a photo is:
+
+- downloaded into a buffer that stays in memory up to PHOTO_MEMORY_LIMIT_BYTES
+  (a larger file spills to an anonymous temp file that is removed on close,
+  whatever happens)
+- decoded once with Pillow (JPEG draft mode decodes big photos at reduced
+  scale) and downscaled once to PHOTO_SIDE, a size OCR reads well and Vision
+  does not shrink further
+- kept as that decoded image, its grayscale copy for OCR and one re-encoded
+  JPEG for uploads, which every search step shares
+
+Decoding runs in a thread so the event loop keeps serving other chats.
+"""
+import asyncio
+import io
+import logging
+import os
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from aiogram import types
+
+from core.metrics import counter
+from core.photo_cache import dhash
+
+logger = logging.getLogger(__name__)
+
+PHOTO_SIDE = 1600  # Longest side shared by OCR, Vision and the hash lookups
+JPEG_QUALITY = 85
+MEMORY_LIMIT = int(os.getenv("PHOTO_MEMORY_LIMIT_BYTES", str(8 * 1024 * 1024)))
+
+photo_downloads = counter(
+    "zeta_bot_photo_downloads_total",
+    "Customer photos downloaded, by where the buffer lived (memory, disk)",
+    ["storage"],
+)
+
+
+class PreparedPhoto:
+    """A customer photo decoded and downscaled once, shared by every search step"""
+
+    def __init__(self, image, gray, jpeg: bytes, image_hash: Optional[str]):
+        self.image = image  # Decoded RGB PIL image, longest side <= PHOTO_SIDE
+        self.gray = gray  # The same in grayscale (what OCR reads; a third of the bytes to ship to a worker)
+        self.jpeg = jpeg  # The same image encoded once, for uploads (hash search, Vision)
+        self.dhash = image_hash  # Difference hash for the photo cache, None if uninformative
+
+    @property
+    def size(self):
+        return self.image.size
+
+
+def prepare(source) -> PreparedPhoto:
+    """Decode an encoded image (bytes or file object) and downscale it"""
+    from PIL import Image, ImageOps
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image.draft("RGB", (PHOTO_SIDE, PHOTO_SIDE))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    if max(image.size) > PHOTO_SIDE:
+        image.thumbnail((PHOTO_SIDE, PHOTO_SIDE), Image.Resampling.LANCZOS)
+
+    encoded = io.BytesIO()
+    image.save(encoded, "JPEG", quality=JPEG_QUALITY)
+    gray = image.convert("L")
+    return PreparedPhoto(image, gray, encoded.getvalue(), dhash(gray))
+
+
+async def load_photo(bot, photo: types.PhotoSize) -> PreparedPhoto:
+    """
+    Download a Telegram photo and prepare it for search
+
+    Raises:
+        OSError: the file is not an image Pillow can decode
+    """
+    storage = "disk" if (photo.file_size or 0) > MEMORY_LIMIT else "memory"
+    photo_downloads.inc(storage=storage)
+
+    with SpooledTemporaryFile(max_size=MEMORY_LIMIT) as buffer:
+        await bot.download(photo, destination=buffer)
+        prepared = await asyncio.to_thread(prepare, buffer)
+
+    logger.info(f"Prepared photo {prepared.size[0]}x{prepared.size[1]} ({len(prepared.jpeg)} bytes, {storage})")
+    return prepared
+
+
+__all__ = ["PreparedPhoto", "prepare", "load_photo", "PHOTO_SIDE"]
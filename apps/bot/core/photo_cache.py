@@ -0,0 +1,242 @@
+"""
+Photo Cache - Reuse Vision descriptions and photo-search results for repeated images
+
+Customers forward the same product screenshot again, and viral pictures
+reach many users at once; each used to cost a fresh Vision call. Results
+are cached under two keys per photo:
+
+- file:{file_unique_id}  Telegram's id for the file itself; a forwarded
+  photo keeps it, so a hit skips even the download
+- dhash:{hash}           64-bit difference hash of the picture; the same
+  image re-uploaded (new file id, re-encoded) gets the same hash
+
+"products" keys are prefixed with city:{id}: because each bot instance
+serves one city's catalog and Redis is shared between them; "vision"
+descriptions don't depend on the city and stay global.
+
+Re-encoding flips a few hash bits, so in memory a "vision" dhash key also
+matches hashes within NEAR_DISTANCE bits (Redis is looked up by exact key
+only). "products" keys match exactly: dhash ignores color, so a near hit
+could be another variant of the product with its own price and stock.
+A hit on either key backfills the other. Two kinds are cached:
+"vision" (the Vision description, kept long: the picture does not change)
+and "products" (the final product list, kept short so price and stock
+changes show up).
+
+Entries live in a bounded in-process LRU with per-entry expiry. With a
+Redis URL configured, Redis is a second level shared by every bot instance
+(expiry via EX; size bounded by the server's maxmemory policy). Redis errors
+only cost the cache, never the photo search.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+from core.metrics import counter, track_redis
+
+logger = logging.getLogger(__name__)
+
+NEAR_DISTANCE = 4  # Bits of 64 a re-encoded or re-compressed copy may differ by
+NEAR_KINDS = ("vision",)  # Kinds whose dhash keys also match near hashes
+
+cache_requests = counter(
+    "zeta_bot_photo_cache_requests_total",
+    "Photo cache lookups by kind (vision, products) and result (memory, redis, miss)",
+    ["kind", "result"],
+)
+
+
+def dhash(image) -> Optional[str]:
+    """Difference hash of a decoded PIL image, None for flat pictures"""
+    from PIL import Image
+
+    small = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col + 1] > pixels[row * 9 + col])
+    if bits == 0:
+        return None  # Flat or vertically graded picture: every such photo would share this key
+    return f"{bits:016x}"
+
+
+def photo_keys(
+    file_unique_id: Optional[str] = None,
+    dhash: Optional[str] = None,
+    city_id: Optional[str] = None
+) -> List[str]:
+    """Cache keys of a photo; pass city_id for per-city results ("products")"""
+    scope = f"city:{city_id}:" if city_id is not None else ""
+    keys = []
+    if file_unique_id:
+        keys.append(f"{scope}file:{file_unique_id}")
+    if dhash:
+        keys.append(f"{scope}dhash:{dhash}")
+    return keys
+
+
+class PhotoCache:
+    """Two-level (memory, optional Redis) TTL cache for photo lookups"""
+
+    def __init__(
+        self,
+        max_entries: int = 5000,
+        ttl_seconds: Optional[dict] = None,
+        redis_url: Optional[str] = None,
+        prefix: str = "photo"
+    ):
+        """
+        Initialize PhotoCache
+
+        Args:
+            max_entries: In-memory entries (all kinds together) before the least recently used are dropped
+            ttl_seconds: Expiry per kind, e.g. {"vision": 604800, "products": 3600}
+            redis_url: Shared second level; None keeps the cache per process
+            prefix: Redis key prefix
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = {"vision": 7 * 86400, "products": 3600, **(ttl_seconds or {})}
+        self.prefix = prefix
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._near: Dict[Tuple[str, str], int] = {}  # Hash bits of the in-memory NEAR_KINDS dhash entries
+        self._redis = None
+        if redis_url:
+            if redis is None:
+                logger.warning("⚠️ redis package not installed - photo cache stays in memory")
+            else:
+                self._redis = redis.from_url(redis_url)
+
+    def _redis_key(self, kind: str, key: str) -> str:
+        return f"{self.prefix}:{kind}:{key}"
+
+    def _memory_get(self, kind: str, key: str) -> Optional[Any]:
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._memory_drop(kind, key)
+            return None
+        self._entries.move_to_end((kind, key))
+        return value
+
+    def _memory_near(self, kind: str, key: str) -> Optional[Tuple[str, Any]]:
+        """NEAR_KINDS entry whose dhash key is within NEAR_DISTANCE bits of `key`"""
+        if kind not in NEAR_KINDS:
+            return None
+        target = int(key[len("dhash:"):], 16)
+        now = time.monotonic()
+        expired = []
+        found = None
+        for (entry_kind, entry_key), bits in self._near.items():
+            if entry_kind != kind or (target ^ bits).bit_count() > NEAR_DISTANCE:
+                continue
+            expires_at, value = self._entries[(kind, entry_key)]
+            if expires_at <= now:
+                expired.append(entry_key)
+                continue
+            found = entry_key, value
+            break
+        for entry_key in expired:
+            self._memory_drop(kind, entry_key)
+        if found is not None:
+            self._entries.move_to_end((kind, found[0]))
+        return found
+
+    def _memory_put(self, kind: str, key: str, value: Any, ttl: float):
+        self._entries[(kind, key)] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end((kind, key))
+        if kind in NEAR_KINDS and key.startswith("dhash:"):
+            self._near[(kind, key)] = int(key[len("dhash:"):], 16)
+        while len(self._entries) > self.max_entries:
+            (old_kind, old_key), _ = self._entries.popitem(last=False)
+            self._near.pop((old_kind, old_key), None)
+
+    def _memory_drop(self, kind: str, key: str):
+        del self._entries[(kind, key)]
+        self._near.pop((kind, key), None)
+
+    async def get(self, kind: str, keys: Sequence[str]) -> Optional[Any]:
+        """First cached value under any of `keys`; backfills the keys that missed"""
+        for key in keys:
+            value = self._memory_get(kind, key)
+            if value is not None:
+                cache_requests.inc(kind=kind, result="memory")
+                await self._backfill(kind, keys, key, value)
+                return value
+
+        for key in keys:
+            if key.startswith("dhash:"):
+                near = self._memory_near(kind, key)
+                if near is not None:
+                    cache_requests.inc(kind=kind, result="memory")
+                    await self._backfill(kind, keys, near[0], near[1])
+                    return near[1]
+
+        if self._redis is not None and keys:
+            try:
+                with track_redis("photo_cache_get"):
+                    raw = await self._redis.mget([self._redis_key(kind, key) for key in keys])
+            except Exception as e:
+                logger.warning(f"⚠️ Photo cache Redis read failed: {e}")
+                raw = []
+            for key, payload in zip(keys, raw):
+                if payload is not None:
+                    value = json.loads(payload)
+                    cache_requests.inc(kind=kind, result="redis")
+                    self._memory_put(kind, key, value, self.ttl_seconds[kind])
+                    await self._backfill(kind, keys, key, value)
+                    return value
+
+        cache_requests.inc(kind=kind, result="miss")
+        return None
+
+    async def _backfill(self, kind: str, keys: Sequence[str], found: str, value: Any):
+        missing = [key for key in keys if key != found and self._memory_get(kind, key) is None]
+        if missing:
+            await self.put(kind, missing, value)
+
+    async def put(self, kind: str, keys: Sequence[str], value: Any):
+        """Store `value` under every key"""
+        if value is None or not keys:
+            return
+        ttl = self.ttl_seconds[kind]
+        for key in keys:
+            self._memory_put(kind, key, value, ttl)
+
+        if self._redis is not None:
+            payload = json.dumps(value, ensure_ascii=False)
+            try:
+                with track_redis("photo_cache_put"):
+                    async with self._redis.pipeline(transaction=False) as pipe:
+                        for key in keys:
+                            pipe.set(self._redis_key(kind, key), payload, ex=int(ttl))
+                        await pipe.execute()
+            except Exception as e:
+                logger.warning(f"⚠️ Photo cache Redis write failed: {e}")
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+
+
+photo_cache = PhotoCache(
+    max_entries=int(os.getenv("PHOTO_CACHE_MAX_ENTRIES", "5000")),
+    ttl_seconds={
+        "vision": int(os.getenv("PHOTO_CACHE_VISION_TTL", str(7 * 86400))),
+        "products": int(os.getenv("PHOTO_CACHE_PRODUCTS_TTL", "3600")),
+    },
+    redis_url=os.getenv("PHOTO_CACHE_REDIS_URL") or None
+)
+
+
+__all__ = ["PhotoCache", "photo_cache", "photo_keys", "dhash"]
@@ -128,7 +128,7 @@ async def show_product_photo(callback: types.CallbackQuery):
         return
     
     # Get image URL
-    image_url = product.get('link') or product.get('primary_image')
+    image_url = product.get('thumbnail_url') or product.get('link') or product.get('primary_image')
     
     if image_url:
         try:
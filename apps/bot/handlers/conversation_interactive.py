@@ -134,7 +134,7 @@ async def perform_product_search(
         if show_carousel:
             products_with_images = [
                 p for p in products[:10]
-                if p.get("image_url") or p.get("primary_image")
+                if p.get("thumbnail_url") or p.get("image_url") or p.get("primary_image")
             ]
             
             if products_with_images:
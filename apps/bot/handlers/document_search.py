@@ -6,12 +6,11 @@ Allow users to search within uploaded documents (catalogs, manuals, etc.)
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import Command
+import html
 import logging
 import os
 
-# TODO: Import when implementing
-# from core.api_client import api_client
-# from core.i18n import t, get_user_language
+from core.api_client import search_documents_api
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +18,7 @@ router = Router()
 
 # Configuration
 CITY_ID = int(os.getenv("CITY_ID", "1"))
+MAX_RESULTS = 5
 
 
 @router.message(Command("docs"))
@@ -29,14 +29,8 @@ async def search_documents_command(message: Message):
     Usage:
         /docs диван угловой
         /docs прайс лист
-    
-    TODO (Next Phase):
-    - Implement actual document search via API
-    - Display results with excerpts
-    - Allow viewing full document
-    - Track search analytics
     """
-    query = message.text.replace("/docs", "").strip()
+    query = message.text.replace("/docs", "").replace("📚", "").strip()
     
     if not query:
         await message.answer(
@@ -47,52 +41,30 @@ async def search_documents_command(message: Message):
             "• Каталоги продукции\n"
             "• Прайс-листы\n"
             "• Инструкции\n"
-            "• Руководства\n\n"
-            "TODO: Реализовать поиск в следующей фазе"
+            "• Руководства"
         )
         return
     
     logger.info(f"Document search: '{query}' from user {message.from_user.id}")
     
-    await message.answer("🔍 Ищу в документах...")
-    
-    # TODO: Implement actual search
-    # try:
-    #     # Search via API
-    #     results = await api_client.search_documents(
-    #         city_id=CITY_ID,
-    #         query=query,
-    #         limit=5
-    #     )
-    #     
-    #     if results and results["count"] > 0:
-    #         # Format results
-    #         response = f"📚 Найдено в документах ({results['count']}):\n\n"
-    #         
-    #         for i, result in enumerate(results["results"], 1):
-    #             response += f"{i}. **{result['filename']}**\n"
-    #             response += f"   {result['excerpt']}\n"
-    #             response += f"   Релевантность: {result['score']:.0%}\n\n"
-    #         
-    #         await message.answer(response)
-    #     else:
-    #         await message.answer(
-    #             "❌ Ничего не нашёл в документах по запросу.\n"
-    #             "Попробуйте другие слова или свяжитесь с менеджером."
-    #         )
-    # except Exception as e:
-    #     logger.error(f"Document search error: {e}")
-    #     await message.answer("⚠️ Ошибка при поиске. Попробуйте позже.")
-    
-    # Stub response
+    results = await search_documents_api(city_id=CITY_ID, query=query, limit=MAX_RESULTS)
+    if results is not None and not results.get("count"):
+        # No exact word matches: fall back to similar passages
+        results = await search_documents_api(city_id=CITY_ID, query=query, limit=MAX_RESULTS, mode="semantic")
+    
+    if results is None:
+        await message.answer("⚠️ Ошибка при поиске. Попробуйте позже.")
+        return
+    
+    if not results.get("count"):
+        await message.answer(
+            "❌ Ничего не нашёл в документах по запросу.\n"
+            "Попробуйте другие слова или свяжитесь с менеджером."
+        )
+        return
+    
     await message.answer(
-        "TODO: Поиск в документах пока не реализован.\n\n"
-        f"Ваш запрос: \"{query}\"\n\n"
-        "В следующей фазе здесь будет:\n"
-        "✅ Семантический поиск по каталогам\n"
-        "✅ Поиск по прайс-листам\n"
-        "✅ Выдержки из документов\n"
-        "✅ Ссылки на полные документы"
+        f"📚 Найдено в документах ({results['count']}):\n\n" + format_document_results(results["results"])
     )
 
 
@@ -103,8 +75,6 @@ async def search_documents_inline(message: Message):
     
     Example:
         📚 диван угловой
-    
-    TODO: Implement in next phase
     """
     query = message.text.replace("📚", "").strip()
     
@@ -113,15 +83,32 @@ async def search_documents_inline(message: Message):
         await search_documents_command(message)
 
 
-async def format_document_results(results: list) -> str:
+def highlight_excerpt(excerpt: str, highlights: list) -> str:
     """
-    Format document search results for display.
+    Escape excerpt for HTML parse mode and bold the matched words.
     
-    TODO: Implement nice formatting with:
-    - Document name and type
-    - Relevant excerpt with highlighting
-    - Page/section reference
-    - Download link
+    Args:
+        excerpt: Excerpt text from the API
+        highlights: [start, end) character offsets of matches in excerpt
+    
+    Returns:
+        HTML string
+    """
+    parts = []
+    position = 0
+    for start, end in sorted(highlights):
+        if start < position:
+            continue
+        parts.append(html.escape(excerpt[position:start]))
+        parts.append(f"<b>{html.escape(excerpt[start:end])}</b>")
+        position = end
+    parts.append(html.escape(excerpt[position:]))
+    return "".join(parts)
+
+
+def format_document_results(results: list) -> str:
+    """
+    Format document search results for display (HTML parse mode).
     
     Args:
         results: List of search results
@@ -134,14 +121,13 @@ async def format_document_results(results: list) -> str:
     
     output = []
     for i, result in enumerate(results, 1):
-        output.append(f"{i}. {result.get('filename', 'Unknown')}")
+        filename = html.escape(result.get("filename", "Unknown"))
+        label = html.escape(result.get("label", ""))
+        output.append(f"{i}. 📄 <b>{filename}</b>" + (f" ({label})" if label else ""))
         
         excerpt = result.get("excerpt", "")
         if excerpt:
-            output.append(f"   {excerpt[:200]}...")
-        
-        score = result.get("score", 0)
-        output.append(f"   Релевантность: {score:.0%}\n")
+            output.append(f"   {highlight_excerpt(excerpt, result.get('highlights', []))}\n")
     
     return "\n".join(output)
 
@@ -1,30 +1,50 @@
 """
 Image search handler - OCR + Vision API + reverse product search
-Multi-method approach: OCR → Vision API → fallback clarification
+Multi-method approach: hash index, OCR and Vision API race → fallback clarification
 """
+import asyncio
+import base64
 import logging
 import os
 import re
-import tempfile
+import time
 from typing import List, Dict, Optional, Tuple
-from pathlib import Path
 
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from PIL import Image
-import pytesseract
+import httpx
 from openai import AsyncOpenAI
 
 from handlers.start import ConversationState
+from core.metrics import counter, histogram, httpx_event_hooks
+from core.ocr_pool import OcrBusy, ocr_pool
+from core.photo_buffer import PreparedPhoto, load_photo
+from core.photo_cache import photo_cache, photo_keys
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+branch_outcomes = counter(
+    "zeta_bot_photo_search_branches_total",
+    "Photo search branch results by branch and outcome (won, fallback, unused, empty, cancelled, busy, error)",
+    ["branch", "outcome"],
+)
+photo_resolve_duration = histogram(
+    "zeta_bot_photo_search_resolve_seconds",
+    "Time to resolve a photo to products, by the method that produced them",
+    ["method"],
+)
+
+CITY_ID = int(os.getenv("CITY_ID", "1"))
+
 # Initialize OpenAI client
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+openai_client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=httpx.AsyncClient(event_hooks=httpx_event_hooks()),
+) if OPENAI_API_KEY else None
 
 # SKU pattern for Russian product codes
 # Example: КР-СТ-12345, ДИВ-КЛА-001
@@ -37,47 +57,18 @@ PRODUCT_PATTERNS = [
 ]
 
 
-async def download_photo(bot, photo: types.PhotoSize) -> str:
-    """
-    Download photo from Telegram to temp file
-    
-    Returns:
-        Path to downloaded file
+async def extract_text_with_ocr(image) -> str:
     """
-    file = await bot.get_file(photo.file_id)
-    temp_dir = Path(tempfile.gettempdir())
-    temp_path = temp_dir / f"{photo.file_id}.jpg"
-    
-    await bot.download_file(file.file_path, temp_path)
-    logger.info(f"Downloaded photo to {temp_path}")
-    
-    return str(temp_path)
-
-
-async def extract_text_with_ocr(image_path: str) -> str:
-    """
-    Extract text from image using Tesseract OCR
+    Extract text from image using Tesseract OCR in the OCR worker pool
     Supports Russian and English
     
     Returns:
-        Extracted text
-    """
-    try:
-        image = Image.open(image_path)
-        
-        # Use both Russian and English for better recognition
-        text = pytesseract.image_to_string(
-            image,
-            lang='rus+eng',
-            config='--psm 6'  # Assume uniform block of text
-        )
-        
-        logger.info(f"OCR extracted {len(text)} characters")
-        return text.strip()
+        Extracted text ("" on failure or timeout)
     
-    except Exception as e:
-        logger.error(f"OCR failed: {e}")
-        return ""
+    Raises:
+        OcrBusy: the OCR queue is full
+    """
+    return await ocr_pool.run(image)
 
 
 def extract_sku_from_text(text: str) -> Optional[str]:
@@ -104,9 +95,9 @@ def extract_sku_from_text(text: str) -> Optional[str]:
     return None
 
 
-async def analyze_image_with_vision(image_path: str) -> Optional[str]:
+async def analyze_image_with_vision(image: bytes) -> Optional[str]:
     """
-    Analyze product image with OpenAI Vision API
+    Analyze product image (encoded JPEG) with OpenAI Vision API
     
     Returns:
         Product description or None if API unavailable
@@ -116,11 +107,7 @@ async def analyze_image_with_vision(image_path: str) -> Optional[str]:
         return None
     
     try:
-        # Read image as base64
-        import base64
-        with open(image_path, 'rb') as f:
-            image_data = base64.b64encode(f.read()).decode('utf-8')
-        
+        image_data = base64.b64encode(image).decode('utf-8')
         image_url = f"data:image/jpeg;base64,{image_data}"
         
         # Call Vision API
@@ -269,17 +256,169 @@ def create_product_keyboard(products: List[Dict]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+async def ask_to_describe(message: types.Message, state: FSMContext, reason: str):
+    """Offer to describe the product in words (or reach a manager) instead of searching by photo"""
+    text = (
+        f"{reason}"
+        "Попробуйте:\n"
+        "• Описать товар словами\n"
+        "• Прислать фото с другого ракурса\n"
+        "• Указать артикул, если он есть\n"
+        "• Связаться с менеджером"
+    )
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text="📝 Описать словами",
+            callback_data="describe_product"
+        )],
+        [InlineKeyboardButton(
+            text="📞 Связаться с менеджером",
+            callback_data="escalate:manager"
+        )]
+    ])
+    
+    await message.answer(text, reply_markup=keyboard)
+    await state.set_state(ConversationState.product_inquiry)
+
+
+async def _hash_branch(api_client, prepared: PreparedPhoto) -> Tuple[List[Dict], bool]:
+    """Catalog image hash index: screenshots of our own pictures, in milliseconds"""
+    matches = await api_client.search_by_image(prepared.jpeg)
+    products = [p for p in matches if p.get("confident")]
+    return products, bool(products)
+
+
+async def _ocr_branch(api_client, prepared: PreparedPhoto, city_id: str) -> Tuple[List[Dict], bool]:
+    """OCR → SKU: screenshots and photos of price tags; confident on an exact SKU match"""
+    ocr_text = await extract_text_with_ocr(prepared.gray)
+    if not ocr_text:
+        return [], False
+    logger.info(f"OCR text: {ocr_text[:100]}")
+    
+    sku = extract_sku_from_text(ocr_text)
+    if not sku:
+        return [], False
+    logger.info(f"Found SKU via OCR: {sku}")
+    
+    products = await search_by_sku(api_client, sku, city_id)
+    return products, any(p.get('sku', '').upper() == sku for p in products)
+
+
+async def _vision_branch(api_client, prepared: PreparedPhoto, cache_keys: List[str], city_id: str) -> Tuple[List[Dict], bool]:
+    """Vision description → text search: finds similar products, never a confident match"""
+    description = await photo_cache.get("vision", cache_keys)
+    if not description:
+        description = await analyze_image_with_vision(prepared.jpeg)
+        await photo_cache.put("vision", cache_keys, description)
+    if not description:
+        return [], False
+    logger.info(f"Vision API description: {description}")
+    
+    return await search_by_description(api_client, description, city_id), False
+
+
+# Which non-confident result is shown when no branch is confident, whatever finished first
+FALLBACK_PRIORITY = ("pHash", "OCR → SKU", "Vision API")
+
+
+async def resolve_photo(api_client, prepared: PreparedPhoto, cache_keys: List[str], city_id: str) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Find products for a photo by racing every search branch
+    
+    The hash lookup, OCR → SKU and (when configured) Vision → description
+    start together. The first confident result wins and the branches still
+    running are cancelled. Without a confident result every branch is awaited
+    and the non-confident ones are ranked by FALLBACK_PRIORITY, so Vision's
+    similar products are used only when OCR's SKU guess found nothing.
+    Worst-case latency is the slowest branch instead of the sum of all of them.
+    
+    Returns:
+        (products, search method), ([], None) if nothing was found
+    
+    Raises:
+        OcrBusy: OCR was rejected and no other branch found anything
+    """
+    branches = {
+        asyncio.create_task(_hash_branch(api_client, prepared)): "pHash",
+        asyncio.create_task(_ocr_branch(api_client, prepared, city_id)): "OCR → SKU",
+    }
+    if openai_client:
+        branches[asyncio.create_task(_vision_branch(api_client, prepared, cache_keys, city_id))] = "Vision API"
+    
+    started = time.perf_counter()
+    fallbacks: Dict[str, List[Dict]] = {}
+    ocr_busy = False
+    pending = set(branches)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                method = branches[task]
+                try:
+                    products, confident = task.result()
+                except OcrBusy:
+                    ocr_busy = True
+                    branch_outcomes.inc(branch=method, outcome="busy")
+                    continue
+                except Exception as e:
+                    logger.error(f"{method} photo search failed: {e}")
+                    branch_outcomes.inc(branch=method, outcome="error")
+                    continue
+                
+                if confident:
+                    branch_outcomes.inc(branch=method, outcome="won")
+                    for unused in fallbacks:
+                        branch_outcomes.inc(branch=unused, outcome="unused")
+                    photo_resolve_duration.observe(time.perf_counter() - started, method=method)
+                    return products, method
+                if products:
+                    fallbacks[method] = products  # Ranked, and outcome recorded, once the race is over
+                    continue
+                branch_outcomes.inc(branch=method, outcome="empty")
+    finally:
+        for task in pending:
+            task.cancel()
+            branch_outcomes.inc(branch=branches[task], outcome="cancelled")
+    
+    method = next((name for name in FALLBACK_PRIORITY if name in fallbacks), None)
+    products = fallbacks.get(method, [])
+    for name in fallbacks:
+        branch_outcomes.inc(branch=name, outcome="fallback" if name == method else "unused")
+    if not method and ocr_busy:
+        raise OcrBusy()
+    photo_resolve_duration.observe(time.perf_counter() - started, method=method or "none")
+    return products, method
+
+
+async def show_products(message: types.Message, state: FSMContext, products: List[Dict], search_method: str):
+    """Send the products found by photo and remember them for the follow-up"""
+    message_text = format_products_message(products, search_method)
+    keyboard = create_product_keyboard(products)
+    
+    await message.answer(message_text, reply_markup=keyboard)
+    await state.update_data(
+        last_search_method="image",
+        products=products
+    )
+    
+    logger.info(
+        f"User {message.from_user.id} found {len(products)} products "
+        f"via {search_method}"
+    )
+
+
 @router.message(F.photo)
 async def handle_product_photo(message: types.Message, state: FSMContext):
     """
     Handle photo message with hybrid search approach:
-    1. Try OCR to extract SKU
-    2. If no SKU, use Vision API to describe product
-    3. Search catalog by SKU or description
-    4. If nothing found, offer manual search
+    1. Reuse the result for a photo seen before (same file or same picture)
+    2. Otherwise race the image hash index, OCR → SKU and Vision → description
+       search (see resolve_photo)
+    3. If nothing found, offer manual search
     """
     api_client = message.bot.get("api_client")
-    city_id = "default"  # TODO: Get from user context
+    city_id = str(CITY_ID)  # One city per bot instance
     
     # Send "searching" status
     status_msg = await message.answer("🔍 Ищу товар по фото...")
@@ -287,83 +426,49 @@ async def handle_product_photo(message: types.Message, state: FSMContext):
     try:
         # Step 1: Download photo
         photo = message.photo[-1]  # Get highest resolution
-        photo_path = await download_photo(message.bot, photo)
         
-        products = []
-        search_method = None
+        # A forwarded photo keeps its file_unique_id: answer without even downloading it
+        products = await photo_cache.get("products", photo_keys(photo.file_unique_id, city_id=city_id))
+        if products:
+            await status_msg.delete()
+            await show_products(message, state, products, "cache")
+            return
         
-        # Step 2: Try OCR first (fast, works for screenshots with SKU)
-        ocr_text = await extract_text_with_ocr(photo_path)
+        # Downloaded into memory, decoded and downscaled once for every step below
+        prepared = await load_photo(message.bot, photo)
         
-        if ocr_text:
-            logger.info(f"OCR text: {ocr_text[:100]}")
-            
-            # Look for SKU in OCR text
-            sku = extract_sku_from_text(ocr_text)
-            
-            if sku:
-                logger.info(f"Found SKU via OCR: {sku}")
-                products = await search_by_sku(api_client, sku, city_id)
-                search_method = "OCR → SKU"
+        search_method = None
         
-        # Step 3: If OCR didn't find anything, use Vision API
-        if not products and openai_client:
-            description = await analyze_image_with_vision(photo_path)
-            
-            if description:
-                logger.info(f"Vision API description: {description}")
-                products = await search_by_description(api_client, description, city_id)
-                search_method = "Vision API"
+        # The same picture uploaded again gets a new file id but the same hash
+        cache_keys = photo_keys(photo.file_unique_id, prepared.dhash)  # Vision descriptions: any city
+        product_keys = photo_keys(photo.file_unique_id, prepared.dhash, city_id)
+        products = await photo_cache.get("products", product_keys) or []
+        if products:
+            search_method = "cache"
         
-        # Clean up temp file
-        try:
-            os.unlink(photo_path)
-        except:
-            pass
+        # Step 2: Race the hash lookup, OCR and Vision; the first confident match wins
+        if not products:
+            try:
+                products, search_method = await resolve_photo(api_client, prepared, cache_keys, city_id)
+            except OcrBusy:
+                # OCR is saturated and nothing else found the product: don't queue the customer behind it
+                logger.warning(f"OCR pool saturated ({ocr_pool.in_flight} jobs), asking to describe in words")
+                await status_msg.delete()
+                await ask_to_describe(message, state, "⏳ Сейчас много запросов по фото.\n\n")
+                return
         
-        # Step 4: Display results
+        # Step 3: Display results
         await status_msg.delete()
         
         if products:
             # Success - found products
-            message_text = format_products_message(products, search_method)
-            keyboard = create_product_keyboard(products)
-            
-            await message.answer(message_text, reply_markup=keyboard)
-            await state.update_data(
-                last_search_method="image",
-                products=products
-            )
-            
-            logger.info(
-                f"User {message.from_user.id} found {len(products)} products "
-                f"via {search_method}"
-            )
+            if search_method != "cache":
+                await photo_cache.put("products", product_keys, products)
+            await show_products(message, state, products, search_method)
         
         else:
             # No results - offer alternatives
-            no_results = (
-                "😔 Не смог найти товар по фото.\n\n"
-                "Попробуйте:\n"
-                "• Описать товар словами\n"
-                "• Прислать фото с другого ракурса\n"
-                "• Указать артикул, если он есть\n"
-                "• Связаться с менеджером"
-            )
-            
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(
-                    text="📝 Описать словами",
-                    callback_data="describe_product"
-                )],
-                [InlineKeyboardButton(
-                    text="📞 Связаться с менеджером",
-                    callback_data="escalate:manager"
-                )]
-            ])
-            
-            await message.answer(no_results, reply_markup=keyboard)
-            await state.set_state(ConversationState.product_inquiry)
+            await ask_to_describe(message, state, "😔 Не смог найти товар по фото.\n\n")
             
             logger.info(
                 f"User {message.from_user.id} - no products found via image search"
@@ -226,7 +226,7 @@ async def show_product_details(callback: types.CallbackQuery, state: FSMContext)
     message_text += f"📍 <b>Наличие:</b> {'✅ В наличии' if stock > 0 else '⏳ Под заказ'}\n"
     
     # Check if product has photo
-    image_url = product.get("image_url") or product.get("primary_image")
+    image_url = product.get("thumbnail_url") or product.get("image_url") or product.get("primary_image")
     has_photo = bool(image_url)
     
     # Create action buttons
@@ -276,7 +276,7 @@ async def send_product_photos(callback: types.CallbackQuery, state: FSMContext):
         return
     
     # Get primary image
-    primary_image = product.get("image_url") or product.get("primary_image")
+    primary_image = product.get("thumbnail_url") or product.get("image_url") or product.get("primary_image")
     
     # Get additional images (if available)
     additional_images = product.get("images", [])
@@ -654,7 +654,7 @@ async def send_product_carousel(
     media_group = []
     
     for idx, product in enumerate(products[:MAX_CAROUSEL_PHOTOS]):
-        image_url = product.get("image_url") or product.get("primary_image")
+        image_url = product.get("thumbnail_url") or product.get("image_url") or product.get("primary_image")
         
         if not image_url:
             continue
@@ -10,13 +10,24 @@ from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_applicati
 from aiogram.enums import ParseMode
 from dotenv import load_dotenv
 
-from handlers import start, product_inquiry, escalation, callbacks, image_search
+from handlers import start, product_inquiry, escalation, callbacks, image_search, document_search
 from services.api_client import APIClient
 from services.prompt_manager import PromptManager
 from core.config_manager import ConfigManager
 from core.escalation_logger import EscalationLogger
 from core.analytics_tracker import AnalyticsTracker
-from middleware import ServicesMiddleware
+from core.conversation_log import ConversationLog
+from core.ocr_pool import ocr_pool
+from core.photo_cache import photo_cache
+from core.metrics import REGISTRY, CONTENT_TYPE_LATEST
+from middleware import (
+    ServicesMiddleware,
+    UpdateMetricsMiddleware,
+    TelegramRequestMetrics,
+    ConversationLogMiddleware,
+    ConversationLogRequestMiddleware,
+    http_metrics_middleware,
+)
 
 # Load environment variables
 load_dotenv()
@@ -41,6 +52,7 @@ PORT = int(os.getenv("PORT", 8080))
 from aiogram.client.default import DefaultBotProperties
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 dp = Dispatcher()
+bot.session.middleware(TelegramRequestMetrics())
 
 # Initialize services (legacy)
 api_client = APIClient(base_url=API_URL)
@@ -50,6 +62,8 @@ prompt_manager = PromptManager(api_client=api_client, city_id=str(CITY_ID))
 config_manager = ConfigManager(api_url=API_URL, city_id=CITY_ID, reload_interval=300)
 escalation_logger = EscalationLogger(api_url=API_URL)
 analytics_tracker = AnalyticsTracker(api_url=API_URL)
+conversation_log = ConversationLog(api_url=API_URL, city_id=CITY_ID, channel="telegram")
+bot.session.middleware(ConversationLogRequestMiddleware(conversation_log))
 
 
 async def on_startup(bot: Bot) -> None:
@@ -66,11 +80,20 @@ async def on_startup(bot: Bot) -> None:
     # Load new config from admin platform
     try:
         await config_manager.load_config()
-        config_manager.start_auto_reload()
-        logger.info(f"✅ Config loaded + auto-reload started (every {config_manager.reload_interval}s)")
+        logger.info(f"✅ Config loaded (v{config_manager.version})")
     except Exception as e:
         logger.warning(f"⚠️ Failed to load admin config: {e} - continuing without admin config")
     
+    # Push updates via the config stream; polling is only the fallback heartbeat
+    config_manager.start_stream()
+    config_manager.start_auto_reload()
+    
+    # Persist chat history to the admin platform in the background
+    conversation_log.start()
+    
+    # Warm OCR workers before the first photo arrives
+    ocr_pool.start()
+    
     # Set webhook
     webhook_url = f"{WEBHOOK_URL}{WEBHOOK_PATH}"
     await bot.set_webhook(
@@ -83,11 +106,23 @@ async def on_startup(bot: Bot) -> None:
 async def on_shutdown(bot: Bot) -> None:
     """Cleanup on shutdown"""
     logger.info("Shutting down...")
+    config_manager.stop_stream()
     config_manager.stop_auto_reload()
+    await conversation_log.stop()
+    ocr_pool.stop()
+    await photo_cache.close()
     await bot.delete_webhook()
     await bot.session.close()
 
 
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Prometheus scrape endpoint"""
+    return web.Response(
+        body=REGISTRY.render().encode(),
+        headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
 def register_handlers(dp: Dispatcher) -> None:
     """Register all handlers"""
     # Import interactive handlers
@@ -96,6 +131,7 @@ def register_handlers(dp: Dispatcher) -> None:
     # Register in order of priority
     dp.include_router(start.router)
     dp.include_router(image_search.router)  # Image search (OCR + Vision API)
+    dp.include_router(document_search.router)  # /docs search in uploaded documents
     dp.include_router(interactive.router)  # NEW: Interactive UI handlers (buttons, photos, links)
     dp.include_router(callbacks.router)  # Old callback handlers (backward compatibility)
     dp.include_router(conversation_interactive.router)  # NEW: Enhanced conversation with inline keyboards
@@ -119,13 +155,16 @@ def create_app() -> web.Application:
     }
     dp.message.middleware(ServicesMiddleware(services))
     dp.callback_query.middleware(ServicesMiddleware(services))
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.outer_middleware(ConversationLogMiddleware(conversation_log))
     
     # Setup startup/shutdown hooks
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
     
     # Create aiohttp app
-    app = web.Application()
+    app = web.Application(middlewares=[http_metrics_middleware])
+    app.router.add_get("/metrics", metrics_handler)
     
     # Setup webhook handler
     webhook_handler = SimpleRequestHandler(
@@ -1,9 +1,24 @@
 """
-Middleware for injecting services into handlers (aiogram 3.7+ compatible)
+Middleware for injecting services into handlers (aiogram 3.7+ compatible),
+for recording update, webhook and Telegram API latency, and for logging
+private-chat messages to the conversation log
 """
+import time
 from typing import Callable, Dict, Any, Awaitable
+from aiohttp import web
 from aiogram import BaseMiddleware
-from aiogram.types import Message, CallbackQuery
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.methods import SendMessage, SendPhoto
+from aiogram.types import Message, CallbackQuery, TelegramObject
+
+from core.conversation_log import ConversationLog
+from core.metrics import histogram, http_request_duration, http_requests_in_flight, track_upstream
+
+update_duration = histogram(
+    "zeta_bot_update_duration_seconds",
+    "Time to handle one Telegram update through all handlers",
+    ["event_type"],
+)
 
 
 class ServicesMiddleware(BaseMiddleware):
@@ -33,3 +48,85 @@ class ServicesMiddleware(BaseMiddleware):
             event.bot.get = fake_get
         
         return await handler(event, data)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Record handling latency per update type (register as dp.update.outer_middleware)"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        event_type = getattr(event, "event_type", None) or type(event).__name__.lower()
+        with update_duration.time(event_type=event_type):
+            return await handler(event, data)
+
+
+class TelegramRequestMetrics(BaseRequestMiddleware):
+    """Time every Bot API call (register with bot.session.middleware)"""
+    
+    async def __call__(self, make_request, bot, method):
+        with track_upstream("telegram"):
+            return await make_request(bot, method)
+
+
+class ConversationLogMiddleware(BaseMiddleware):
+    """Record incoming private-chat text as "user" messages (register as dp.message.outer_middleware)"""
+    
+    def __init__(self, conversation_log: ConversationLog):
+        self.conversation_log = conversation_log
+        super().__init__()
+    
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        if event.chat.type == "private" and event.from_user:
+            self.conversation_log.record(event.from_user.id, "user", event.text or event.caption)
+        return await handler(event, data)
+
+
+class ConversationLogRequestMiddleware(BaseRequestMiddleware):
+    """Record bot replies to private chats as "assistant" messages (register with bot.session.middleware)"""
+    
+    def __init__(self, conversation_log: ConversationLog):
+        self.conversation_log = conversation_log
+    
+    async def __call__(self, make_request, bot, method):
+        response = await make_request(bot, method)
+        # Private chat ids are the user's id and always positive; groups and channels are negative
+        if isinstance(method, (SendMessage, SendPhoto)) and isinstance(method.chat_id, int) and method.chat_id > 0:
+            content = method.text if isinstance(method, SendMessage) else method.caption
+            self.conversation_log.record(method.chat_id, "assistant", content)
+        return response
+
+
+@web.middleware
+async def http_metrics_middleware(request: web.Request, handler):
+    """Record webhook HTTP latency per route; /metrics itself is not recorded"""
+    if request.path == "/metrics":
+        return await handler(request)
+    
+    status = 500
+    http_requests_in_flight.inc()
+    start = time.perf_counter()
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        http_requests_in_flight.dec()
+        resource = request.match_info.route.resource
+        http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=resource.canonical if resource is not None else "unmatched",
+            status=status,
+        )
@@ -1,9 +1,12 @@
 """
 API Client for fetching config, catalog, and creating Bitrix deals
 """
+import asyncio
 import logging
 from typing import Dict, List, Optional, Any
-from aiohttp import ClientSession, ClientError
+from aiohttp import ClientSession, ClientError, ClientTimeout, FormData
+
+from core.metrics import aiohttp_trace_config
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +21,7 @@ class APIClient:
     async def _get_session(self) -> ClientSession:
         """Get or create aiohttp session"""
         if self.session is None or self.session.closed:
-            self.session = ClientSession()
+            self.session = ClientSession(trace_configs=[aiohttp_trace_config()])
         return self.session
     
     async def close(self):
@@ -98,6 +101,29 @@ class APIClient:
             logger.error(f"❌ Product search failed: {e}")
             return []
     
+    async def search_by_image(self, image: bytes, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find catalog products whose picture matches a photo (perceptual hash)
+        POST /api/products/search-by-image
+        
+        Returns products best first, each with "confident": true when the
+        photo is a copy of that product's catalog image
+        """
+        session = await self._get_session()
+        url = f"{self.base_url}/api/products/search-by-image"
+        form = FormData()
+        form.add_field("image", image, filename="photo.jpg", content_type="image/jpeg")
+        form.add_field("limit", str(limit))
+        
+        try:
+            async with session.post(url, data=form, timeout=ClientTimeout(total=5)) as response:
+                response.raise_for_status()
+                data = await response.json()
+                return data.get("products", [])
+        except (ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"❌ Image hash search failed: {e}")
+            return []
+    
     async def create_bitrix_deal(
         self,
         customer_name: str,
@@ -5,15 +5,20 @@ Improved context awareness and smarter recommendations
 
 import logging
 from typing import Dict, List, Optional, Any
+import httpx
 from openai import AsyncOpenAI
 import json
 
 from config import settings
+from core.metrics import httpx_event_hooks
 
 logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+client = AsyncOpenAI(
+    api_key=settings.openai_api_key,
+    http_client=httpx.AsyncClient(event_hooks=httpx_event_hooks()),
+)
 
 
 SYSTEM_PROMPT = """Ты - умный ассистент мебельного магазина "ZETA Furniture" в Талдыкоргане, Казахстан.
@@ -0,0 +1,168 @@
+"""
+Conversation Log - Write-behind persistence of chat messages to the admin platform
+
+Handlers never wait on the API: record() appends to an in-memory buffer and
+returns. A background task posts the buffer to
+POST /conversations/messages/batch every `flush_interval` seconds, or as soon
+as `batch_size` messages are waiting. The API files messages under each
+user's conversation (and caches that lookup), so analytics sees real
+conversations without the bot tracking conversation ids.
+
+If the API is down, batches stay buffered and are retried with backoff; past
+`max_buffered` messages the oldest are dropped (and counted), so an outage
+never grows memory without bound. Each message carries a client_id, so a
+batch the API stored before the response timed out is not stored twice.
+"""
+import asyncio
+import httpx
+import logging
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import settings
+from core.metrics import counter, httpx_event_hooks
+
+logger = logging.getLogger(__name__)
+
+messages_logged = counter(
+    "zeta_whatsapp_conversation_messages_total",
+    "Chat messages handed to the conversation log by outcome (stored, dropped)",
+    ["outcome"],
+)
+
+
+class ConversationLog:
+    """Buffers chat messages and flushes them to the admin platform in batches"""
+
+    def __init__(
+        self,
+        api_url: str,
+        city_id: int,
+        channel: str = "whatsapp",
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        max_buffered: int = 10000,
+        max_backoff: float = 60.0
+    ):
+        """
+        Initialize ConversationLog
+
+        Args:
+            api_url: Base URL of ZETA admin API
+            city_id: City ID the messages belong to
+            channel: "telegram" or "whatsapp"
+            batch_size: Messages per request (the API accepts up to 500)
+            flush_interval: Seconds between flushes of a partial batch
+            max_buffered: Oldest messages are dropped beyond this many
+            max_backoff: Longest wait between retries while the API is failing
+        """
+        self.api_url = api_url.rstrip('/')
+        self.city_id = city_id
+        self.channel = channel
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self._buffer = deque(maxlen=max_buffered)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def record(self, user_id, role: str, content: Optional[str]):
+        """Queue one message; never blocks and never raises"""
+        if not content:
+            return
+        if len(self._buffer) == self._buffer.maxlen:
+            messages_logged.inc(outcome="dropped")
+        self._buffer.append({
+            "user_id": str(user_id),
+            "role": role,
+            "content": content,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "client_id": uuid.uuid4().hex,  # Lets the API skip it if a timed-out batch is sent again
+        })
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        """Start the background flusher (call from the running event loop)"""
+        if self._task is None:
+            self._client = httpx.AsyncClient(event_hooks=httpx_event_hooks(), timeout=10.0)
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"✅ Conversation log started (batch={self.batch_size}, every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop the flusher and try once to deliver what is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._buffer and await self.flush():
+            pass
+        if self._buffer:
+            logger.warning(f"⚠️ Conversation log stopped with {len(self._buffer)} undelivered messages")
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            delivered = True
+            while self._buffer and delivered:
+                delivered = await self.flush()
+                if len(self._buffer) < self.batch_size:
+                    break
+            delay = self.flush_interval if delivered else min(delay * 2, self.max_backoff)
+
+    async def flush(self) -> bool:
+        """
+        Post up to batch_size buffered messages
+
+        Returns:
+            True if delivered (or nothing to send), False if they were put back for a retry
+        """
+        if not self._buffer:
+            return True
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        payload = {"city_id": self.city_id, "channel": self.channel, "messages": batch}
+
+        try:
+            response = await self._client.post(f"{self.api_url}/conversations/messages/batch", json=payload)
+            if response.status_code in (200, 201):
+                messages_logged.inc(len(batch), outcome="stored")
+                logger.debug(f"💬 Logged {len(batch)} messages")
+                return True
+            if 400 <= response.status_code < 500:
+                # The API rejected the batch itself; retrying won't help
+                messages_logged.inc(len(batch), outcome="dropped")
+                logger.error(f"❌ Conversation log batch rejected: HTTP {response.status_code}")
+                return True
+            logger.warning(f"⚠️ Conversation log flush failed: HTTP {response.status_code}")
+        except Exception as e:
+            logger.warning(f"⚠️ Conversation log flush error: {e}")
+
+        # Put the batch back in front, oldest first, for the next attempt
+        for message in reversed(batch):
+            if len(self._buffer) == self._buffer.maxlen:
+                messages_logged.inc(outcome="dropped")
+                break
+            self._buffer.appendleft(message)
+        return False
+
+
+# Global instance; started and stopped in the app lifespan
+conversation_log = ConversationLog(api_url=settings.api_url, city_id=settings.city_id, channel="whatsapp")
+
+
+__all__ = ["ConversationLog", "conversation_log"]
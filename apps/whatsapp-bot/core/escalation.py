@@ -9,6 +9,7 @@ from typing import Optional
 from datetime import datetime
 
 from config import settings
+from core.metrics import httpx_event_hooks
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +41,7 @@ async def log_escalation(
             "city_id": settings.city_id
         }
         
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
             response = await client.post(
                 f"{settings.admin_api_url}/api/escalations",
                 json=payload,
@@ -14,6 +14,8 @@ except ImportError:
     # Fallback if redis not installed yet
     redis = None
 
+from core.metrics import track_redis
+
 logger = logging.getLogger(__name__)
 
 
@@ -102,14 +104,15 @@ class ConversationMemory:
             **(metadata or {})
         }
         
-        # Add message to list (left push = newest first)
-        await self.redis.lpush(key, json.dumps(message))
-        
-        # Trim to max_messages
-        await self.redis.ltrim(key, 0, self.max_messages - 1)
-        
-        # Set expiration
-        await self.redis.expire(key, self.ttl_seconds)
+        with track_redis("memory_save_message"):
+            # Add message to list (left push = newest first)
+            await self.redis.lpush(key, json.dumps(message))
+            
+            # Trim to max_messages
+            await self.redis.ltrim(key, 0, self.max_messages - 1)
+            
+            # Set expiration
+            await self.redis.expire(key, self.ttl_seconds)
         
         logger.debug(f"Saved message for user {user_id}: {role}")
     
@@ -134,7 +137,8 @@ class ConversationMemory:
         key = self._get_key(user_id)
         
         # Get messages (newest first in Redis)
-        messages_raw = await self.redis.lrange(key, 0, limit or -1)
+        with track_redis("memory_get_history"):
+            messages_raw = await self.redis.lrange(key, 0, limit or -1)
         
         # Parse and reverse (to get chronological order)
         messages = [json.loads(msg) for msg in messages_raw]
@@ -149,7 +153,8 @@ class ConversationMemory:
             await self.connect()
         
         key = self._get_key(user_id)
-        await self.redis.delete(key)
+        with track_redis("memory_clear_history"):
+            await self.redis.delete(key)
         
         logger.info(f"Cleared history for user {user_id}")
     
@@ -8,6 +8,7 @@ import httpx
 from typing import List, Dict, Optional, Any
 
 from config import settings
+from core.metrics import httpx_event_hooks
 
 logger = logging.getLogger(__name__)
 
@@ -66,7 +67,7 @@ class ProductSearchAPI:
             if max_price:
                 params["max_price"] = max_price
             
-            async with httpx.AsyncClient() as client:
+            async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
                 response = await client.get(
                     f"{self.base_url}/api/products/search",
                     params=params,
@@ -87,7 +88,7 @@ class ProductSearchAPI:
     async def get_product_by_sku(self, sku: str) -> Optional[Dict[str, Any]]:
         """Get detailed product information by SKU"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
                 response = await client.get(
                     f"{self.base_url}/api/products/{sku}",
                     params={"city_id": self.city_id},
@@ -146,7 +147,7 @@ class ProductSearchAPI:
             if style:
                 params["style"] = style
             
-            async with httpx.AsyncClient() as client:
+            async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
                 response = await client.get(
                     f"{self.base_url}/api/products/recommendations",
                     params=params,
@@ -173,12 +174,11 @@ class ProductSearchAPI:
         """
         Search products by image.
         
-        Methods:
-        1. OCR - extract SKU from screenshot
-        2. Vision API - describe image and search
+        The API matches the photo against the perceptual-hash index of
+        catalog images, which finds screenshots of our own pictures.
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
                 with open(image_path, "rb") as f:
                     files = {"image": f}
                     data = {
@@ -196,7 +196,8 @@ class ProductSearchAPI:
                     response.raise_for_status()
                     
                     result = response.json()
-                    products = result.get("products", [])
+                    # Hash matches come best first; only near-identical pictures count as found
+                    products = [p for p in result.get("products", []) if p.get("confident", True)]
                     
                     logger.info(f"✓ Image search found {len(products)} products")
                     return products
@@ -14,6 +14,8 @@ except ImportError:
 from aiogram import BaseMiddleware
 from aiogram.types import Message, TelegramObject
 
+from core.metrics import track_redis
+
 logger = logging.getLogger(__name__)
 
 
@@ -93,11 +95,13 @@ class RateLimitMiddleware(BaseMiddleware):
         
         try:
             # Increment counter
-            count = await self.redis.incr(key)
+            with track_redis("rate_limit_incr"):
+                count = await self.redis.incr(key)
             
             # Set expiration on first message in window
             if count == 1:
-                await self.redis.expire(key, self.window)
+                with track_redis("rate_limit_expire"):
+                    await self.redis.expire(key, self.window)
             
             # Check if limit exceeded
             if count > self.limit:
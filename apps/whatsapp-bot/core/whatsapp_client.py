@@ -8,6 +8,8 @@ import httpx
 from typing import Dict, List, Optional, Any, Union
 import json
 from config import settings, WHATSAPP_MESSAGES_ENDPOINT, WHATSAPP_MEDIA_ENDPOINT
+from core.conversation_log import conversation_log
+from core.metrics import httpx_event_hooks
 
 logger = logging.getLogger(__name__)
 
@@ -394,7 +396,7 @@ class WhatsAppClient:
         Returns:
             media_id (can be used in send_image/send_audio/etc.)
         """
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
             with open(file_path, "rb") as f:
                 files = {"file": (file_path, f, mime_type)}
                 headers = {"Authorization": f"Bearer {self.token}"}
@@ -424,7 +426,7 @@ class WhatsAppClient:
         """
         url = f"https://graph.facebook.com/v18.0/{media_id}"
         
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
             response = await client.get(url, headers=self.headers)
             response.raise_for_status()
             
@@ -443,7 +445,7 @@ class WhatsAppClient:
             media_url: URL from get_media_url()
             save_path: Local path to save file
         """
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
             response = await client.get(media_url, headers=self.headers)
             response.raise_for_status()
             
@@ -454,7 +456,7 @@ class WhatsAppClient:
     
     async def _send_message(self, payload: Dict) -> Dict:
         """Internal method to send message via API"""
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(event_hooks=httpx_event_hooks()) as client:
             try:
                 response = await client.post(
                     WHATSAPP_MESSAGES_ENDPOINT,
@@ -466,6 +468,8 @@ class WhatsAppClient:
                 
                 data = response.json()
                 logger.info(f"✓ Message sent: {data.get('messages', [{}])[0].get('id', 'unknown')}")
+                if payload.get("to"):
+                    conversation_log.record(payload["to"], "assistant", _message_text(payload))
                 return data
                 
             except httpx.HTTPStatusError as e:
@@ -476,6 +480,18 @@ class WhatsAppClient:
                 raise
 
 
+def _message_text(payload: Dict) -> Optional[str]:
+    """Readable text of an outgoing message for the conversation log"""
+    message_type = payload.get("type")
+    if message_type == "text":
+        return payload["text"].get("body")
+    if message_type in ("image", "document", "video"):
+        return payload[message_type].get("caption")
+    if message_type == "interactive":
+        return payload["interactive"].get("body", {}).get("text")
+    return None
+
+
 # Global client instance
 whatsapp_client = WhatsAppClient()
 
@@ -83,10 +83,11 @@ async def send_product_details(
 """
         
         # Send image if available
-        if product.get("image_url"):
+        image_url = product.get("thumbnail_url") or product.get("image_url")
+        if image_url:
             await whatsapp_client.send_image(
                 to=to,
-                image_url=product["image_url"],
+                image_url=image_url,
                 caption=details
             )
         else:
@@ -9,6 +9,7 @@ from typing import Dict, Any
 from core.whatsapp_client import whatsapp_client
 from core.ai_assistant import ai_assistant
 from core.memory import conversation_memory
+from core.conversation_log import conversation_log
 from core.product_search import product_api
 from core.rate_limiter import RateLimiter
 from handlers.interactive import send_product_list, send_product_details
@@ -42,6 +43,7 @@ async def handle_text_message(message: Dict[str, Any]):
             return
         
         logger.info(f"📥 Message from {from_number}: {text[:100]}")
+        conversation_log.record(from_number, "user", text)
         
         # Check rate limit
         if not rate_limiter.check_rate_limit(from_number):
@@ -9,6 +9,8 @@ from contextlib import asynccontextmanager
 
 from config import settings, WEBHOOK_PATH
 from core.memory import init_conversation_memory
+from core.conversation_log import conversation_log
+from core.metrics import REGISTRY, CONTENT_TYPE_LATEST, MetricsMiddleware, counter, histogram
 from handlers.messages import handle_text_message
 from handlers.interactive import handle_button_response, handle_list_response, send_welcome_menu
 from handlers.media import handle_image_message, handle_audio_message, handle_document_message
@@ -20,6 +22,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+messages_received = counter(
+    "zeta_whatsapp_messages_total",
+    "Incoming WhatsApp messages by type",
+    ["type"],
+)
+message_processing_duration = histogram(
+    "zeta_whatsapp_message_processing_seconds",
+    "Time to handle one incoming WhatsApp message",
+    ["type"],
+)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -43,6 +56,9 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ Redis connection failed: {e}")
         logger.warning("⚠️ Bot will work WITHOUT memory - limited context awareness")
     
+    # Persist chat history to the admin platform in the background
+    conversation_log.start()
+    
     # Log enabled features
     logger.info("📋 Enabled features:")
     logger.info(f"  🎤 Voice transcription: {settings.enable_voice_transcription}")
@@ -56,6 +72,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("👋 Shutting down...")
+    await conversation_log.stop()
     try:
         from core.memory import conversation_memory
         if conversation_memory:
@@ -71,6 +88,7 @@ app = FastAPI(
     version="2.0.0",
     lifespan=lifespan
 )
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -172,9 +190,15 @@ async def process_message(message: dict):
     - contacts: Contact card
     - interactive: Button/list response
     """
+    with message_processing_duration.time(type=message.get("type") or "unknown"):
+        await _dispatch_message(message)
+
+
+async def _dispatch_message(message: dict):
     try:
         msg_type = message.get("type")
         from_number = message.get("from")
+        messages_received.inc(type=msg_type or "unknown")
         
         logger.info(f"📩 Message type: {msg_type} from {from_number}")
         
@@ -247,13 +271,18 @@ async def health():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/stats")
 async def stats():
-    """Bot statistics (optional)"""
-    # Could return: total messages, active users, escalations, etc.
+    """Bot statistics: message counts and latencies since start"""
     return {
         "status": "ok",
-        "message": "Statistics endpoint - implement as needed"
+        "metrics": REGISTRY.snapshot()
     }
 
 
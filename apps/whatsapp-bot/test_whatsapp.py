@@ -347,6 +347,35 @@ class TestRateLimiter:
         assert limiter.check_rate_limit(user_id) is False
 
 
+class TestMetrics:
+    """Test in-process metrics registry"""
+    
+    def test_histogram_renders_buckets(self):
+        """Observations land in cumulative buckets with sum and count"""
+        from core.metrics import MetricsRegistry, Histogram
+        
+        registry = MetricsRegistry()
+        latency = registry.register(Histogram("test_latency_seconds", "Test", ["route"], buckets=(0.1, 1.0)))
+        latency.observe(0.05, route="/a")
+        latency.observe(0.5, route="/a")
+        
+        text = registry.render()
+        assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 2' in text
+        assert 'test_latency_seconds_count{route="/a"} 2' in text
+    
+    def test_upstream_error_counted(self):
+        """track_upstream counts failures per upstream"""
+        from core.metrics import track_upstream, upstream_request_errors
+        
+        before = upstream_request_errors.value(upstream="graph_api")
+        with pytest.raises(RuntimeError):
+            with track_upstream("graph_api"):
+                raise RuntimeError("boom")
+        
+        assert upstream_request_errors.value(upstream="graph_api") == before + 1
+
+
 class TestMessageHandlers:
     """Test message handlers"""
     